@@ -1,144 +1,397 @@
+import argparse
+import hashlib
+import io
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import glob
 from openpyxl import Workbook
 import json
+from repo_inventory import load_inventory
 
 # Define the base directory
 base_dir = 'repos_v2'
 
-def parse_impact(impact_str):
-    try:
-        impact_list = json.loads(impact_str.replace("'", '"'))
-        return [item['softwareQuality'] for item in impact_list]
-    except:
-        return []
+# Columnar dataset with one table per report kind, partitioned by user: <DATASET_DIR>/<table>/user=<name>/
+DATASET_DIR = 'metrics-parquet'
+# The per-user xlsx reports are only written when asked for; export_xlsx builds them from the dataset
+WRITE_XLSX = False
 
-# Walk through all subdirectories in repos_v2
-for user_dir in os.listdir(base_dir):
-    user_path = os.path.join(base_dir, user_dir)
-    if not os.path.isdir(user_path):
-        continue
+# Size, mtime and hash of every CSV each user's partitions were built from, kept with the dataset
+AGGREGATE_MANIFEST = 'manifest.json'
+DATASET_VERSION = 2  # Bumped when the schemas change, so every user is aggregated again
+AGGREGATE_WORKERS = os.cpu_count() or 1
 
-    # Create a new workbook for each user in write_only mode
-    excel_file = os.path.join(user_path, f'{user_dir}_aggregated_report.xlsx')
-    workbook = Workbook(write_only=True)
+SEVERITIES = ['BLOCKER', 'CRITICAL', 'INFO', 'MAJOR', 'MINOR']
+IMPACTS = ['RELIABILITY', 'MAINTAINABILITY', 'SECURITY']
+# Issues report column with the impact severity for each software quality, as written by fetch_sonar_qube.py
+IMPACT_COLUMNS = {
+    'RELIABILITY': 'Reliability Impact',
+    'MAINTAINABILITY': 'Maintainability Impact',
+    'SECURITY': 'Security Impact',
+}
+# The raw Impact column is the repr of SonarQube's impacts list: [{'softwareQuality': ..., 'severity': ...}, ...]
+IMPACT_ENTRY = r"""\{['"]softwareQuality['"]: ['"]\w+['"], ['"]severity['"]: ['"]\w+['"]\}"""
+IMPACT_LIST = rf'\[(?:{IMPACT_ENTRY}(?:, {IMPACT_ENTRY})*)?\]'  # No lookarounds, pyarrow's regex engine has none
+IMPACT_SEVERITY = r"""['"]softwareQuality['"]: ['"]{quality}['"], ['"]severity['"]: ['"](\w+)['"]"""
+
+ISSUES_SCHEMA = pa.schema([
+    ('Repository', pa.dictionary(pa.int32(), pa.string())),
+    ('Key', pa.string()),
+    ('Component', pa.string()),
+    ('File Extension', pa.dictionary(pa.int32(), pa.string())),
+    ('Rule', pa.dictionary(pa.int32(), pa.string())),
+    ('Type', pa.dictionary(pa.int32(), pa.string())),
+    ('Impact', pa.string()),
+    ('Severity', pa.dictionary(pa.int32(), pa.string())),
+    ('Status', pa.dictionary(pa.int32(), pa.string())),
+    ('Message', pa.string()),
+] + [(column, pa.dictionary(pa.int32(), pa.string())) for column in IMPACT_COLUMNS.values()])
+# Older consolidated reports only have the columns up to Total LOC; the others are left empty for them
+CONSOLIDATED_SCHEMA = pa.schema([
+    ('Repository', pa.dictionary(pa.int32(), pa.string())),
+    ('File Extension', pa.dictionary(pa.int32(), pa.string())),
+    ('Minor Issues', pa.int64()),
+    ('Major Issues', pa.int64()),
+    ('Critical Issues', pa.int64()),
+    ('Total LOC', pa.int64()),
+    ('Complexity', pa.int64()),
+    ('Cognitive Complexity', pa.int64()),
+    ('Duplicated Lines', pa.int64()),
+])
+SCHEMAS = {'issues': ISSUES_SCHEMA, 'consolidated': CONSOLIDATED_SCHEMA}
 
-    # Create sheets for issues and consolidated data
-    issues_sheet = workbook.create_sheet(title='Issues')
-    consolidated_sheet = workbook.create_sheet(title='Consolidated')
+def impact_columns(impact):
+    """The IMPACT_COLUMNS parsed from raw Impact strings, null where a quality is not impacted or the string is malformed"""
+    # A few distinct strings repeat across all the issues, so each is parsed once
+    impact = impact.astype('category')
+    distinct = impact.cat.categories.to_series()
+    well_formed = distinct.str.fullmatch(IMPACT_LIST)
+    return pd.DataFrame({
+        column: impact.map(distinct.str.extract(IMPACT_SEVERITY.format(quality=quality), expand=False).where(well_formed)).astype('string')
+        for quality, column in IMPACT_COLUMNS.items()
+    })
 
-    issues_header_written = False
-    consolidated_header_written = False
+def structure_impacts(issues_df):
+    """Fill the IMPACT_COLUMNS of the issues from reports written before fetch_sonar_qube.py had them.
 
-    all_issues_data = []
-    all_consolidated_data = []
+    Parsed in one pass, so call it on all the issues of a user rather than per report.
+    """
+    parsed = impact_columns(issues_df['Impact'])
+    for column in IMPACT_COLUMNS.values():
+        if column in issues_df.columns:
+            # Newer reports leave the column empty where the quality is not impacted, which parses the same
+            issues_df[column] = issues_df[column].replace('', None).fillna(parsed[column])
+        else:
+            issues_df[column] = parsed[column]
+    return issues_df
 
-    for repo_dir in os.listdir(user_path):
+def malformed_impacts(issues_df):
+    """Issues whose raw Impact is not a list of software quality impacts; they count in no impact column"""
+    impact = issues_df['Impact'].astype('category')
+    # One entry per distinct string, and a last False for the -1 code of nulls
+    well_formed = np.append(np.asarray(impact.cat.categories.str.fullmatch(IMPACT_LIST), dtype=bool), False)
+    return issues_df[~well_formed[impact.cat.codes.to_numpy()]]
+
+def report_files(user_path):
+    """(repository, table, path) of every CSV report of a user, walking the folder; aggregate() takes them from the inventory"""
+    files = []
+    for repo_dir in sorted(os.listdir(user_path)):
         repo_path = os.path.join(user_path, repo_dir)
         if not os.path.isdir(repo_path):
             continue
 
-        # Find all CSV files in the repository directory
-        csv_files = glob.glob(os.path.join(repo_path, '*.csv'))
-        
-        for csv_file in csv_files:
+        for csv_file in sorted(glob.glob(os.path.join(repo_path, '*.csv'))):
             if csv_file.endswith('_issues.csv'):
-                sheet = issues_sheet
-                header_written = issues_header_written
-                df = pd.read_csv(csv_file)
-                df['Repository'] = repo_dir
-                all_issues_data.append(df)
+                files.append((repo_dir, 'issues', csv_file))
             elif csv_file.endswith('_consolidated.csv'):
-                sheet = consolidated_sheet
-                header_written = consolidated_header_written
-                df = pd.read_csv(csv_file)
-                df['Repository'] = repo_dir
-                all_consolidated_data.append(df)
-            else:
+                files.append((repo_dir, 'consolidated', csv_file))
+    return files
+
+def file_state(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def read_user_reports(user_path, files=None):
+    """Issues and consolidated tables of every repository of a user, typed as in SCHEMAS,
+    and the manifest entries of the CSVs they were read from.
+
+    `files` are the user's report_files, found again when not given.
+    A table is None when the user has no CSV of that kind, and empty when the CSVs have no rows.
+    """
+    tables = {'issues': [], 'consolidated': []}
+    inputs = {}
+    for repo_dir, table, csv_file in (report_files(user_path) if files is None else files):
+        print(f"Processing file: {csv_file}")
+        # Read once, for both the hash and the parser
+        state = file_state(csv_file)
+        with open(csv_file, 'rb') as file:
+            data = file.read()
+        inputs[os.path.relpath(csv_file, user_path)] = dict(state, sha256=hashlib.sha256(data).hexdigest())
+        df = pd.read_csv(io.BytesIO(data), dtype=str if table == 'issues' else None, keep_default_na=table != 'issues')
+        df.insert(0, 'Repository', repo_dir)
+        tables[table].append(df)
+
+    frames = {}
+    for table, dfs in tables.items():
+        if not dfs:
+            frames[table] = None
+            continue
+        schema = SCHEMAS[table]
+        df = pd.concat(dfs, ignore_index=True)
+        if table == 'issues':
+            df = structure_impacts(df)
+        df = df.reindex(columns=schema.names)
+        frames[table] = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    return frames, inputs
+
+def write_partition(table, user, arrow_table, dataset_dir=DATASET_DIR):
+    # Empty tables are kept, so the condensed views know the user had reports of that kind
+    partition = os.path.join(dataset_dir, table, f'user={user}')
+    shutil.rmtree(partition, ignore_errors=True)
+    if arrow_table is None:
+        return
+    os.makedirs(partition)
+    pq.write_table(arrow_table, os.path.join(partition, 'part-0.parquet'))
+
+def aggregate_user(user_dir, dataset_dir=DATASET_DIR, repos_dir=None, xlsx=False, files=None):
+    """Rewrite the user's partitions of the dataset from the repositories' CSV reports.
+
+    Returns the manifest entries of the CSVs read.
+    """
+    user_path = os.path.join(repos_dir or base_dir, user_dir)
+    frames, inputs = read_user_reports(user_path, files)
+    for table, arrow_table in frames.items():
+        write_partition(table, user_dir, arrow_table, dataset_dir)
+    print(f"Aggregated reports for {user_dir} written to {dataset_dir}")
+    if xlsx:
+        export_xlsx(user_dir, dataset_dir, repos_dir=repos_dir)
+    return inputs
+
+def remove_user(user_dir, dataset_dir=DATASET_DIR):
+    for table in SCHEMAS:
+        write_partition(table, user_dir, None, dataset_dir)
+
+class AggregateManifest:
+    """The CSV inputs each user's partitions were built from: {user: {relative path: size, mtime_ns, sha256}}.
+
+    Kept next to the partitions, so a removed dataset also drops it, and
+    rewritten after every user, so an interrupted run keeps what it finished.
+    """
+
+    def __init__(self, dataset_dir=DATASET_DIR):
+        self.dataset_dir = dataset_dir
+        self.path = os.path.join(dataset_dir, AGGREGATE_MANIFEST)
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                manifest = json.load(file)
+            # Partitions written with other schemas are all rebuilt
+            if manifest.get('version') == DATASET_VERSION:
+                self.entries = manifest['users']
+
+    def is_current(self, user_dir, user_path, files=None):
+        """Whether the user's partitions were built from the CSVs now in `user_path`.
+
+        Files whose size and mtime match are taken as unchanged; the others are
+        hashed, so a file that was only touched does not cause a rebuild.
+        """
+        entry = self.entries.get(user_dir)
+        if entry is None:
+            return False
+        # Partitions removed by hand are rebuilt
+        tables = {table for path in entry for table in SCHEMAS if path.endswith(f'_{table}.csv')}
+        if not all(has_partition(table, user_dir, self.dataset_dir) for table in tables):
+            return False
+        files = report_files(user_path) if files is None else files
+        paths = {os.path.relpath(csv_file, user_path): csv_file for _, _, csv_file in files}
+        if paths.keys() != entry.keys():
+            return False
+        touched = False
+        for relative, csv_file in paths.items():
+            state = file_state(csv_file)
+            if state == {key: entry[relative][key] for key in state}:
                 continue
-            
-            # Read the CSV file
-            print(f"Processing file: {csv_file}")
-            
-            # Write the header if not written yet
-            if not header_written:
-                sheet.append(['Repository'] + df.columns.tolist())
-                if sheet == issues_sheet:
-                    issues_header_written = True
-                else:
-                    consolidated_header_written = True
-            
-            # Write the data
-            for row in df.itertuples(index=False, name=None):
-                sheet.append([repo_dir] + list(row))
+            if file_hash(csv_file) != entry[relative]['sha256']:
+                return False
+            entry[relative].update(state)
+            touched = True
+        if touched:
+            self.save()
+        return True
 
-    # Remove the default sheet created by openpyxl
-    if 'Sheet' in workbook.sheetnames:
-        del workbook['Sheet']
+    def record(self, user_dir, inputs):
+        self.entries[user_dir] = inputs
+        self.save()
 
-    # Save the Excel file for the user
-    workbook.save(excel_file)
-    print(f"Aggregated report for {user_dir} saved to {excel_file}")
+    def forget(self, user_dir):
+        if self.entries.pop(user_dir, None) is not None:
+            self.save()
 
-    # Create condensed report
-    condensed_excel_file = os.path.join(user_path, f'{user_dir}_condensed_report.xlsx')
-    condensed_workbook = Workbook(write_only=True)
+    def save(self):
+        os.makedirs(self.dataset_dir, exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'version': DATASET_VERSION, 'users': self.entries}, file, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+
+def has_partition(table, user, dataset_dir=DATASET_DIR):
+    return os.path.isdir(os.path.join(dataset_dir, table, f'user={user}'))
+
+def load_table(table, users=None, dataset_dir=DATASET_DIR):
+    """One table of the dataset as a DataFrame with a categorical 'user' column"""
+    path = os.path.join(dataset_dir, table)
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=SCHEMAS[table].names + ['user'])
+    filters = [('user', 'in', list(users))] if users is not None else None
+    return pd.read_parquet(path, filters=filters)
 
-    # Condense issues data by Severity
-    if all_issues_data:
-        issues_df = pd.concat(all_issues_data, ignore_index=True)
-        severity_counts = issues_df.groupby(['File Extension', 'Type', 'Severity']).size().unstack(fill_value=0)
-        
-        # Ensure all severity levels are present
-        for severity in ['BLOCKER', 'CRITICAL', 'INFO', 'MAJOR', 'MINOR']:
-            if severity not in severity_counts.columns:
-                severity_counts[severity] = 0
-        
-        severity_counts = severity_counts[['BLOCKER', 'CRITICAL', 'INFO', 'MAJOR', 'MINOR']]
+def category_key(series):
+    # Categorical with sorted categories, so the views come out ordered as with plain string keys
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.reorder_categories(sorted(series.cat.categories))
+    return series.astype('category')
+
+def condense(issues_df, consolidated_df, by=()):
+    """The condensed views of the xlsx reports: issues by severity, issues by impact and LOC per extension.
+
+    Both issue views come from one groupby over indicator columns, keyed on categoricals.
+    `by` adds grouping columns in front, e.g. ['user'] to condense several users at once.
+    A table passed as None (no reports of that kind) gives no views. Issues whose raw
+    Impact cannot be parsed are listed in a 'Malformed Impacts' view.
+    """
+    by = list(by)
+    views = {}
+
+    if issues_df is not None:
+        keys = [category_key(issues_df[column]) for column in by + ['File Extension', 'Type']]
+        indicators = {severity: issues_df['Severity'] == severity for severity in SEVERITIES}
+        indicators.update({impact: issues_df[IMPACT_COLUMNS[impact]].notna() for impact in IMPACTS})
+        counts = pd.DataFrame(indicators).astype('int64').groupby(keys, observed=True).sum()
+
+        # Condense issues data by Severity
+        severity_counts = counts[SEVERITIES].copy()
         severity_counts['Total Issues'] = severity_counts.sum(axis=1)
-        severity_counts = severity_counts.reset_index()
-
-        condensed_issues_sheet = condensed_workbook.create_sheet(title='Condensed Issues')
-        condensed_issues_sheet.append(['File Extension', 'Type', 'BLOCKER', 'CRITICAL', 'INFO', 'MAJOR', 'MINOR', 'Total Issues'])
-        for row in severity_counts.itertuples(index=False):
-            condensed_issues_sheet.append(row)
-
-        # Condense issues data by Impact
-        issues_df['Impact'] = issues_df['Impact'].apply(parse_impact)
-        impact_df = issues_df.explode('Impact')
-        impact_counts = impact_df.groupby(['File Extension', 'Type', 'Impact']).size().unstack(fill_value=0)
-        
-        # Ensure all impact types are present
-        for impact in ['RELIABILITY', 'MAINTAINABILITY', 'SECURITY']:
-            if impact not in impact_counts.columns:
-                impact_counts[impact] = 0
-        
-        impact_counts = impact_counts[['RELIABILITY', 'MAINTAINABILITY', 'SECURITY']]
+        views['Condensed Issues'] = severity_counts.reset_index()
+
+        # Condense issues data by Impact; groups whose issues impact no quality are left out
+        impact_counts = counts[IMPACTS].copy()
         impact_counts['Total Issues'] = impact_counts.sum(axis=1)
-        impact_counts = impact_counts.reset_index()
+        views['Condensed Issues by Impact'] = impact_counts[impact_counts['Total Issues'] > 0].reset_index()
 
-        condensed_impact_sheet = condensed_workbook.create_sheet(title='Condensed Issues by Impact')
-        condensed_impact_sheet.append(['File Extension', 'Type', 'RELIABILITY', 'MAINTAINABILITY', 'SECURITY', 'Total Issues'])
-        for row in impact_counts.itertuples(index=False):
-            condensed_impact_sheet.append(row)
+        malformed = malformed_impacts(issues_df)
+        if len(malformed):
+            print(f"{len(malformed)} issues have a malformed Impact, listed in 'Malformed Impacts'")
+            views['Malformed Impacts'] = malformed[by + ['Repository', 'Key', 'Component', 'Impact']].reset_index(drop=True)
 
     # Condense consolidated data
-    if all_consolidated_data:
-        consolidated_df = pd.concat(all_consolidated_data, ignore_index=True)
-        loc_summary = consolidated_df.groupby('File Extension')['Total LOC'].sum().reset_index()
+    if consolidated_df is not None:
+        keys = [category_key(consolidated_df[column]) for column in by + ['File Extension']]
+        views['Condensed Consolidated'] = consolidated_df.groupby(keys, observed=True)['Total LOC'].sum().reset_index()
+
+    return views
+
+def load_condensed(users=None, dataset_dir=DATASET_DIR):
+    """Condensed views of all (or the given) users, with a 'user' column"""
+    return condense(load_table('issues', users, dataset_dir), load_table('consolidated', users, dataset_dir), by=['user'])
 
-        condensed_consolidated_sheet = condensed_workbook.create_sheet(title='Condensed Consolidated')
-        condensed_consolidated_sheet.append(['File Extension', 'Total LOC'])
-        for row in loc_summary.itertuples(index=False):
-            condensed_consolidated_sheet.append(row)
+def export_xlsx(user_dir, dataset_dir=DATASET_DIR, force=False, repos_dir=None):
+    """Write the aggregated and condensed xlsx reports of a user from the dataset.
 
-    # Remove the default sheet created by openpyxl
-    if 'Sheet' in condensed_workbook.sheetnames:
-        del condensed_workbook['Sheet']
+    Skipped when both workbooks are newer than the user's partitions, unless `force`.
+    """
+    user_path = os.path.join(repos_dir or base_dir, user_dir)
+    excel_file = os.path.join(user_path, f'{user_dir}_aggregated_report.xlsx')
+    condensed_excel_file = os.path.join(user_path, f'{user_dir}_condensed_report.xlsx')
+
+    partitions = glob.glob(os.path.join(dataset_dir, '*', f'user={user_dir}', '*.parquet'))
+    newest_partition = max((os.path.getmtime(path) for path in partitions), default=0)
+    if not force and all(os.path.exists(path) and os.path.getmtime(path) >= newest_partition
+                         for path in (excel_file, condensed_excel_file)):
+        return
+
+    issues_df, consolidated_df = (load_table(table, [user_dir], dataset_dir).drop(columns='user')
+                                  if has_partition(table, user_dir, dataset_dir) else None
+                                  for table in ('issues', 'consolidated'))
+    if consolidated_df is not None:
+        # Reports written before the extra metrics existed keep their original columns
+        consolidated_df = consolidated_df.dropna(axis=1, how='all')
 
-    # Save the condensed Excel file for the user
+    # Create a new workbook for each user in write_only mode
+    workbook = Workbook(write_only=True)
+    for title, df in (('Issues', issues_df), ('Consolidated', consolidated_df)):
+        sheet = workbook.create_sheet(title=title)
+        if df is not None:
+            sheet.append(['Repository'] + df.columns.tolist()[1:] + ['Repository'])
+            for row in df.itertuples(index=False, name=None):
+                sheet.append(list(row) + [row[0]])
+    workbook.save(excel_file)
+    print(f"Aggregated report for {user_dir} saved to {excel_file}")
+
+    # Create condensed report
+    condensed_workbook = Workbook(write_only=True)
+    for title, df in condense(issues_df, consolidated_df).items():
+        sheet = condensed_workbook.create_sheet(title=title)
+        sheet.append(df.columns.tolist())
+        for row in df.itertuples(index=False, name=None):
+            sheet.append(list(row))
     condensed_workbook.save(condensed_excel_file)
     print(f"Condensed report for {user_dir} saved to {condensed_excel_file}")
 
-print("All user reports have been generated.")
\ No newline at end of file
+def aggregate(repos_dir=base_dir, dataset_dir=DATASET_DIR, workers=AGGREGATE_WORKERS, force=False, xlsx=WRITE_XLSX):
+    """Bring the dataset up to date with the CSV reports under `repos_dir`.
+
+    Only users whose CSVs were added, changed or removed since the last run
+    are aggregated again, in a pool of `workers` processes; users no longer
+    under `repos_dir` are removed from the dataset. Returns the users rebuilt.
+    """
+    manifest = AggregateManifest(dataset_dir)
+    inventory = load_inventory(repos_dir)
+    users = inventory.users()
+    files = {user_dir: inventory.report_files(user_dir) for user_dir in users}
+
+    for user_dir in sorted(set(manifest.entries) - set(users)):
+        remove_user(user_dir, dataset_dir)
+        manifest.forget(user_dir)
+        print(f"Removed {user_dir} from {dataset_dir}")
+
+    stale = [user_dir for user_dir in users
+             if force or not manifest.is_current(user_dir, os.path.join(repos_dir, user_dir), files[user_dir])]
+    print(f"{len(stale)} of {len(users)} users to aggregate")
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as executor:
+            futures = {executor.submit(aggregate_user, user_dir, dataset_dir, repos_dir, xlsx, files[user_dir]): user_dir
+                       for user_dir in stale}
+            for future in as_completed(futures):
+                manifest.record(futures[future], future.result())
+
+    if xlsx:
+        # Users that were current may still be missing their workbooks; export_xlsx skips the up to date ones
+        for user_dir in sorted(set(users) - set(stale)):
+            export_xlsx(user_dir, dataset_dir, repos_dir=repos_dir)
+    return stale
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate the SonarQube CSV reports of every user into a Parquet dataset')
+    parser.add_argument('--repos', default=base_dir, help='Folder with one sub-folder per user')
+    parser.add_argument('--dataset', default=DATASET_DIR, help='Output dataset folder')
+    parser.add_argument('--workers', type=int, default=AGGREGATE_WORKERS, help='Users aggregated at once')
+    parser.add_argument('--force', action='store_true', help='Aggregate every user, even those whose reports did not change')
+    parser.add_argument('--xlsx', action='store_true', default=WRITE_XLSX,
+                        help='Also write the aggregated and condensed xlsx reports of each user')
+    args = parser.parse_args()
+
+    aggregate(args.repos, args.dataset, max(1, args.workers), args.force, args.xlsx)
+    print("All user reports have been generated.")
+
+if __name__ == '__main__':
+    main()
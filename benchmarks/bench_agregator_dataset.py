@@ -0,0 +1,171 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from openpyxl import Workbook
+
+# Make the top-level scripts importable when running from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import agregator
+
+METRICS_DATASET = os.path.join(ROOT, 'metrics-dataset')
+CONDENSED_SHEETS = ['Condensed Consolidated', 'Condensed Issues', 'Condensed Issues by Impact']
+
+
+def rebuild_repos(destination):
+    """Recreate repos_v2/<user>/<repo>/<key>_{issues,consolidated}.csv from the aggregated workbooks"""
+    users = 0
+    for workbook in sorted(glob.glob(os.path.join(METRICS_DATASET, '*_aggregated_report.xlsx'))):
+        user = os.path.basename(workbook)[:-len('_aggregated_report.xlsx')]
+        sheets = pd.read_excel(workbook, sheet_name=None, dtype={'Key': str, 'Message': str})
+        for sheet, suffix in (('Issues', 'issues'), ('Consolidated', 'consolidated')):
+            if sheet not in sheets or 'Repository' not in sheets[sheet].columns:
+                continue
+            df = sheets[sheet]
+            for repo, rows in df.groupby('Repository'):
+                repo_path = os.path.join(destination, user, str(repo))
+                os.makedirs(repo_path, exist_ok=True)
+                rows = rows.drop(columns=['Repository', 'Repository.1'], errors='ignore')
+                rows.to_csv(os.path.join(repo_path, f'{user}_{repo}_{suffix}.csv'), index=False)
+        users += 1
+    return users
+
+
+def parse_impact(impact_str):
+    try:
+        impact_list = json.loads(impact_str.replace("'", '"'))
+        return [item['softwareQuality'] for item in impact_list]
+    except:
+        return []
+
+
+def legacy_condense(issues_df, by=()):
+    """The issue views as agregator.py built them before: row-wise JSON parsing, explode and two groupbys"""
+    by = list(by)
+    severity_counts = issues_df.groupby(by + ['File Extension', 'Type', 'Severity'], observed=True).size().unstack(fill_value=0)
+    for severity in agregator.SEVERITIES:
+        if severity not in severity_counts.columns:
+            severity_counts[severity] = 0
+    severity_counts = severity_counts[agregator.SEVERITIES]
+    severity_counts['Total Issues'] = severity_counts.sum(axis=1)
+
+    issues_df = issues_df.copy()
+    issues_df['Impact'] = issues_df['Impact'].apply(parse_impact)
+    impact_counts = issues_df.explode('Impact').groupby(by + ['File Extension', 'Type', 'Impact'], observed=True).size().unstack(fill_value=0)
+    for impact in agregator.IMPACTS:
+        if impact not in impact_counts.columns:
+            impact_counts[impact] = 0
+    impact_counts = impact_counts[agregator.IMPACTS]
+    impact_counts['Total Issues'] = impact_counts.sum(axis=1)
+    return {'Condensed Issues': severity_counts.reset_index(), 'Condensed Issues by Impact': impact_counts.reset_index()}
+
+
+def xlsx_aggregate(base_dir):
+    """What agregator.py did before: openpyxl appends per row into two workbooks per user"""
+    for user_dir in os.listdir(base_dir):
+        user_path = os.path.join(base_dir, user_dir)
+        issues, consolidated = [], []
+        workbook = Workbook(write_only=True)
+        sheets = {'issues': workbook.create_sheet(title='Issues'), 'consolidated': workbook.create_sheet(title='Consolidated')}
+        headers = set()
+        for repo_dir in os.listdir(user_path):
+            for csv_file in glob.glob(os.path.join(user_path, repo_dir, '*.csv')):
+                kind = 'issues' if csv_file.endswith('_issues.csv') else 'consolidated'
+                df = pd.read_csv(csv_file)
+                df['Repository'] = repo_dir
+                (issues if kind == 'issues' else consolidated).append(df)
+                if kind not in headers:
+                    sheets[kind].append(['Repository'] + df.columns.tolist())
+                    headers.add(kind)
+                for row in df.itertuples(index=False, name=None):
+                    sheets[kind].append([repo_dir] + list(row))
+        workbook.save(os.path.join(user_path, f'{user_dir}_aggregated_report.xlsx'))
+
+        condensed = Workbook(write_only=True)
+        views = legacy_condense(pd.concat(issues, ignore_index=True)) if issues else {}
+        if consolidated:
+            views['Condensed Consolidated'] = pd.concat(consolidated, ignore_index=True).groupby('File Extension')['Total LOC'].sum().reset_index()
+        for title, df in views.items():
+            sheet = condensed.create_sheet(title=title)
+            sheet.append(df.columns.tolist())
+            for row in df.itertuples(index=False, name=None):
+                sheet.append(list(row))
+        condensed.save(os.path.join(user_path, f'{user_dir}_condensed_report.xlsx'))
+
+
+def xlsx_load(base_dir):
+    """The notebook's read: three pd.read_excel calls per condensed workbook"""
+    frames = {sheet: [] for sheet in CONDENSED_SHEETS}
+    for file in glob.glob(os.path.join(base_dir, '*', '*_condensed_report.xlsx')):
+        for sheet in CONDENSED_SHEETS:
+            try:
+                frames[sheet].append(pd.read_excel(file, sheet_name=sheet))
+            except ValueError:
+                pass
+    return {sheet: pd.concat(dfs, ignore_index=True) for sheet, dfs in frames.items() if dfs}
+
+
+def dataset_aggregate(base_dir, dataset_dir):
+    agregator.base_dir = base_dir
+    for user_dir in os.listdir(base_dir):
+        agregator.aggregate_user(user_dir, dataset_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the xlsx round-trip with the Parquet dataset')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench_agregator_')
+    try:
+        base_dir = os.path.join(root, 'repos_v2')
+        users = rebuild_repos(base_dir)
+        print(f"Rebuilt the CSV reports of {users} users from {METRICS_DATASET}")
+
+        timings = {'xlsx aggregate': [], 'xlsx load': [], 'dataset aggregate': [], 'dataset load': []}
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            xlsx_aggregate(base_dir)
+            timings['xlsx aggregate'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            xlsx_views = xlsx_load(base_dir)
+            timings['xlsx load'].append(time.perf_counter() - start)
+
+            dataset_dir = os.path.join(root, 'dataset')
+            shutil.rmtree(dataset_dir, ignore_errors=True)
+            start = time.perf_counter()
+            dataset_aggregate(base_dir, dataset_dir)
+            timings['dataset aggregate'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            dataset_views = agregator.load_condensed(dataset_dir=dataset_dir)
+            timings['dataset load'].append(time.perf_counter() - start)
+
+        # Both paths must agree before their timings mean anything
+        for sheet, xlsx_df in xlsx_views.items():
+            dataset_df = dataset_views[sheet]
+            value_columns = [column for column in xlsx_df.columns if column not in ('File Extension', 'Type')]
+            assert xlsx_df[value_columns].sum().equals(dataset_df[value_columns].sum()), sheet
+
+        best = {name: min(values) for name, values in timings.items()}
+        print(f"xlsx:    aggregate {best['xlsx aggregate']:6.2f}s + load {best['xlsx load']:6.2f}s = "
+              f"{best['xlsx aggregate'] + best['xlsx load']:6.2f}s")
+        print(f"Parquet: aggregate {best['dataset aggregate']:6.2f}s + load {best['dataset load']:6.2f}s = "
+              f"{best['dataset aggregate'] + best['dataset load']:6.2f}s")
+        print(f"Load speedup {best['xlsx load'] / best['dataset load']:.1f}x, end to end "
+              f"{(best['xlsx aggregate'] + best['xlsx load']) / (best['dataset aggregate'] + best['dataset load']):.1f}x")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make the top-level scripts importable when running from benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from clone_engine import CloneEngine, directory_size
+
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME='bench', GIT_AUTHOR_EMAIL='bench@example.com',
+               GIT_COMMITTER_NAME='bench', GIT_COMMITTER_EMAIL='bench@example.com')
+
+
+def git(*args, cwd=None):
+    subprocess.run(['git'] + list(args), cwd=cwd, env=GIT_ENV, check=True, capture_output=True)
+
+
+def create_bare_repo(path, commits, rng):
+    """Bare repo with a history of source files plus the assets a real project carries"""
+    work = path + '.work'
+    git('init', '--quiet', work)
+    for commit in range(commits):
+        for index in range(5):
+            extension = rng.choice(['js', 'jsx', 'php', 'py'])
+            with open(os.path.join(work, f'module_{commit}_{index}.{extension}'), 'w') as file:
+                file.write('\n'.join(f'line_{line} = {rng.random()}' for line in range(200)))
+        # Binary assets and vendored files the scanner never reads
+        os.makedirs(os.path.join(work, 'assets'), exist_ok=True)
+        with open(os.path.join(work, 'assets', f'image_{commit}.png'), 'wb') as file:
+            file.write(os.urandom(200 * 1024))
+        git('add', '-A', cwd=work)
+        git('commit', '--quiet', '-m', f'commit {commit}', cwd=work)
+    git('clone', '--quiet', '--bare', work, path)
+    git('config', 'uploadpack.allowFilter', 'true', cwd=path)
+    shutil.rmtree(work)
+
+
+def current_path(urls, destination):
+    """What download_repository did before: a full clone per repo, one after another"""
+    for index, url in enumerate(urls):
+        os.system(f'git clone --quiet {url} {destination}/repo_{index}')
+
+
+def engine_path(urls, destination, workers):
+    with CloneEngine(max_workers=workers) as engine:
+        futures = [engine.submit(url, f'{destination}/repo_{index}') for index, url in enumerate(urls)]
+        results = [future.result() for future in futures]
+    failed = [result for result in results if result.returncode != 0]
+    for result in failed:
+        print(f"Clone failed ({result.returncode}): {result.url}: {result.error}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare full sequential clones with the clone engine')
+    parser.add_argument('--repos', type=int, default=12)
+    parser.add_argument('--commits', type=int, default=15)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    root = tempfile.mkdtemp(prefix='bench_clone_')
+    try:
+        print(f"Creating {args.repos} bare repos with {args.commits} commits each in {root}")
+        urls = []
+        for index in range(args.repos):
+            path = os.path.join(root, 'remote', f'repo_{index}.git')
+            create_bare_repo(path, args.commits, rng)
+            # file:// goes through the transport, so depth and filters apply as on GitHub
+            urls.append('file://' + path)
+
+        start = time.perf_counter()
+        current_path(urls, os.path.join(root, 'current'))
+        current_time = time.perf_counter() - start
+        current_bytes = directory_size(os.path.join(root, 'current'))
+
+        start = time.perf_counter()
+        results = engine_path(urls, os.path.join(root, 'engine'), args.workers)
+        engine_time = time.perf_counter() - start
+        engine_bytes = directory_size(os.path.join(root, 'engine'))
+
+        print(f"Full sequential clones: {current_time:6.2f}s, {current_bytes / 1024 / 1024:8.1f} MB")
+        print(f"Clone engine ({args.workers} workers, shallow + blob filter + sparse): "
+              f"{engine_time:6.2f}s, {engine_bytes / 1024 / 1024:8.1f} MB")
+        print(f"Per-clone: mean {sum(r.duration for r in results) / len(results):.2f}s, "
+              f"mean {sum(r.bytes for r in results) / len(results) / 1024:.0f} KB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
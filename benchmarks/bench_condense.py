@@ -0,0 +1,65 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Make the top-level scripts importable when running from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import agregator
+from bench_agregator_dataset import METRICS_DATASET, legacy_condense, rebuild_repos
+
+
+def best_of(rounds, function):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the row-wise impact parsing with the vectorized condensation')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--copies', type=int, default=10, help='Times the issues are repeated, to reach a large user')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench_condense_')
+    try:
+        base_dir = os.path.join(root, 'repos_v2')
+        dataset_dir = os.path.join(root, 'dataset')
+        with contextlib.redirect_stdout(io.StringIO()):
+            rebuild_repos(base_dir)
+            agregator.aggregate(base_dir, dataset_dir)
+        issues = agregator.load_table('issues', dataset_dir=dataset_dir)
+        # Every user's issues under one name: the size of a developer with many scanned repositories
+        issues = pd.concat([issues] * args.copies, ignore_index=True).drop(columns='user')
+        print(f"{len(issues)} issues from {METRICS_DATASET}")
+
+        legacy_time, legacy = best_of(args.rounds, lambda: legacy_condense(issues))
+        vectorized_time, vectorized = best_of(args.rounds, lambda: agregator.condense(issues, None))
+
+        # Same counts, whichever order the groups come out in
+        for sheet, expected in legacy.items():
+            keys = ['File Extension', 'Type']
+            expected = expected.astype({key: str for key in keys}).sort_values(keys).reset_index(drop=True)
+            actual = vectorized[sheet].astype({key: str for key in keys}).sort_values(keys).reset_index(drop=True)
+            pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_names=False)
+
+        print(f"Row-wise parse_impact: {legacy_time * 1000:8.1f} ms")
+        print(f"Vectorized condense:   {vectorized_time * 1000:8.1f} ms ({legacy_time / vectorized_time:.1f}x)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
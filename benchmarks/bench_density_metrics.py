@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Make the top-level scripts importable when running from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import density_metrics
+
+METRICS_CSV = os.path.join(ROOT, 'all_developer_metrics_workana_sonarqube.csv')
+PROGRAMMING_LANGUAGES = ['JavaScript', 'PHP', 'Python']
+
+
+def notebook_issue_density(df, severity, min_loc=density_metrics.MIN_LOC_THRESHOLD):
+    """calculate_issue_density as the notebook had it: a full-frame filter and scalar lookups per developer"""
+    issue_density = dict()
+    for developer in df['username'].unique():
+        developer_statistics = df[df['username'] == developer]
+        for lang in PROGRAMMING_LANGUAGES:
+            if developer_statistics[lang + '_exp_ordinal'].iloc[0] != 'NO_XP':
+                total_issues = developer_statistics[lang + '_' + severity + '_issues'].iloc[0]
+                total_loc = developer_statistics[lang + '_loc'].iloc[0]
+                if total_loc >= min_loc:
+                    developer_experience = developer_statistics[lang + '_exp_ordinal'].iloc[0]
+                    issue_density.setdefault(lang, {}).setdefault(developer_experience, []).append(total_issues / total_loc * 1000)
+
+    all_issue_densities = {lang: dict(lang_data) for lang, lang_data in issue_density.items()}
+    for lang in all_issue_densities:
+        for exp in all_issue_densities[lang]:
+            values = all_issue_densities[lang][exp]
+            q1 = np.percentile(values, 25)
+            q3 = np.percentile(values, 75)
+            iqr = q3 - q1
+            all_issue_densities[lang][exp] = [x for x in values if q1 - 1.5 * iqr <= x <= q3 + 1.5 * iqr]
+    average_densities = {lang: {exp: np.mean(densities) if densities else 0 for exp, densities in lang_data.items()}
+                         for lang, lang_data in all_issue_densities.items()}
+    return average_densities, all_issue_densities
+
+
+def assert_same(expected, actual):
+    if isinstance(expected, dict):
+        assert list(expected) == list(actual)
+        for key in expected:
+            assert_same(expected[key], actual[key])
+    elif isinstance(expected, (list, tuple)):
+        assert len(expected) == len(actual)
+        for a, b in zip(expected, actual):
+            assert_same(a, b)
+    else:
+        assert np.isclose(expected, actual, rtol=1e-12, atol=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the per-developer density loop with the long-table engine')
+    parser.add_argument('--copies', type=int, default=10, help='Times the developers are repeated, under new usernames')
+    args = parser.parse_args()
+
+    df = pd.read_csv(METRICS_CSV)
+    df = pd.concat([df.assign(username=df['username'] + f'-{copy}') for copy in range(args.copies)], ignore_index=True)
+    print(f"{len(df)} developers, {len(density_metrics.ISSUE_SEVERITIES)} severities")
+
+    start = time.perf_counter()
+    expected = {severity: notebook_issue_density(df, severity) for severity in density_metrics.ISSUE_SEVERITIES}
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = density_metrics.calculate_issue_densities(df, PROGRAMMING_LANGUAGES)
+    engine_time = time.perf_counter() - start
+
+    assert_same(expected, actual)
+    print(f"Per-developer loop: {loop_time * 1000:8.1f} ms")
+    print(f"Long-table engine:  {engine_time * 1000:8.1f} ms ({loop_time / engine_time:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
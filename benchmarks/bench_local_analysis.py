@@ -0,0 +1,129 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Make the top-level scripts importable when running from benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agregator import condense, read_user_reports
+from fetch_sonar_qube import generate_local_reports
+from local_analysis import analyze_repositories, local_analysis_executor
+
+PYTHON_FUNCTION = '''
+def handle_{name}(items, limit, verbose=False):
+    """Process the {name} items"""
+    total = 0
+    unused = {value}
+    for item in items:
+        if item > limit:
+            if verbose:
+                print("skipping {name}", item)
+            continue
+        elif item == {value}:
+            total += item * 2
+        else:
+            total += item
+    # TODO: cache the {name} totals
+    return total
+
+'''
+JAVASCRIPT_FUNCTION = '''
+export function handle{name}(items, limit, verbose) {{
+  let total = 0;
+  const unused = {value};
+  for (const item of items) {{
+    if (item > limit) {{
+      if (verbose) {{ console.log("skipping {name}", item); }}
+      continue;
+    }}
+    total += item === {value} ? item * 2 : item > 10 ? item : 0;
+  }}
+  return total;
+}}
+
+'''
+PHP_FUNCTION = '''
+function handle_{name}($items, $limit, $verbose = false) {{
+    $total = 0;
+    $unused = {value};
+    foreach ($items as $item) {{
+        if ($item > $limit) {{
+            if ($verbose) {{ echo "skipping {name}"; }}
+            continue;
+        }}
+        $total += $item == {value} ? $item * 2 : $item;
+    }}
+    return $total;
+}}
+
+'''
+TEMPLATES = {'.py': ('', PYTHON_FUNCTION), '.js': ('', JAVASCRIPT_FUNCTION), '.php': ('<?php\n', PHP_FUNCTION)}
+
+
+def create_repos(root, repos, files, functions, rng):
+    """repos repositories of files files each, a third of them in each language"""
+    paths = []
+    for repo in range(repos):
+        repo_path = os.path.join(root, 'repos_v2', f'dev{repo % 4}', f'repo{repo}')
+        for index in range(files):
+            extension = list(TEMPLATES)[index % len(TEMPLATES)]
+            header, function = TEMPLATES[extension]
+            os.makedirs(os.path.join(repo_path, 'src'), exist_ok=True)
+            with open(os.path.join(repo_path, 'src', f'module{index}{extension}'), 'w') as file:
+                file.write(header + ''.join(function.format(name=f'{index}_{number}', value=rng.randrange(100))
+                                            for number in range(functions)))
+        paths.append((repo_path, f'dev{repo % 4}_repo{repo}'))
+    return paths
+
+
+def timed(repos, executor):
+    start = time.perf_counter()
+    analyses = list(analyze_repositories(repos, executor))
+    return time.perf_counter() - start, analyses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local analysis in one process against the process pool')
+    parser.add_argument('--repos', type=int, default=12)
+    parser.add_argument('--files', type=int, default=30)
+    parser.add_argument('--functions', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench_local_analysis_')
+    try:
+        repos = create_repos(root, args.repos, args.files, args.functions, random.Random(0))
+        serial_time, expected = timed(repos, None)
+        with local_analysis_executor(args.workers) as executor:
+            pool_time, analyses = timed(repos, executor)
+        # Same files and issues whichever way the files were spread over the processes
+        assert analyses == expected
+
+        assert not any(analysis[4] for analysis in analyses)
+        loc = sum(int(measure['value']) for _, _, components, _, _ in analyses for component in components
+                  for measure in component['measures'] if measure['metric'] == 'ncloc')
+        issues = sum(len(analysis[3]) for analysis in analyses)
+        print(f"{args.repos * args.files} files, {loc} LOC, {issues} issues")
+        print(f"One process:        {serial_time:6.2f}s ({loc / serial_time:8.0f} LOC/s)")
+        print(f"{args.workers} worker processes: {pool_time:6.2f}s ({loc / pool_time:8.0f} LOC/s)")
+
+        # The reports go through agregator.py like SonarQube's: same columns, and every impact parses
+        for repo_path, project_key, components, issues, _ in analyses:
+            results_path = os.path.join(root, 'results-local', *project_key.split('_', 1))
+            os.makedirs(results_path, exist_ok=True)
+            generate_local_reports(project_key, results_path, components, issues)
+        frames, _ = read_user_reports(os.path.join(root, 'results-local', 'dev0'))
+        views = condense(frames['issues'].to_pandas(), frames['consolidated'].to_pandas())
+        assert 'Malformed Impacts' not in views
+        assert set(views['Condensed Consolidated']['File Extension']) == {'py', 'js', 'php'}
+        print(views['Condensed Issues'].to_string(index=False))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Make the top-level scripts importable when running from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import metrics_loader
+
+METRICS_DATASET = os.path.join(ROOT, 'metrics-dataset')
+CONDENSED_SHEETS = ['Condensed Consolidated', 'Condensed Issues', 'Condensed Issues by Impact']
+
+
+def read_excel_per_sheet(files):
+    """What the notebook did before: one pd.read_excel call per sheet, so three parses per workbook"""
+    reports = {}
+    for file in files:
+        reports[file] = {}
+        for sheet in CONDENSED_SHEETS:
+            try:
+                reports[file][sheet] = pd.read_excel(file, sheet_name=sheet)
+            except ValueError:
+                pass
+    return reports
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-sheet read_excel calls with the cached metrics loader')
+    parser.add_argument('--workers', type=int, default=metrics_loader.LOADER_WORKERS)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(METRICS_DATASET, '*_condensed_report.xlsx')))
+    cache_dir = tempfile.mkdtemp(prefix='bench_metrics_loader_')
+    try:
+        per_sheet_time, expected = timed(lambda: read_excel_per_sheet(files))
+        shutil.rmtree(cache_dir)
+        cold_time, cold = timed(lambda: metrics_loader.load_condensed_reports(files, cache_dir, args.workers))
+        warm_time, warm = timed(lambda: metrics_loader.load_condensed_reports(files, cache_dir, args.workers))
+
+        # The loader must hand back the same sheets before its timings mean anything
+        for reports in (cold, warm):
+            for file, sheets in expected.items():
+                for sheet, df in sheets.items():
+                    pd.testing.assert_frame_equal(df, reports[file][sheet], check_dtype=len(df) > 0)
+
+        print(f"{len(files)} condensed workbooks from {METRICS_DATASET}, {args.workers} workers")
+        print(f"read_excel per sheet:   {per_sheet_time:6.2f}s")
+        print(f"loader, cold cache:     {cold_time:6.2f}s ({per_sheet_time / cold_time:.1f}x)")
+        print(f"loader, warm cache:     {warm_time:6.2f}s ({per_sheet_time / warm_time:.1f}x)")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Make the top-level scripts importable when running from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import plot_builder
+from density_metrics import calculate_issue_densities
+from resampling import bootstrap_intervals
+
+METRICS_CSV = os.path.join(ROOT, plot_builder.METRICS_CSV)
+
+
+def specs_of(df, resamples):
+    densities_by_severity = calculate_issue_densities(df, plot_builder.PROGRAMMING_LANGUAGES)
+    intervals = bootstrap_intervals(densities_by_severity, plot_builder.EXPERIENCE_LEVELS, n_resamples=resamples,
+                                    seed=plot_builder.PLOT_SEED)
+    return plot_builder.figure_specs(densities_by_severity, intervals)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold, warm and incremental builds of the plots folder')
+    parser.add_argument('--workers', type=int, default=plot_builder.PLOT_WORKERS)
+    parser.add_argument('--resamples', type=int, default=1000)
+    args = parser.parse_args()
+
+    plot_builder.use_agg()
+    df = pd.read_csv(METRICS_CSV)
+    specs = specs_of(df, args.resamples)
+    work = tempfile.mkdtemp(prefix='bench_plots_')
+    try:
+        serial_time, rendered = timed(lambda: plot_builder.build_plots(specs, os.path.join(work, 'serial'), workers=1))
+        assert len(rendered) == len(specs)
+        pool_time, rendered = timed(lambda: plot_builder.build_plots(specs, os.path.join(work, 'pool'), workers=args.workers))
+        assert len(rendered) == len(specs)
+        warm_time, rendered = timed(lambda: plot_builder.build_plots(specs, os.path.join(work, 'pool'), workers=args.workers))
+        assert rendered == []
+
+        # One more PHP issue for one PHP developer: only figures with PHP densities of that severity change
+        changed = df.copy()
+        row = changed.index[changed['PHP_loc'] >= 1000][0]
+        changed.loc[row, 'PHP_low_issues'] += 1
+        changed.loc[row, 'PHP_total_issues'] += 1
+        changed_specs = specs_of(changed, args.resamples)
+        incremental_time, rendered = timed(lambda: plot_builder.build_plots(changed_specs, os.path.join(work, 'pool'),
+                                                                            workers=args.workers))
+        assert rendered and all('Low' in filename or 'Total' in filename for filename in rendered), rendered
+        assert not any(filename.endswith(('_JavaScript.png', '_Python.png')) for filename in rendered), rendered
+
+        print(f"{len(specs)} figures")
+        print(f"Cold, one process:      {serial_time:6.2f}s")
+        print(f"Cold, {args.workers} workers:        {pool_time:6.2f}s")
+        print(f"Warm, nothing changed:  {warm_time:6.2f}s")
+        print(f"One developer changed:  {incremental_time:6.2f}s ({len(rendered)} figures: {', '.join(sorted(rendered))})")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
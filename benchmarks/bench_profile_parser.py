@@ -0,0 +1,74 @@
+import glob
+import os
+import sys
+import time
+
+# Make the top-level scripts importable when running from benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import scraper
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+ROUNDS = 200
+
+
+class SavedPageDriver:
+    """Stands in for webdriver.Chrome, serving a saved profile page"""
+
+    def __init__(self, html):
+        self.page_source = html
+        self.current_url = None
+
+    def get(self, url):
+        self.current_url = url
+
+    def find_elements(self, by, selector):
+        return []
+
+    def execute_script(self, script, *args):
+        return 'complete'
+
+
+def load_fixtures():
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'workana_profile_*.html'))):
+        with open(path, mode='r', encoding='utf-8') as file:
+            fixtures.append((os.path.basename(path), file.read()))
+    return fixtures
+
+
+def profiles_per_second(parse, fixtures, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name, html in fixtures:
+            parse(name, html)
+    elapsed = time.perf_counter() - start
+    return rounds * len(fixtures) / elapsed
+
+
+def main():
+    fixtures = load_fixtures()
+    if not fixtures:
+        print(f"No fixtures found in {FIXTURES_DIR}")
+        return
+
+    # Both parsers must agree before their speed is worth comparing
+    for name, html in fixtures:
+        current = scraper.get_profile_data(SavedPageDriver(html), name)
+        fast = scraper.parse_profile(html, name)
+        if current != fast:
+            print(f"Parsers disagree on {name}:\n  current: {current}\n  fast:    {fast}")
+            return
+
+    current_rate = profiles_per_second(
+        lambda name, html: scraper.get_profile_data(SavedPageDriver(html), name), fixtures, ROUNDS)
+    fast_rate = profiles_per_second(lambda name, html: scraper.parse_profile(html, name), fixtures, ROUNDS)
+
+    print(f"Fixtures: {len(fixtures)}, rounds: {ROUNDS}")
+    print(f"get_profile_data (html.parser): {current_rate:,.1f} profiles/s")
+    print(f"parse_profile (lxml, single pass): {fast_rate:,.1f} profiles/s")
+    print(f"Speed-up: {fast_rate / current_rate:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
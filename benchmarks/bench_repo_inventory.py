@@ -0,0 +1,99 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make the top-level scripts importable when running from benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from git import Repo
+
+from repo_inventory import RepoInventory
+
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME='bench', GIT_AUTHOR_EMAIL='bench@example.com',
+               GIT_COMMITTER_NAME='bench', GIT_COMMITTER_EMAIL='bench@example.com')
+
+
+def git(*args, cwd=None):
+    subprocess.run(['git'] + list(args), cwd=cwd, env=GIT_ENV, check=True, capture_output=True)
+
+
+def create_template(path):
+    """One real clone, copied for every fake repository so they all carry a complete .git"""
+    git('init', '--quiet', path)
+    with open(os.path.join(path, 'index.js'), 'w') as file:
+        file.write('console.log(1);\n')
+    git('add', '-A', cwd=path)
+    git('commit', '--quiet', '-m', 'initial', cwd=path)
+    git('remote', 'add', 'origin', 'https://github.com/template/template.git', cwd=path)
+
+
+def create_repos(repos_dir, template, users, repos_per_user):
+    """users x repos_per_user copies of the template, each with its own remote URL and a report"""
+    for user in range(users):
+        for repo in range(repos_per_user):
+            path = os.path.join(repos_dir, f'user{user}', f'repo{repo}')
+            shutil.copytree(template, path)
+            config = os.path.join(path, '.git', 'config')
+            with open(config) as file:
+                text = file.read()
+            with open(config, 'w') as file:
+                file.write(text.replace('template/template', f'user{user}/repo{repo}'))
+            with open(os.path.join(path, f'user{user}_repo{repo}_consolidated.csv'), 'w') as file:
+                file.write('File Extension,Minor Issues,Major Issues,Critical Issues,Total LOC\n')
+
+
+def gitpython_remotes(repos_dir):
+    """What get_gihub_repo_links.py did: a listdir walk and a GitPython Repo per repository"""
+    remotes = {}
+    for username in os.listdir(repos_dir):
+        user_path = os.path.join(repos_dir, username)
+        if os.path.isdir(user_path):
+            for repo_name in os.listdir(user_path):
+                repo_path = os.path.join(user_path, repo_name)
+                if os.path.isdir(repo_path) and os.path.exists(os.path.join(repo_path, '.git')):
+                    remotes[(username, repo_name)] = next(Repo(repo_path).remote().urls)
+    return remotes
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Repository listing: GitPython per repo against the scandir inventory')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--repos-per-user', type=int, default=10)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='bench_inventory_')
+    try:
+        repos_dir = os.path.join(work, 'repos_v2')
+        create_template(os.path.join(work, 'template'))
+        create_repos(repos_dir, os.path.join(work, 'template'), args.users, args.repos_per_user)
+        count = args.users * args.repos_per_user
+        print(f"{count} repositories")
+
+        gitpython_time, expected = timed(lambda: gitpython_remotes(repos_dir))
+        cold_time, inventory = timed(lambda: RepoInventory(repos_dir).update())
+        warm_time, inventory = timed(lambda: RepoInventory(repos_dir).update())
+
+        # Same remotes before the timings mean anything
+        remotes = {(entry['user'], entry['repo']): entry['remote_url'] for entry in inventory.repos()}
+        assert remotes == expected
+        assert all(entry['reports'] and entry['head'] for entry in inventory.repos())
+
+        print(f"GitPython per repo: {gitpython_time * 1000:10.1f} ms")
+        print(f"Inventory, cold:    {cold_time * 1000:10.1f} ms")
+        print(f"Inventory, warm:    {warm_time * 1000:10.1f} ms ({gitpython_time / warm_time:.0f}x)")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
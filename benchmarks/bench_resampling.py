@@ -0,0 +1,108 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+# Make the top-level scripts importable when running from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import density_metrics
+import resampling
+
+METRICS_CSV = os.path.join(ROOT, 'all_developer_metrics_workana_sonarqube.csv')
+PROGRAMMING_LANGUAGES = ['JavaScript', 'PHP', 'Python']
+EXPERIENCE_LEVELS = ['<3', '3-5', '>5']
+
+
+def loop_bootstrap_intervals(densities_by_severity, n_resamples, confidence, seed):
+    """One resample at a time in Python, drawing from the same per-cell streams as the engine"""
+    cells = [(severity, language, experience, densities)
+             for severity, (_, all_densities) in densities_by_severity.items()
+             for language, by_experience in all_densities.items()
+             for experience, densities in by_experience.items()
+             if experience in EXPERIENCE_LEVELS and len(densities) > 0]
+    rows = []
+    for (severity, language, experience, densities), cell_seed in zip(cells, resampling.cell_seeds(seed, len(cells))):
+        rng = np.random.default_rng(cell_seed)
+        values = np.asarray(densities, dtype=float)
+        means = [values[rng.integers(0, len(values), size=len(values))].mean() for _ in range(n_resamples)]
+        tail = (1 - confidence) / 2 * 100
+        low, high = np.percentile(means, [tail, 100 - tail])
+        rows.append({'severity': severity, 'language': language, 'experience': experience, 'n': len(densities),
+                     'mean': np.mean(densities), 'ci_low': low, 'ci_high': high})
+    return pd.DataFrame(rows)
+
+
+def loop_trend_tests(densities_by_severity, n_resamples, seed):
+    """Spearman's rho recomputed from scratch for every shuffle of the experience ranks"""
+    cells = []
+    for severity, (_, all_densities) in densities_by_severity.items():
+        pooled_experience, pooled_densities = [], []
+        for language, by_experience in all_densities.items():
+            experience = [rank for rank, level in enumerate(EXPERIENCE_LEVELS) for _ in by_experience.get(level, [])]
+            densities = [density for level in EXPERIENCE_LEVELS for density in by_experience.get(level, [])]
+            cells.append((severity, language, experience, densities))
+            pooled_experience += experience
+            pooled_densities += densities
+        cells.append((severity, 'All', pooled_experience, pooled_densities))
+
+    rows = []
+    for (severity, language, experience, densities), cell_seed in zip(cells, resampling.cell_seeds(seed, len(cells))):
+        rng = np.random.default_rng(cell_seed)
+        x = rankdata(experience) - rankdata(experience).mean()
+        y = rankdata(densities) - rankdata(densities).mean()
+        if not (x ** 2).sum() or not (y ** 2).sum():
+            rho, p_value = np.nan, np.nan
+        else:
+            rho = np.corrcoef(x, y)[0, 1]
+            exceed = 0
+            for _ in range(n_resamples):
+                shuffled = x.copy()
+                rng.shuffle(shuffled)
+                exceed += abs(np.corrcoef(shuffled, y)[0, 1]) >= abs(rho) - 1e-12
+            p_value = (exceed + 1) / (n_resamples + 1)
+        rows.append({'severity': severity, 'language': language, 'n': len(densities), 'rho': rho, 'p_value': p_value})
+    return pd.DataFrame(rows)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-resample Python loops with the batched resampling engine')
+    parser.add_argument('--resamples', type=int, default=resampling.RESAMPLES)
+    parser.add_argument('--workers', type=int, default=resampling.RESAMPLING_WORKERS)
+    parser.add_argument('--seed', type=int, default=resampling.SEED)
+    args = parser.parse_args()
+
+    densities_by_severity = density_metrics.calculate_issue_densities(pd.read_csv(METRICS_CSV), PROGRAMMING_LANGUAGES)
+
+    loop_bootstrap_time, expected_intervals = timed(
+        lambda: loop_bootstrap_intervals(densities_by_severity, args.resamples, resampling.CONFIDENCE, args.seed))
+    bootstrap_time, intervals = timed(lambda: resampling.bootstrap_intervals(
+        densities_by_severity, EXPERIENCE_LEVELS, args.resamples, seed=args.seed, workers=args.workers))
+    loop_trend_time, expected_trends = timed(lambda: loop_trend_tests(densities_by_severity, args.resamples, args.seed))
+    trend_time, trends = timed(lambda: resampling.experience_trend_tests(
+        densities_by_severity, EXPERIENCE_LEVELS, args.resamples, seed=args.seed, workers=args.workers))
+
+    # Same seeds, same draws: the engine must agree with the loops before its timings mean anything
+    pd.testing.assert_frame_equal(expected_intervals, intervals, check_dtype=False, rtol=1e-9)
+    pd.testing.assert_frame_equal(expected_trends, trends, check_dtype=False, rtol=1e-9)
+
+    print(f"{len(intervals)} bootstrap cells, {len(trends)} permutation tests, {args.resamples} resamples, {args.workers} workers")
+    print(f"Bootstrap, loop:      {loop_bootstrap_time:7.2f}s")
+    print(f"Bootstrap, batched:   {bootstrap_time:7.2f}s ({loop_bootstrap_time / bootstrap_time:.0f}x)")
+    print(f"Permutation, loop:    {loop_trend_time:7.2f}s")
+    print(f"Permutation, batched: {trend_time:7.2f}s ({loop_trend_time / trend_time:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
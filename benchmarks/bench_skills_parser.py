@@ -0,0 +1,101 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Make the top-level scripts importable when running from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import skills_parser
+from skills_parser import NO_XP, UNDER_THREE_YEARS, THREE_TO_FIVE_YEARS, MORE_THAN_FIVE_YEARS
+
+PROFILES_CSV = os.path.join(ROOT, 'workana_profiles.csv')
+PROGRAMMING_LANGUAGES = ['JavaScript', 'PHP', 'Python']
+
+
+def notebook_extract_experience_ordinal(skill_str):
+    """extract_experience_ordinal as the notebook had it: two regexes and a chain of branches per skill"""
+    skills = skill_str.split(', ')
+    skill_dict = {}
+
+    def add_lang_experience(lang, years_start, years_end=None):
+        years_start = int(years_start)
+        years_end = int(years_end) if years_end else None
+        if 'sql' in lang.lower():
+            lang = 'SQL'
+        if 'html' in lang.lower():
+            lang = 'HTML'
+        if years_start == 1 and years_end == None:
+            years = UNDER_THREE_YEARS
+        elif years_start == 1 and years_end == 3:
+            years = UNDER_THREE_YEARS
+        elif years_start == 3 and years_end == 5:
+            years = THREE_TO_FIVE_YEARS
+        elif years_start == 5 and years_end == 10:
+            years = MORE_THAN_FIVE_YEARS
+        elif years_start == 10:
+            years = MORE_THAN_FIVE_YEARS
+        else:
+            raise ValueError(f"Unexpected year_start as {years_start} and year_end as {years_end}")
+        skill_dict[lang] = years
+
+    for skill in skills:
+        match = re.match(r'(.+?)\s*\((\d+)(?:\s*(?:to|a)\s*(\d+)?)?\s*(?:years?|anos?)\)', skill)
+        if match:
+            add_lang_experience(match.group(1).strip(), int(match.group(2)), match.group(3))
+        else:
+            match = re.match(r'(.+?)\s*\(\+(\d+)\s*(?:years?|anos?)\)', skill)
+            if match:
+                add_lang_experience(match.group(1).strip(), int(match.group(2)))
+    return skill_dict
+
+
+def synthetic_skills(count, seed):
+    """`count` skills strings of 1 to 10 skills each, drawn from the skills of the real profiles"""
+    real = pd.read_csv(PROFILES_CSV, sep=';')['skills'].dropna()
+    pool = np.array([skill for skills in real for skill in skills.split(', ')], dtype=object)
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 11, size=count)
+    picks = pool[rng.integers(0, len(pool), size=lengths.sum())]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return pd.Series([', '.join(picks[start:end]) for start, end in zip(bounds[:-1], bounds[1:])], dtype='str')
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Skills parsing throughput: per-row regexes against the exploded, per-distinct-skill parser')
+    parser.add_argument('--profiles', type=int, default=1_000_000)
+    parser.add_argument('--loop-profiles', type=int, default=100_000, help='Profiles given to the per-row loop, which is timed on a prefix')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    skills = synthetic_skills(args.profiles, args.seed)
+    print(f"{len(skills)} synthetic profiles, {skills.str.count(', ').sum() + len(skills)} skills")
+
+    prefix = skills.iloc[:args.loop_profiles]
+    loop_time, expected = timed(lambda: prefix.apply(notebook_extract_experience_ordinal))
+    parse_time, long = timed(lambda: skills_parser.parse_skills(skills, report_unmatched=False))
+    wide_time, wide = timed(lambda: skills_parser.experience_ordinals(long, PROGRAMMING_LANGUAGES, skills.index))
+
+    # The parser must give the loop's buckets before its throughput means anything
+    for language in PROGRAMMING_LANGUAGES:
+        assert (expected.apply(lambda x: x.get(language, NO_XP)) == wide[f'{language}_exp_ordinal'].iloc[:len(prefix)]).all(), language
+
+    print(f"Per-row loop:       {len(prefix) / loop_time:12,.0f} profiles/s ({len(prefix)} profiles in {loop_time:.2f}s)")
+    print(f"parse_skills:       {len(skills) / parse_time:12,.0f} profiles/s ({parse_time:.2f}s)")
+    print(f"experience_ordinals:{len(skills) / wide_time:12,.0f} profiles/s ({wide_time:.2f}s)")
+    print(f"Speed-up:           {(len(skills) / (parse_time + wide_time)) / (len(prefix) / loop_time):12.1f}x")
+
+
+if __name__ == '__main__':
+    main()
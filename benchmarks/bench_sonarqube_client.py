@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import requests
+
+# Make the top-level scripts and the mock server importable when running from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'other_tools_and_helpers'))
+
+from mock_sonarqube import MockSonarQube, generate_project, serve
+from sonarqube_client import SonarQubeClient
+from sonarqube_issues import IssueFetcher
+
+
+class TimedClient(SonarQubeClient):
+    """Records how long every request spends on the wire, leaving out the wait for a concurrency slot"""
+
+    latencies = []
+
+    def session_options(self):
+        async def on_start(session, context, params):
+            context.start = time.perf_counter()
+
+        async def on_end(session, context, params):
+            self.latencies.append(time.perf_counter() - context.start)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_start)
+        trace.on_request_end.append(on_end)
+        return dict(super().session_options(), trace_configs=[trace])
+
+
+def current_path(url, keys, latencies):
+    """What fetch_sonar_qube did before: bare requests calls on 4 threads, existence checked twice"""
+    def timed_get(request_url):
+        start = time.perf_counter()
+        response = requests.get(request_url, auth=('token', ''))
+        latencies.append(time.perf_counter() - start)
+        return response.json()
+
+    def fetch(key):
+        timed_get(f"{url}/api/projects/search?projects={key}")
+        timed_get(f"{url}/api/projects/search?projects={key}")
+        timed_get(f"{url}/api/issues/search?componentKeys={key}&ps=500")
+        timed_get(f"{url}/api/measures/component_tree?component={key}&metricKeys=ncloc")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(fetch, keys))
+
+
+async def client_path(url, keys, concurrency):
+    async with TimedClient(url, 'token', max_concurrency=concurrency) as client:
+        await client.existing_projects(keys)
+
+        async def fetch(key):
+            async for _ in IssueFetcher(client).iter_issues(key):
+                pass
+            await client.component_tree(key, 'ncloc')
+
+        await asyncio.gather(*(fetch(key) for key in keys))
+
+
+def summary(name, elapsed, latencies, projects):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<28} {elapsed:7.2f}s  {len(latencies):5d} requests  {len(latencies) / elapsed:7.1f} req/s  "
+          f"{projects / elapsed:6.1f} projects/s  latency p50 {statistics.median(latencies) * 1000:6.1f} ms  "
+          f"p95 {p95 * 1000:6.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare bare requests calls with the async SonarQube client')
+    parser.add_argument('--projects', type=int, default=200)
+    parser.add_argument('--issues', type=int, default=400)  # Under 500 so the old single call sees every issue
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    keys = [f'dev{i}_repo{i}' for i in range(args.projects)]
+    mock = MockSonarQube({key: generate_project(key, 50, args.issues) for key in keys}, args.latency)
+    server = serve(mock)
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    print(f"{args.projects} projects, {args.issues} issues each, {args.latency * 1000:.0f} ms server latency")
+
+    latencies = []
+    start = time.perf_counter()
+    current_path(url, keys, latencies)
+    summary('requests, 4 threads', time.perf_counter() - start, latencies, args.projects)
+
+    start = time.perf_counter()
+    asyncio.run(client_path(url, keys, args.concurrency))
+    summary(f'async client, {args.concurrency} in flight', time.perf_counter() - start, TimedClient.latencies, args.projects)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+# Make the top-level scripts importable when running from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'other_tools_and_helpers'))
+
+import fetch_sonar_qube
+import scan_scheduler
+from bench_clone_engine import create_bare_repo
+from clone_engine import CloneEngine, directory_size
+from mock_sonarqube import MockSonarQube, serve
+from pipeline_store import PipelineStore
+from scan_manifest import ScanManifest
+from stream_pipeline import StreamRepo, stream
+
+# Stand-in for sonar-scanner: a JVM-like startup, then an upload of the analyzed files to the mock's api/ce/submit
+STAND_IN_SCANNER = '''#!{python}
+import json, os, sys, time, urllib.parse, urllib.request
+properties = dict(argument[2:].split('=', 1) for argument in sys.argv[1:] if argument.startswith('-D'))
+time.sleep({startup})
+sources = properties['sonar.sources']
+files = [os.path.relpath(os.path.join(root, name), sources) for root, dirs, names in os.walk(sources)
+         if '.git' not in root.split(os.sep) for name in names if name.endswith(('.js', '.jsx', '.php', '.py'))]
+data = urllib.parse.urlencode({{'projectKey': properties['sonar.projectKey'], 'files': '\\n'.join(files),
+                                'duration': {analysis}}}).encode()
+task = json.load(urllib.request.urlopen(properties['sonar.host.url'] + '/api/ce/submit', data))
+with open(os.path.join(properties['sonar.working.directory'], 'report-task.txt'), 'w') as file:
+    file.write('projectKey=' + properties['sonar.projectKey'] + '\\nceTaskId=' + task['taskId'] + '\\n')
+'''
+
+
+def install_stand_in_scanner(root, startup, analysis):
+    path = os.path.join(root, 'sonar-scanner')
+    with open(path, 'w') as file:
+        file.write(STAND_IN_SCANNER.format(python=sys.executable, startup=startup, analysis=analysis))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    scan_scheduler.SCANNER_COMMAND = path
+    scan_scheduler.SCANNER_HOME = os.path.join(root, '.sonar')
+    scan_scheduler.SCANNER_WORK_ROOT = os.path.join(root, '.scannerwork')
+
+
+def batch_path(repos, root, url, workers):
+    """What the pipeline does today: clone everything into repos_v2, then scan it all"""
+    repos_dir = os.path.join(root, 'batch', 'repos_v2')
+    with CloneEngine(max_workers=workers) as engine:
+        futures = [engine.submit(repo.clone_url, os.path.join(repos_dir, repo.username, repo.repository)) for repo in repos]
+        for future in futures:
+            future.result()
+    peak = directory_size(repos_dir)
+
+    fetch_sonar_qube.SONARQUBE_URL = url
+    store = PipelineStore(os.path.join(root, 'batch', 'pipeline.db'))
+    try:
+        asyncio.run(fetch_sonar_qube.scan_repositories(fetch_sonar_qube.collect_repository_info(repos_dir),
+                                                       ScanManifest(os.path.join(root, 'batch', 'manifest.json')), store, False))
+    finally:
+        store.close()
+    return peak
+
+
+def stream_path(repos, root, url, workers, disk_budget, scan_queue):
+    os.makedirs(os.path.join(root, 'stream'))
+    store = PipelineStore(os.path.join(root, 'stream', 'pipeline.db'))
+    try:
+        pipeline = asyncio.run(stream(repos, store, url, 'token', os.path.join(root, 'stream', 'manifest.json'),
+                                    work_dir=os.path.join(root, 'stream', 'work'),
+                                    results_dir=os.path.join(root, 'stream', 'results'),
+                                    disk_budget=disk_budget, clone_workers=workers, scan_queue_size=scan_queue))
+    finally:
+        store.close()
+    return pipeline.counts, pipeline.budget.peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clone-then-scan against the streaming pipeline with a disk budget')
+    parser.add_argument('--repos', type=int, default=16)
+    parser.add_argument('--commits', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--disk-budget-mb', type=float, default=2.0)
+    parser.add_argument('--scan-queue', type=int, default=2)
+    parser.add_argument('--scanner-startup', type=float, default=0.5, help='Seconds the stand-in scanner takes before uploading')
+    parser.add_argument('--analysis', type=float, default=0.5, help='Seconds the mock server takes per background analysis')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    root = tempfile.mkdtemp(prefix='bench_stream_')
+    server = serve(MockSonarQube())
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        install_stand_in_scanner(root, args.scanner_startup, args.analysis)
+        print(f"Creating {args.repos} bare repos with {args.commits} commits each in {root}")
+        repos = []
+        for index in range(args.repos):
+            path = os.path.join(root, 'remote', f'repo_{index}.git')
+            create_bare_repo(path, args.commits, rng)
+            repos.append(StreamRepo(f'dev{index % 4}', f'repo_{index}', 'file://' + path, 0))
+
+        start = time.perf_counter()
+        batch_peak = batch_path(repos, root, url, args.workers)
+        batch_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        counts, stream_peak = stream_path(repos, root, url, args.workers, int(args.disk_budget_mb * 1024 ** 2), args.scan_queue)
+        stream_time = time.perf_counter() - start
+        assert counts['reported'] == len(repos), counts
+        assert not os.listdir(os.path.join(root, 'stream', 'work', 'dev0'))
+
+        # Same report files, in repos_v2 for one and in the results folder for the other
+        for repo in repos:
+            key = f'{repo.username}_{repo.repository}'
+            for suffix in ('issues', 'consolidated'):
+                batch_report = os.path.join(root, 'batch', 'repos_v2', repo.username, repo.repository, f'{key}_{suffix}.csv')
+                stream_report = os.path.join(root, 'stream', 'results', repo.username, repo.repository, f'{key}_{suffix}.csv')
+                assert os.path.exists(batch_report) and os.path.exists(stream_report), key
+
+        print(f"Clone all, then scan: {batch_time:6.2f}s, {batch_peak / 1024 / 1024:6.1f} MB of clones on disk at the end")
+        print(f"Streaming pipeline:   {stream_time:6.2f}s, {stream_peak / 1024 / 1024:6.1f} MB of working trees at the peak "
+              f"({args.disk_budget_mb:.1f} MB budget)")
+    finally:
+        server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
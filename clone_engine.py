@@ -0,0 +1,97 @@
+import os
+import shutil
+import subprocess
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Clone settings
+CLONE_WORKERS = 4
+CLONE_DEPTH = 1  # None clones the whole history
+CLONE_BLOB_FILTER = True  # Partial clone: blobs are only fetched for the files checked out
+# Same files as sonar.inclusions, the project files SonarJS and SonarPHP read their configuration from, and the
+# .mailmap git_history.py reads the authors through; None checks out everything
+SPARSE_PATTERNS = ['*.js', '*.jsx', '*.php', '*.py', 'package.json', 'tsconfig*.json', 'composer.json', '/.mailmap']
+
+CloneResult = namedtuple('CloneResult', ['url', 'path', 'returncode', 'duration', 'bytes', 'error'])
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def clone_commands(url, path, depth=CLONE_DEPTH, blob_filter=CLONE_BLOB_FILTER, sparse_patterns=SPARSE_PATTERNS):
+    clone = ['git', 'clone', '--quiet']
+    if depth:
+        clone += ['--depth', str(depth)]
+    if blob_filter:
+        clone += ['--filter=blob:none']
+    if sparse_patterns:
+        clone += ['--no-checkout']
+    commands = [clone + [url, path]]
+
+    if sparse_patterns:
+        # Restrict the working tree before the checkout so other blobs are never downloaded
+        commands.append(['git', '-C', path, 'sparse-checkout', 'set', '--no-cone'] + list(sparse_patterns))
+        commands.append(['git', '-C', path, 'checkout', '--quiet'])
+    return commands
+
+
+def clone_repository(url, path, depth=CLONE_DEPTH, blob_filter=CLONE_BLOB_FILTER, sparse_patterns=SPARSE_PATTERNS):
+    """Clone `url` into `path` and report how it went.
+
+    A failed clone is removed so it does not look like a downloaded repository
+    on the next run; a directory that was already there is left alone.
+    """
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    existed = os.path.exists(path)
+
+    for command in clone_commands(url, path, depth, blob_filter, sparse_patterns):
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            if not existed:
+                shutil.rmtree(path, ignore_errors=True)
+            return CloneResult(url, path, completed.returncode, time.perf_counter() - start, 0, completed.stderr.strip())
+
+    return CloneResult(url, path, 0, time.perf_counter() - start, directory_size(path), '')
+
+
+def is_shallow(path):
+    completed = subprocess.run(['git', '-C', path, 'rev-parse', '--is-shallow-repository'], capture_output=True, text=True)
+    return completed.stdout.strip() == 'true'
+
+
+def deepen_repository(path):
+    """Fetch the whole history of a shallow clone; returns whether the clone now has it"""
+    completed = subprocess.run(['git', '-C', path, 'fetch', '--quiet', '--unshallow'], capture_output=True, text=True)
+    return completed.returncode == 0
+
+
+class CloneEngine:
+    """Runs clones on a bounded worker pool while the caller keeps working"""
+
+    def __init__(self, max_workers=CLONE_WORKERS, depth=CLONE_DEPTH, blob_filter=CLONE_BLOB_FILTER,
+                 sparse_patterns=SPARSE_PATTERNS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.options = {'depth': depth, 'blob_filter': blob_filter, 'sparse_patterns': sparse_patterns}
+
+    def submit(self, url, path):
+        """Queue a clone; returns a future resolving to its CloneResult"""
+        return self.executor.submit(clone_repository, url, path, **self.options)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+MIN_LOC_THRESHOLD = 1000  # Developers with less code in a language are left out of its densities
+ISSUE_SEVERITIES = ['total', 'high', 'medium', 'low', 'reliability', 'maintainability']
+OUTLIER_IQR_FACTOR = 1.5
+# The analysis notebook compared the experience columns against this literal, while the profiles hold
+# NO_XP = "No experience"; nobody is excluded, and keeping the literal keeps the published densities
+EXCLUDED_EXPERIENCE = 'NO_XP'
+
+KEYS = ['severity', 'language', 'experience']
+
+
+def long_metrics(df, languages, severities=ISSUE_SEVERITIES):
+    """The wide <Lang>_exp_ordinal / <Lang>_loc / <Lang>_<severity>_issues columns as one row per
+    (developer, language, severity), in developer then language order.
+
+    A developer listed more than once counts with their first row, as in the notebook.
+    """
+    fields = ['exp_ordinal', 'loc'] + [f'{severity}_issues' for severity in severities]
+    wide = df.drop_duplicates('username').set_index('username')[[f'{language}_{field}' for language in languages for field in fields]]
+    wide.columns = pd.MultiIndex.from_product([languages, fields], names=['language', 'field'])
+    per_language = wide.stack('language', future_stack=True).reset_index()
+    per_language = per_language.rename(columns={'exp_ordinal': 'experience', **{f'{severity}_issues': severity for severity in severities}})
+    long = per_language.melt(id_vars=['username', 'language', 'experience', 'loc'], value_vars=severities,
+                             var_name='severity', value_name='issues')
+    # melt stacks the severities one after another; the developer then language order is kept within each
+    return long
+
+
+def issue_densities(long, min_loc=MIN_LOC_THRESHOLD, excluded_experience=EXCLUDED_EXPERIENCE, outlier_removal=True):
+    """Issues per 1000 LOC of every developer, language and severity with at least `min_loc` LOC.
+
+    'kept' marks the densities within OUTLIER_IQR_FACTOR interquartile ranges of
+    their (severity, language, experience) group; a group with a missing issue
+    count keeps none, as np.percentile gives NaN bounds for it.
+    """
+    rows = long[(long['experience'] != excluded_experience) & (long['loc'] >= min_loc)].copy()
+    rows['density'] = rows['issues'] / rows['loc'] * 1000
+    if not outlier_removal:
+        rows['kept'] = True
+        return rows
+
+    grouped = rows.groupby(KEYS, sort=False, dropna=False)['density']
+    q1 = grouped.transform('quantile', 0.25)
+    q3 = grouped.transform('quantile', 0.75)
+    iqr = q3 - q1
+    incomplete = rows['density'].isna().groupby([rows[key] for key in KEYS], sort=False, dropna=False).transform('any')
+    rows['kept'] = rows['density'].between(q1 - OUTLIER_IQR_FACTOR * iqr, q3 + OUTLIER_IQR_FACTOR * iqr) & ~incomplete
+    return rows
+
+
+def density_dicts(densities):
+    """{severity: (average_densities, all_densities)} in the notebook's shapes:
+    {language: {experience: mean}} and {language: {experience: [densities]}}.
+
+    Languages and experiences come in the order the notebook's loops met them.
+    """
+    kept = densities[densities['kept']]
+    # Groups whose densities were all removed still appear, with an empty list and a mean of 0
+    values = kept.groupby(KEYS, sort=False, dropna=False)['density'].agg(list)
+    values = values.reindex(densities.groupby(KEYS, sort=False, dropna=False).size().index)
+
+    results = {severity: ({}, {}) for severity in densities['severity'].unique()}
+    for (severity, language, experience), group in values.items():
+        group = group if isinstance(group, list) else []
+        average, all_densities = results[severity]
+        average.setdefault(language, {})[experience] = np.mean(group) if group else 0
+        all_densities.setdefault(language, {})[experience] = group
+    return results
+
+
+def calculate_issue_densities(df, languages, severities=ISSUE_SEVERITIES, min_loc=MIN_LOC_THRESHOLD,
+                              excluded_experience=EXCLUDED_EXPERIENCE, outlier_removal=True):
+    """(average_densities, all_densities) for every severity from one reshape and one grouping of `df`"""
+    densities = issue_densities(long_metrics(df, languages, severities), min_loc, excluded_experience, outlier_removal)
+    results = density_dicts(densities)
+    return {severity: results.get(severity, ({}, {})) for severity in severities}
+
+
+def developer_density_matrix(df, languages, severity='total', excluded_experience=EXCLUDED_EXPERIENCE):
+    """Issue density per developer (rows) and language (columns) wherever the developer has code in it"""
+    long = long_metrics(df, languages, [severity])
+    rows = long[(long['experience'] != excluded_experience) & (long['loc'] > 0)]
+    matrix = pd.DataFrame({'username': rows['username'], 'language': rows['language'],
+                           'density': rows['issues'] / rows['loc'] * 1000})
+    matrix = matrix.pivot(index='username', columns='language', values='density')
+    # Every developer gets a row, and the languages keep the order the notebook's loop met them
+    matrix = matrix.reindex(index=long['username'].unique(), columns=rows['language'].unique())
+    matrix.index.name = None
+    matrix.columns.name = None
+    return matrix
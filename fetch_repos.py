@@ -1,9 +1,17 @@
-import csv
 import os
+import shutil
 import requests
 from github import Github
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from clone_engine import CloneEngine, CloneResult, clone_repository, deepen_repository, is_shallow
+from github_cache import ResponseCache, install_github_cache
+from github_graphql import GitHubGraphQL, RepoMetadata, RepositoryMetadataEngine
+from git_history import ANALYSIS_WORKERS, analyze_repositories
+from pipeline_store import STORE_FILE, PipelineStore
+from skills_parser import skill_names
 
 # Constants
 CSV_FILE = 'workana_profiles.csv'
@@ -12,13 +20,28 @@ GITHUB_TOKEN = 'GITHUB_TOKEN'  # Replace with your GitHub token
 ALLOWED_LANGUAGES = ['javascript', 'python', 'php']
 REPO_PER_USER = 5
 EXCEL_REPORT = 'collected_repos_report.xlsx'
+METADATA_ENGINE = 'graphql'  # 'graphql' batches users into few queries, 'rest' is one call per repo
+GITHUB_GRAPHQL_URL = 'https://api.github.com/graphql'
+CLONE_WORKERS = 4
+USE_RESPONSE_CACHE = True  # Keep GitHub responses on disk and revalidate them with conditional requests
+CACHE_FILE = 'github_cache.db'
+# 'api' checks languages and authors through GitHub; 'local' clones the candidates
+# (full history, no blobs outside the scanned files) and checks them from git
+SELECTION_MODE = 'api'
+STAGING_FOLDER = 'repos_staging'  # Candidates wait here until the local checks pass
+AUTHOR_RULES = {'normalise': True, 'skip_bots': True, 'merge_by_name': True}
+# With True, selected repos are only recorded in the store: stream_pipeline.py clones, scans and deletes
+# them within a disk budget, instead of every clone being kept in REPO_FOLDER for fetch_sonar_qube.py
+STREAM_CLONES = False
 
 # Initialize GitHub API client
+response_cache = ResponseCache(CACHE_FILE) if USE_RESPONSE_CACHE else None
+cache_adapter = install_github_cache(response_cache, post_urls=[GITHUB_GRAPHQL_URL]) if response_cache else None
 g = Github(GITHUB_TOKEN)
 log_file = open("fetch_repos.txt", "a")
 
-# Add this new list at the top level to store report data
-report_data = []
+# Candidate repos and clones are recorded here as they are decided, and the report is exported from it
+store = PipelineStore(STORE_FILE)
 
 # function that prints message and write it to a file
 def log_m(message):
@@ -26,73 +49,222 @@ def log_m(message):
     log_file.write(message + '\n')
 
 
-def read_csv(file_path):
-    freelancers = []
-    with open(file_path, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file, delimiter=';')
-        for row in reader:
-            freelancers.append(row)
-    return freelancers
-
 def get_github_username(url):
     return url.rstrip('/').split('/')[-1]
 
 def get_repo_languages(repo):
+    if isinstance(repo, RepoMetadata):
+        return [lang.lower() for lang in repo.languages.keys()]
     languages = repo.get_languages()
     return [lang.lower() for lang in languages.keys()]
 
 def download_repository(repo_url, repo_name, user):
-    os.system(f'git clone {repo_url} {REPO_FOLDER}/{user}/{repo_name}')
+    result = clone_repository(repo_url, f'{REPO_FOLDER}/{user}/{repo_name}')
+    return result.returncode
+
+def log_clone_result(result):
+    if result.returncode == 0:
+        log_m(f"Cloned {result.url} in {result.duration:.1f}s ({result.bytes / 1024 / 1024:.1f} MB)")
+    else:
+        log_m(f"Failed to clone {result.url} (exit status {result.returncode}): {result.error}")
 
 def has_single_author(repo):
+    if isinstance(repo, RepoMetadata):
+        if repo.contributor_count is not None:
+            return repo.contributor_count == 1
+        # The sampled history was not enough to tell, ask the contributors endpoint
+        repo = g.get_repo(repo.full_name)
     contributors = repo.get_contributors()
     return contributors.totalCount == 1
 
 def has_allowed_languages(repo_languages):
     return any(language.lower() in repo_languages for language in ALLOWED_LANGUAGES)
 
+def is_recent_own_repo(repo):
+    """Checks answered by the repository listing itself, without extra API calls"""
+    # Check if repo had activity in the past 5 years
+    if repo.pushed_at < datetime.now(repo.pushed_at.tzinfo) - timedelta(days=5*365):
+        log_m(f"Skipping repository with no activity in the past 5 years: {repo.name}")
+        log_m("\n")
+        return False
+
+    if repo.fork:
+        log_m(f"Skipping forked repository: {repo.name}")
+        log_m("\n")
+        return False
+
+    return True
+
+def record_candidate(github_username, repo, repo_languages, reason=None):
+    """Store the selection decision on a repository; a reason means it was skipped"""
+    store.record_candidate(github_username, repo.name, repo_languages, reason is None, reason, repo.clone_url, repo.size)
+
+def record_existing_clone(github_username, repo):
+    # Cloned by an earlier run, possibly before the store existed
+    if not store.is_cloned(github_username, repo.name):
+        store.record_clone(github_username, repo.name, CloneResult(repo.clone_url, f'{REPO_FOLDER}/{github_username}/{repo.name}', 0, 0.0, None, None))
+
+def iter_candidates(github_username, repos):
+    for repo in repos:
+        log_m(f"Repo: {repo.name}. Size: {repo.size}")
+        if is_recent_own_repo(repo):
+            yield repo
+        else:
+            record_candidate(github_username, repo, [], 'inactive or fork')
+
+def collect_repos_locally(github_username, repos, clone_engine, analysis_executor):
+    """Select repositories from their clones instead of per-repo API calls.
+
+    Candidates are cloned in waves of as many repos as are still missing, the
+    clones are analyzed in a process pool, and accepted clones are moved to
+    REPO_FOLDER while rejected ones are deleted.
+    """
+    collected_repos = 0
+    candidates = iter_candidates(github_username, repos)
+
+    while collected_repos < REPO_PER_USER:
+        wave = list(islice(candidates, REPO_PER_USER - collected_repos))
+        if not wave:
+            break
+
+        futures = {}
+        for repo in wave:
+            if not os.path.exists(f'{REPO_FOLDER}/{github_username}/{repo.name}'):
+                futures[repo.name] = clone_engine.submit(repo.clone_url, f'{STAGING_FOLDER}/{github_username}/{repo.name}')
+
+        cloned = []
+        api_checked = []
+        results = {}
+        for repo in wave:
+            final_path = f'{REPO_FOLDER}/{github_username}/{repo.name}'
+            if repo.name not in futures:
+                # Clones made for the scan only have their last commit, whose author always passes the author check
+                if is_shallow(final_path) and not deepen_repository(final_path):
+                    log_m(f"Could not fetch the history of {repo.name}, checking it through the API")
+                    api_checked.append(repo)
+                else:
+                    cloned.append((repo, final_path))
+                continue
+            result = results[repo.name] = futures[repo.name].result()
+            log_clone_result(result)
+            if result.returncode == 0:
+                cloned.append((repo, result.path))
+            else:
+                store.record_clone(github_username, repo.name, result)
+
+        analyses = analyze_repositories([path for _, path in cloned], analysis_executor, **AUTHOR_RULES)
+
+        checks = []
+        for (repo, path), analysis in zip(cloned, analyses):
+            log_m(f"Languages in repo: {analysis['languages']}")
+            log_m(f"Distinct authors in {analysis['commits']} commits: {analysis['author_count']}")
+            checks.append((repo, path, list(analysis['languages'].keys()), analysis['author_count'] == 1))
+        for repo in api_checked:
+            repo_languages = get_repo_languages(repo)
+            log_m(f"Languages in repo: {repo_languages}")
+            checks.append((repo, f'{REPO_FOLDER}/{github_username}/{repo.name}', repo_languages, has_single_author(repo)))
+
+        for repo, path, repo_languages, single_author in checks:
+            final_path = f'{REPO_FOLDER}/{github_username}/{repo.name}'
+            has_languages = has_allowed_languages(repo_languages)
+
+            if has_languages and single_author:
+                record_candidate(github_username, repo, repo_languages)
+                if path == final_path:
+                    log_m(f'Repository already downloaded: {repo.name}')
+                    record_existing_clone(github_username, repo)
+                else:
+                    log_m(f'Keeping repository: {repo.name}')
+                    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                    os.replace(path, final_path)
+                    store.record_clone(github_username, repo.name, results[repo.name]._replace(path=final_path))
+                collected_repos += 1
+            else:
+                if not has_languages:
+                    log_m(f'Repository skipped. No relevant languages found: {repo_languages}')
+                    record_candidate(github_username, repo, repo_languages, 'no allowed languages')
+                else:
+                    log_m(f'Repository skipped. There is no single author: {single_author}')
+                    record_candidate(github_username, repo, repo_languages, 'not a single author')
+                if path != final_path:
+                    shutil.rmtree(path, ignore_errors=True)
+            log_m("\n")
+
+    return collected_repos
+
+def get_skills(freelancers):
+    """Lower-cased skill names of every freelancer, from one pass over the whole skills column"""
+    return skill_names(pd.Series([freelancer['skills'] for freelancer in freelancers], dtype='str'))
+
+def has_allowed_skills(skills):
+    return any(allowed_language in skills for allowed_language in ALLOWED_LANGUAGES)
+
+def create_metadata_engine(freelancers, skills):
+    """Batched GraphQL metadata source for every user that passes the skills check"""
+    session = requests.Session()
+    if cache_adapter:
+        session.mount('https://', cache_adapter)
+    engine = RepositoryMetadataEngine(GitHubGraphQL(GITHUB_TOKEN, GITHUB_GRAPHQL_URL, session=session))
+    engine.schedule(get_github_username(freelancer['github']) for freelancer, freelancer_skills in zip(freelancers, skills)
+                    if has_allowed_skills(freelancer_skills))
+    return engine
+
+def get_user_repos(github_username, metadata_engine=None):
+    if metadata_engine is None:
+        return g.get_user(github_username).get_repos()
+    repos = metadata_engine.repositories(github_username)
+    if repos is None:
+        raise LookupError(f"GitHub user {github_username} not found")
+    return repos
+
 def main():
     if not os.path.exists(REPO_FOLDER):
         os.makedirs(REPO_FOLDER)
 
-    freelancers = read_csv(CSV_FILE)
+    # Profiles come from the store; the CSV is only read to fill a new store
+    store.import_profiles_csv(CSV_FILE)
+    freelancers = store.profiles()
+    freelancer_skills = get_skills(freelancers)
+    metadata_engine = create_metadata_engine(freelancers, freelancer_skills) if METADATA_ENGINE == 'graphql' else None
+    # Clones run in the background while the metadata scan goes on
+    clone_engine = CloneEngine(max_workers=CLONE_WORKERS)
+    pending_clones = {}
+    if SELECTION_MODE == 'local':
+        # Author checks need the commit history, not just the last commit
+        local_clone_engine = CloneEngine(max_workers=CLONE_WORKERS, depth=None)
+        analysis_executor = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
 
-    for freelancer in freelancers:
+    for freelancer, skills in zip(freelancers, freelancer_skills):
         github_username = get_github_username(freelancer['github'])
-        skills = [skill.split('(')[0].strip().lower() for skill in freelancer['skills'].split(',')]
         
         try:
-            user = g.get_user(github_username)
-            repos = user.get_repos()
-            # Sort by largest size first
-            repos = sorted(repos, key=lambda x: (x.size * -1))
-            collected_repos = 0
-
-            log_m(f"User: {user}")
+            log_m(f"User: {github_username}")
             log_m(f"Skills: {skills}")
 
             # Check if user has any of the skills
-            if not any(allowed_language in skills for allowed_language in ALLOWED_LANGUAGES):
-                log_m(f"User {user} does not have any of the allowed languages. Skipping. It have the languages: {skills}")
+            if not has_allowed_skills(skills):
+                log_m(f"User {github_username} does not have any of the allowed languages. Skipping. It have the languages: {skills}")
                 log_m("\n")
                 log_m("\n")
                 continue
 
+            repos = get_user_repos(github_username, metadata_engine)
+            # Sort by largest size first
+            repos = sorted(repos, key=lambda x: (x.size * -1))
+            collected_repos = 0
+
+            if SELECTION_MODE == 'local':
+                collected_repos = collect_repos_locally(github_username, repos, local_clone_engine, analysis_executor)
+                repos = []  # Already selected from their clones
+
             for repo in repos:
                 if collected_repos >= REPO_PER_USER:
                     break
                 
                 log_m(f"Repo: {repo.name}. Size: {repo.size}")
 
-                # Check if repo had activity in the past 5 years
-                if repo.pushed_at < datetime.now(repo.pushed_at.tzinfo) - timedelta(days=5*365):
-                    log_m(f"Skipping repository with no activity in the past 5 years: {repo.name}")
-                    log_m("\n")
-                    continue
-
-                if repo.fork:
-                    log_m(f"Skipping forked repository: {repo.name}")
-                    log_m("\n")
+                if not is_recent_own_repo(repo):
+                    record_candidate(github_username, repo, [], 'inactive or fork')
                     continue
 
                 repo_languages = get_repo_languages(repo)
@@ -104,39 +276,49 @@ def main():
                 
                 if has_languages and single_author:
                     log_m(f'Downloading repository: {repo.name}')
-                    if not os.path.exists(f'{REPO_FOLDER}/{github_username}/{repo.name}'):
-                        download_repository(repo.clone_url, repo.name, github_username)
-                        # Add repository info to report data with binary language flags
-                        report_data.append({
-                            'username': github_username,
-                            'repository': repo.name,
-                            'javascript': 1 if 'javascript' in repo_languages else 0,
-                            'python': 1 if 'python' in repo_languages else 0,
-                            'php': 1 if 'php' in repo_languages else 0
-                        })
+                    record_candidate(github_username, repo, repo_languages)
+                    if STREAM_CLONES:
+                        log_m(f'Left to the streaming pipeline: {repo.name}')
+                    elif not os.path.exists(f'{REPO_FOLDER}/{github_username}/{repo.name}'):
+                        future = clone_engine.submit(repo.clone_url, f'{REPO_FOLDER}/{github_username}/{repo.name}')
+                        # Recorded once the clone finishes
+                        pending_clones[future] = (github_username, repo.name)
                     else:
                         log_m(f'Repository already downloaded: {repo.name}')
+                        record_existing_clone(github_username, repo)
                     collected_repos += 1
                 elif not has_languages:
                     log_m(f'Repository skipped. No relevant languages found: {repo_languages}')
+                    record_candidate(github_username, repo, repo_languages, 'no allowed languages')
                 elif not single_author:
                     log_m(f'Repository skipped. There is no single author: {single_author}')
+                    record_candidate(github_username, repo, repo_languages, 'not a single author')
                 
                 log_m("\n")
 
-            log_m(f"Collected {collected_repos} repositories from user {user}")
+            log_m(f"Collected {collected_repos} repositories from user {github_username}")
             log_m("\n")
             log_m("\n")
 
         except Exception as e:
             log_m(f"Error processing user {freelancer['name']}: {e}")
 
-    # Create and save the report at the end of main()
-    if report_data:
-        df = pd.DataFrame(report_data)
-        df.to_excel(EXCEL_REPORT, index=False)
-        log_m(f"Report saved to {EXCEL_REPORT}")
+    for future, (github_username, repo_name) in pending_clones.items():
+        result = future.result()
+        log_clone_result(result)
+        store.record_clone(github_username, repo_name, result)
+    clone_engine.shutdown()
+    if SELECTION_MODE == 'local':
+        local_clone_engine.shutdown()
+        analysis_executor.shutdown()
+
+    # The report is an export of every selected and cloned repository in the store
+    store.export_repos_report(EXCEL_REPORT)
+
+    if response_cache:
+        log_m(response_cache.stats())
 
 if __name__ == '__main__':
     main()
+    store.close()
     log_file.close()
@@ -1,190 +1,406 @@
-import requests
+import argparse
+import asyncio
 import csv
 import os
-import sys
 from collections import defaultdict
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from local_analysis import (LOCAL_ANALYSIS_ID, LOCAL_ANALYSIS_WORKERS, analyze_repositories, analyze_repository,
+                            local_analysis_executor)
+from pipeline_store import STORE_FILE, PipelineStore
+from repo_inventory import load_inventory
+from scan_manifest import MANIFEST_FILE, ScanManifest, fingerprint_repositories
+from scan_scheduler import BATCH_KEY_PREFIX, ScanScheduler, plan_scan_jobs
+from sonarqube_ce import CETaskError, CETaskTracker
+from sonarqube_client import SonarQubeClient, SonarQubeError
+from sonarqube_issues import IssueFetcher
 
 # SonarQube server details
 SONARQUBE_URL = 'http://localhost:9001'
 SONARQUBE_TOKEN = 'SONARQUBE_TOKEN'  # Replace with your SonarQube token
 
-# Metrics to fetch
-METRICS = 'ncloc'
+# Metrics to fetch for every file, and the consolidated report column each one is summed into
+METRIC_COLUMNS = {
+    'ncloc': 'Total LOC',
+    'complexity': 'Complexity',
+    'cognitive_complexity': 'Cognitive Complexity',
+    'duplicated_lines': 'Duplicated Lines',
+}
+METRICS = ','.join(METRIC_COLUMNS)
 
-def get_project_issues(project_key):
-    url = f"{SONARQUBE_URL}/api/issues/search?componentKeys={project_key}&ps=500"
-    response = requests.get(url, auth=(SONARQUBE_TOKEN, ''))
-    return response.json()
+# Software qualities an issue can impact, and the issues report column holding the impact severity for each
+IMPACT_COLUMNS = {
+    'RELIABILITY': 'Reliability Impact',
+    'MAINTAINABILITY': 'Maintainability Impact',
+    'SECURITY': 'Security Impact',
+}
 
-def get_file_metrics(project_key):
-    url = f"{SONARQUBE_URL}/api/measures/component_tree?component={project_key}&metricKeys={METRICS}"
-    response = requests.get(url, auth=(SONARQUBE_TOKEN, ''))
+# Concurrent page requests per issue search
+ISSUE_FETCH_WORKERS = 4
 
-    return response.json()
+# 'sonarqube' scans with the server; 'local' measures the files and checks a subset of its rules in-process (local_analysis.py)
+ANALYSIS_BACKEND = 'sonarqube'
+# The local backend writes to <LOCAL_RESULTS_FOLDER>/<user>/<repo>/ and keeps its own manifest, so SonarQube's reports are never replaced
+LOCAL_RESULTS_FOLDER = 'results-local'
+LOCAL_MANIFEST_FILE = 'local_scan_manifest.json'
 
-def generate_reports(project_key, dir, recursions=0):
-    issues_data = get_project_issues(project_key)
-    file_metrics_data = get_file_metrics(project_key)
+def get_project_issues(client, project_key):
+    """Every issue of the project, yielded page by page"""
+    return IssueFetcher(client, workers=ISSUE_FETCH_WORKERS).iter_issues(project_key)
 
-    if len(file_metrics_data['components']) == 0:
-        if recursions >= 3:
-            print(f"Repository {project_key} couldn't be analyzed")
-            return
-        
-        time.sleep(20)
-        return generate_reports(project_key, dir, recursions+1)
-
-    # Detailed issues report
-    issues_file = f'{dir}/{project_key}_issues.csv'
-    with open(issues_file, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow(['Key', 'Component', 'File Extension', 'Rule', 'Type', 'Impact', 'Severity', 'Status', 'Message'])
-        for issue in issues_data['issues']:
-            component = issue['component']
-            file_extension = component.split('.')[-1] if '.' in component else 'unknown'
-            writer.writerow([
-                issue['key'], component, file_extension, issue['rule'], issue['type'], issue['impacts'],
-                issue['severity'], issue['status'], issue['message']
-            ])
-
-    # Consolidated report by file extension
-    consolidated_data = defaultdict(lambda: {'minor': 0, 'major': 0, 'critical': 0, 'loc': 0})
-
-    # Populate the consolidated data with issues
-    for issue in issues_data['issues']:
+def get_file_metrics(client, component):
+    """Every file of the project (or directory) with its METRICS, yielded page by page"""
+    return client.iter_files(component, METRICS)
+
+class ProjectReports:
+    """Issues CSV and consolidated counts of one repository, filled as files and issues arrive.
+
+    Only the per-extension counters are kept in memory, whatever the size of the repository.
+    """
+
+    def __init__(self, project_key, dir):
+        self.issues_file = f'{dir}/{project_key}_issues.csv'
+        self.consolidated_file = f'{dir}/{project_key}_consolidated.csv'
+        self.files = 0
+
+        # Consolidated report by file extension
+        self.consolidated_data = defaultdict(lambda: dict({'minor': 0, 'major': 0, 'critical': 0}, **{metric: 0 for metric in METRIC_COLUMNS}))
+
+        self.file = None
+        self.writer = None
+
+    def open_issues(self):
+        # Detailed issues report, written as the issues arrive while the consolidated data is counted
+        self.file = open(self.issues_file, mode='w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        # 'Impact' keeps the raw impacts list; the IMPACT_COLUMNS have it one column per software quality
+        self.writer.writerow(['Key', 'Component', 'File Extension', 'Rule', 'Type', 'Impact', 'Severity', 'Status', 'Message']
+                             + list(IMPACT_COLUMNS.values()))
+
+    def add_issue(self, issue):
+        if self.writer is None:
+            self.open_issues()
         component = issue['component']
         file_extension = component.split('.')[-1] if '.' in component else 'unknown'
+        impacts = {impact['softwareQuality']: impact['severity'] for impact in issue['impacts']}
+        self.writer.writerow([
+            issue['key'], component, file_extension, issue['rule'], issue['type'], issue['impacts'],
+            issue['severity'], issue['status'], issue['message']
+        ] + [impacts.get(quality, '') for quality in IMPACT_COLUMNS])
+
         severity = issue['severity'].lower()
-        if severity in consolidated_data[file_extension]:
-            consolidated_data[file_extension][severity] += 1
+        if severity in self.consolidated_data[file_extension]:
+            self.consolidated_data[file_extension][severity] += 1
 
-    # Populate the consolidated data with LOC
-    for component in file_metrics_data['components']:
+    def add_component(self, component):
+        # Populate the consolidated data with the file measures
         if component['qualifier'] == "FIL":
+            self.files += 1
             file_extension = component['path'].split('.')[-1] if '.' in component['path'] else 'unknown'
 
             if file_extension == 'unknown':
-                continue
+                return
 
             if len(component['measures']) == 0:
-                continue
+                return
 
-            loc = int(component['measures'][0]['value'])
-            consolidated_data[file_extension]['loc'] += loc
-
-    # Save consolidated data to CSV
-    consolidated_file = f'{dir}/{project_key}_consolidated.csv'
-    with open(consolidated_file, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow(['File Extension', 'Minor Issues', 'Major Issues', 'Critical Issues', 'Total LOC'])
-        for file_extension, data in consolidated_data.items():
-            writer.writerow([file_extension, data['minor'], data['major'], data['critical'], data['loc']])
-
-    print(f"Reports generated: {issues_file}, {consolidated_file}")
-
-def check_project_exists(project_key):
-    url = f"{SONARQUBE_URL}/api/projects/search?projects={project_key}"
-    response = requests.get(url, auth=(SONARQUBE_TOKEN, ''))
-    if response.status_code == 200:
-        data = response.json()
-        return len(data.get('components', [])) > 0
-    return False
-
-def create_project_in_sonarqube(project_key, project_name):
-    # Check if project already exists
-    if check_project_exists(project_key):
-        print(f"Project {project_name} already exists in SonarQube with key {project_key}")
-        return True
-        
-    url = f"{SONARQUBE_URL}/api/projects/create"
-    data = {
-        'name': project_name,
-        'project': project_key
-    }
-    response = requests.post(url, data=data, auth=(SONARQUBE_TOKEN, ''))
-    if response.status_code == 200:
-        print(f"Project {project_name} created in SonarQube with key {project_key}")
-        return True
-    else:
-        print(f"Failed to create project {project_name} in SonarQube: {response.text}")
+            for measure in component['measures']:
+                if measure['metric'] in METRIC_COLUMNS and 'value' in measure:
+                    self.consolidated_data[file_extension][measure['metric']] += int(float(measure['value']))
+
+    def close(self):
+        if self.writer is None:
+            self.open_issues()
+        self.file.close()
+
+        # Save consolidated data to CSV
+        with open(self.consolidated_file, mode='w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['File Extension', 'Minor Issues', 'Major Issues', 'Critical Issues'] + list(METRIC_COLUMNS.values()))
+            for file_extension, data in self.consolidated_data.items():
+                writer.writerow([file_extension, data['minor'], data['major'], data['critical']] + [data[metric] for metric in METRIC_COLUMNS])
+
+        print(f"Reports generated: {self.issues_file}, {self.consolidated_file}")
+
+async def generate_reports(client, project_key, dir):
+    """Write the reports of a project whose background analysis has succeeded"""
+    reports = ProjectReports(project_key, dir)
+    async for component in get_file_metrics(client, project_key):
+        reports.add_component(component)
+
+    if reports.files == 0:
+        print(f"Repository {project_key} couldn't be analyzed: no files in the analysis")
+        return []
+
+    async for issue in get_project_issues(client, project_key):
+        reports.add_issue(issue)
+    reports.close()
+    return [reports.issues_file, reports.consolidated_file]
+
+def generate_local_reports(project_key, dir, components, issues):
+    """Write the reports of a project from local_analysis' files and issues, the same way generate_reports does"""
+    reports = ProjectReports(project_key, dir)
+    for component in components:
+        reports.add_component(component)
+
+    if reports.files == 0:
+        print(f"Repository {project_key} couldn't be analyzed: no files in the analysis")
+        return []
+
+    for issue in issues:
+        reports.add_issue(issue)
+    reports.close()
+    return [reports.issues_file, reports.consolidated_file]
+
+async def generate_batch_reports(client, job):
+    """Split the analysis of a batch scan back into per-repository reports, as if each repo had its own project.
+
+    Returns the report files of each repository key.
+    """
+    repo_reports = {repo_path.rstrip('/') + '/': (project_key, ProjectReports(project_key, repo_path))
+                    for repo_path, project_key, _ in job.repos}
+
+    def reports_for(path):
+        for prefix, (project_key, reports) in repo_reports.items():
+            if path.startswith(prefix):
+                return project_key, reports
+        return None, None
+
+    async for component in get_file_metrics(client, job.project_key):
+        _, reports = reports_for(component['path'])
+        if reports is not None:
+            reports.add_component(component)
+
+    analyzed = {prefix: entry for prefix, entry in repo_reports.items() if entry[1].files > 0}
+    if analyzed:
+        async for issue in get_project_issues(client, job.project_key):
+            path = issue['component'].split(':', 1)[1]
+            project_key, reports = reports_for(path)
+            if reports is not None and reports.files > 0:
+                reports.add_issue(dict(issue, component=f'{project_key}:{path}'))
+
+    # The batch was scanned without copy-paste detection, so duplicates are only looked for within each repo
+    for prefix, (project_key, reports) in analyzed.items():
+        duplicated_lines = await asyncio.to_thread(local_duplicated_lines, prefix.rstrip('/'), project_key)
+        for file_extension, data in reports.consolidated_data.items():
+            data['duplicated_lines'] = duplicated_lines.get(file_extension, 0)
+
+    report_files = {}
+    for prefix, (project_key, reports) in repo_reports.items():
+        if prefix not in analyzed:
+            print(f"Repository {project_key} couldn't be analyzed: no files in the analysis")
+            report_files[project_key] = []
+            continue
+        reports.close()
+        report_files[project_key] = [reports.issues_file, reports.consolidated_file]
+    return report_files
+
+def local_duplicated_lines(repo_path, project_key):
+    """Duplicated lines per file extension of one repository, from local_analysis' copy-paste detection"""
+    components, _ = analyze_repository(repo_path, project_key)
+    reports = ProjectReports(project_key, repo_path)
+    for component in components:
+        reports.add_component(component)
+    return {file_extension: data['duplicated_lines'] for file_extension, data in reports.consolidated_data.items()}
+
+async def create_project_in_sonarqube(client, project_key, project_name):
+    # Existence was checked in bulk by main, so only creation is attempted here
+    try:
+        await client.create_project(project_key, project_name)
+    except SonarQubeError as e:
+        print(f"Failed to create project {project_name} in SonarQube: {e}")
         return False
+    print(f"Project {project_name} created in SonarQube with key {project_key}")
+    return True
 
-def scan_repository(repo_path, project_key):
-    # Create a unique scanner work directory for this scan
-    scanner_work_dir = os.path.join(repo_path, ".scannerwork_" + project_key + "_" + str(time.time()))
-    
-    # Ensure the directory exists
-    os.makedirs(scanner_work_dir, exist_ok=True)
-    
-    scan_command = (
-        f"sonar-scanner "
-        f"-Dsonar.projectKey={project_key} "
-        f"-Dsonar.sources={repo_path} "
-        f"-Dsonar.host.url={SONARQUBE_URL} "
-        f"-Dsonar.token={SONARQUBE_TOKEN} "
-        f"-Dsonar.scm.exclusions.disabled=true "
-        f"-Dsonar.inclusions=**/*.js,**/*.jsx,**/*.php,**/*.py "
-        f"-Dsonar.exclusions=**/node_modules/**,**/vendor/**,**/dist/**,**/.git/** "
-        f"-Dsonar.working.directory={scanner_work_dir} "  # Set unique working directory
-    )
-    os.system(scan_command)
-
-def process_repository(repo_info):
-    repo_path, project_key, project_name = repo_info
-    
+def safe_project_key(project_key):
     # Ensure project key is unique and valid
     # Replace any invalid characters and ensure uniqueness
-    safe_project_key = project_key.lower().replace(' ', '_').replace('-', '_')
-    
-    # Create the project in SonarQube if it doesn't exist
-    if check_project_exists(safe_project_key):
-        print(f"Skipping {project_name} as it already exists in SonarQube")
+    return project_key.lower().replace(' ', '_').replace('-', '_')
+
+def record_scans(store, job, status, analysis_id=None, report_files=None):
+    for repo_path, project_key, project_name in job.repos:
+        reports = (report_files or {}).get(project_key, [])
+        store.record_scan(project_key, project_name, repo_path, job.project_key,
+                          'no files' if status == 'reported' and not reports else status, analysis_id, reports)
+
+async def process_job(client, tracker, scheduler, job, existing_projects, manifest, fingerprints, store):
+    """Create and scan the project, wait for its background analysis and generate the reports"""
+    if job.project_key not in existing_projects:
+        if not await create_project_in_sonarqube(client, job.project_key, job.project_name):
+            record_scans(store, job, 'failed')
+            return
+
+    previous_projects = {manifest.entries[project_key]['scan_project'] for _, project_key, _ in job.repos
+                         if project_key in manifest.entries}
+    # Until the reports are written, the manifest marks these repos as incomplete
+    for repo_path, project_key, _ in job.repos:
+        manifest.record(project_key, repo_path, fingerprints[repo_path], None, job.project_key, [])
+    record_scans(store, job, 'scanning')
+
+    print(f"Start scanning {job.project_name} ({len(job.repos)} repositories) as {job.project_key}")
+    print("\n")
+    report_task = await scheduler.scan(job)
+    if report_task is None:
+        print(f"Scan of {job.project_key} did not submit an analysis")
+        record_scans(store, job, 'failed')
         return
-        
-    if not create_project_in_sonarqube(safe_project_key, project_name):
+
+    # Reports are generated as soon as the analysis succeeds, while other repositories keep scanning
+    try:
+        task = await tracker.wait(report_task['ceTaskId'])
+    except CETaskError as e:
+        print(f"Analysis of {job.project_name} failed: {e}")
+        record_scans(store, job, 'failed')
         return
-    
-    # Scan the repository
-    print(f"Start scanning repository {safe_project_key}")
+
+    print(f"Start generating reports for {job.project_key}")
     print("\n")
-    scan_repository(repo_path, safe_project_key)
+    if len(job.repos) == 1:
+        report_files = {job.project_key: await generate_reports(client, job.project_key, job.repos[0][0])}
+    else:
+        report_files = await generate_batch_reports(client, job)
 
-    # Give SonarQube some time to process before generating reports
-    time.sleep(10)
+    for repo_path, project_key, _ in job.repos:
+        manifest.record(project_key, repo_path, fingerprints[repo_path], task.get('analysisId'), job.project_key,
+                        report_files.get(project_key, []))
+    # Per-extension metrics go to the store with the scan, where the developer table is queried from
+    record_scans(store, job, 'reported', task.get('analysisId'), report_files)
+    await delete_superseded_batches(client, previous_projects - {job.project_key}, manifest)
 
-    # Generate reports
-    print(f"Start generating reports for repository {safe_project_key}")
-    print("\n")
-    generate_reports(safe_project_key, repo_path)
+async def delete_superseded_batches(client, project_keys, manifest):
+    """Delete the batch projects whose repos have all been reported from other projects since"""
+    in_use = {entry.get('scan_project') for entry in manifest.entries.values()}
+    for project_key in sorted(project_keys):
+        if not project_key.startswith(BATCH_KEY_PREFIX) or project_key in in_use:
+            continue
+        try:
+            await client.delete_project(project_key)
+        except SonarQubeError as e:
+            print(f"Failed to delete superseded batch project {project_key}: {e}")
+            continue
+        print(f"Deleted superseded batch project {project_key}")
+
+def collect_repository_info(repos_base_path='repos_v2'):
+    # Every repository in the folder's inventory, refreshed for what changed since the last run
+    return [(entry['path'], f"{entry['user']}_{entry['repo']}", f"{entry['user']}/{entry['repo']}")
+            for entry in load_inventory(repos_base_path).repos()]
+
+async def run(repository_info, dry_run=False, store_file=STORE_FILE):
+    manifest = ScanManifest(MANIFEST_FILE)
+    store = PipelineStore(store_file)
+    try:
+        await scan_repositories(repository_info, manifest, store, dry_run)
+    finally:
+        store.close()
+
+async def scan_repositories(repository_info, manifest, store, dry_run):
+    async with SonarQubeClient(SONARQUBE_URL, SONARQUBE_TOKEN) as client:
+        repository_info = [(repo_path, safe_project_key(project_key), project_name)
+                           for repo_path, project_key, project_name in repository_info]
+
+        # Only new repos, repos with new commits or source changes and unfinished analyses are scanned
+        fingerprints = fingerprint_repositories([info[0] for info in repository_info])
+        pending = []
+        for repo_path, project_key, project_name in repository_info:
+            reason = manifest.needs_analysis(project_key, repo_path, fingerprints[repo_path])
+            if reason is None:
+                # Scanned before the store existed: its metrics are read from the reports it has
+                entry = manifest.entries[project_key]
+                if not dry_run and len(entry['reports']) == 2 and not store.has_scan(project_key):
+                    store.record_scan(project_key, project_name, repo_path, entry['scan_project'], 'reported',
+                                      entry['analysis_id'], entry['reports'])
+                continue
+            print(f"{project_name}: {reason}")
+            pending.append((repo_path, project_key, project_name))
+        print(f"{len(repository_info) - len(pending)} of {len(repository_info)} repositories are up to date")
+
+        jobs = plan_scan_jobs(pending)
+        if dry_run:
+            for job in jobs:
+                print(f"Would scan {job.project_key}: {', '.join(repo[2] for repo in job.repos)}")
+            return
+        manifest.save()
+        if not jobs:
+            return
+
+        # One bulk lookup instead of one request per project
+        existing_projects = await client.existing_projects(job.project_key for job in jobs)
+
+        tracker = CETaskTracker(client)
+        scheduler = ScanScheduler(client, SONARQUBE_URL, SONARQUBE_TOKEN)
+        print(f"{len(pending)} repositories to scan in {len(jobs)} scanner runs, up to {scheduler.max_workers} at once")
+
+        results = await asyncio.gather(
+            *(process_job(client, tracker, scheduler, job, existing_projects, manifest, fingerprints, store) for job in jobs),
+            return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"An error occurred: {str(result)}")
+        await tracker.close()
+        print(f"Scanned {scheduler.repos_scanned} repositories at {scheduler.throughput():.1f} repos/min")
+
+def analyze_locally(repository_info, manifest, dry_run, results_dir=LOCAL_RESULTS_FOLDER, workers=LOCAL_ANALYSIS_WORKERS):
+    """Write the reports of the repositories with local_analysis instead of SonarQube, without contacting the server"""
+    repository_info = [(repo_path, safe_project_key(project_key), project_name)
+                       for repo_path, project_key, project_name in repository_info]
+
+    # Same incremental rules as a scan, plus a re-analysis whenever the local rules change
+    fingerprints = fingerprint_repositories([info[0] for info in repository_info])
+    pending = []
+    for repo_path, project_key, project_name in repository_info:
+        results_path = os.path.join(results_dir, *project_name.split('/', 1))
+        reason = manifest.needs_analysis(project_key, results_path, fingerprints[repo_path])
+        if reason is None and manifest.entries[project_key]['analysis_id'] not in (LOCAL_ANALYSIS_ID, None):
+            reason = 'local rules changed'
+        if reason is None:
+            continue
+        print(f"{project_name}: {reason}")
+        pending.append((repo_path, project_key, project_name, results_path))
+    print(f"{len(repository_info) - len(pending)} of {len(repository_info)} repositories are up to date")
+
+    if dry_run:
+        for _, _, project_name, _ in pending:
+            print(f"Would analyze {project_name} locally")
+        return
+    manifest.save()
+    if not pending:
+        return
+
+    started_at = time.monotonic()
+    incomplete = 0
+    with local_analysis_executor(workers) as executor:
+        analyses = analyze_repositories([(repo_path, project_key) for repo_path, project_key, _, _ in pending], executor)
+        for (repo_path, project_key, project_name, results_path), (_, _, components, issues, failed) in zip(pending, analyses):
+            os.makedirs(results_path, exist_ok=True)
+            report_files = generate_local_reports(project_key, results_path, components, issues)
+            # Reports missing some files undercount the repo: they are kept, but the repo stays incomplete and is retried
+            if failed:
+                print(f"{project_name}: {len(failed)} files couldn't be analyzed")
+                incomplete += 1
+            manifest.record(project_key, results_path, fingerprints[repo_path], None if failed else LOCAL_ANALYSIS_ID,
+                            project_key, report_files)
+    minutes = (time.monotonic() - started_at) / 60
+    print(f"Analyzed {len(pending)} repositories locally in {minutes:.1f} min with {workers} workers")
+    if incomplete:
+        print(f"{incomplete} repositories are incomplete and will be analyzed again on the next run")
 
 def main():
-    repos_base_path = 'repos_v2'
-    repository_info = []
-    
-    # Collect all repository information
-    for user_folder in os.listdir(repos_base_path):
-        user_path = os.path.join(repos_base_path, user_folder)
-        if os.path.isdir(user_path):
-            for repo_folder in os.listdir(user_path):
-                repo_path = os.path.join(user_path, repo_folder)
-                if os.path.isdir(repo_path):
-                    # Create a unique project key using both user and repo name
-                    project_key = f"{user_folder}_{repo_folder}"
-                    project_name = f"{user_folder}/{repo_folder}"
-                    repository_info.append((repo_path, project_key, project_name))
-
-    # Process repositories in parallel using ThreadPoolExecutor
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = [executor.submit(process_repository, repo_info) for repo_info in repository_info]
-        
-        # Wait for all tasks to complete
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                print(f"An error occurred: {str(e)}")
+    parser = argparse.ArgumentParser(description='Scan the collected repositories with SonarQube and generate their reports')
+    parser.add_argument('--repos', default='repos_v2', help='Folder with one sub-folder per user')
+    parser.add_argument('--dry-run', action='store_true', help='Print what would be scanned and why, then stop')
+    parser.add_argument('--store', default=STORE_FILE, help='Pipeline store the scans and their metrics are recorded in')
+    parser.add_argument('--backend', choices=['sonarqube', 'local'], default=ANALYSIS_BACKEND,
+                        help='Scan with the SonarQube server, or analyze in-process with a subset of its rules')
+    parser.add_argument('--results', default=LOCAL_RESULTS_FOLDER, help='Folder the local backend writes its reports to')
+    parser.add_argument('--workers', type=int, default=LOCAL_ANALYSIS_WORKERS, help='Processes for the local backend')
+    args = parser.parse_args()
+
+    if args.backend == 'local':
+        # The local reports are files only: aggregate them with agregator.py --repos <results>
+        analyze_locally(collect_repository_info(args.repos), ScanManifest(LOCAL_MANIFEST_FILE), args.dry_run, args.results,
+                        args.workers)
+        return
+    asyncio.run(run(collect_repository_info(args.repos), args.dry_run, args.store))
 
 if __name__ == '__main__':
     main()
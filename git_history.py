@@ -0,0 +1,122 @@
+import os
+import re
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+# File extensions counted for the language breakdown (the ones the SonarQube scan includes)
+EXTENSION_LANGUAGES = {
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.py': 'python',
+    '.php': 'php',
+}
+EXCLUDED_DIRS = {'.git', 'node_modules', 'vendor', 'dist'}  # Same as sonar.exclusions
+
+ANALYSIS_WORKERS = os.cpu_count() or 4
+
+# Author rules
+BOT_NAME = re.compile(r'(\[bot\]$|^dependabot|^renovate|^github-actions|^greenkeeper|^snyk-bot|^semantic-release-bot)', re.IGNORECASE)
+BOT_EMAILS = {'noreply@github.com', 'actions@github.com', 'bot@renovateapp.com'}
+GITHUB_NOREPLY_DOMAIN = 'users.noreply.github.com'
+GMAIL_DOMAINS = {'gmail.com', 'googlemail.com'}
+
+
+def normalise_email(email):
+    """Map the addresses one person commits with to a single identity.
+
+    Lower-cases, drops +sub-addressing, folds GitHub noreply addresses
+    (12345+login@users.noreply.github.com) to the login and ignores dots in
+    Gmail local parts.
+    """
+    local, _, domain = email.strip().lower().partition('@')
+    if domain == GITHUB_NOREPLY_DOMAIN:
+        return local.split('+', 1)[-1] + '@github'
+    local = local.split('+', 1)[0]
+    if domain in GMAIL_DOMAINS:
+        local, domain = local.replace('.', ''), 'gmail.com'
+    return f'{local}@{domain}'
+
+
+def is_bot(name, email):
+    return bool(BOT_NAME.search(name.strip())) or email.strip().lower() in BOT_EMAILS
+
+
+def commit_authors(path):
+    """(name, email) of every commit on HEAD, after .mailmap; no other blob is read"""
+    # Read from HEAD as well, for clones whose sparse checkout left .mailmap out of the working tree
+    completed = subprocess.run(['git', '-C', path, '-c', 'mailmap.blob=HEAD:.mailmap', 'log', '--format=%aN%x00%aE'],
+                               capture_output=True, text=True, encoding='utf-8', errors='replace')
+    if completed.returncode != 0:
+        return []
+    return [tuple(line.split('\x00', 1)) for line in completed.stdout.splitlines() if '\x00' in line]
+
+
+def distinct_authors(authors, normalise=True, skip_bots=True, merge_by_name=True):
+    """Group commit authors into people.
+
+    With `merge_by_name` two identities sharing a name or a (normalised) email
+    are the same person, so one developer committing from two machines still
+    counts once.
+    """
+    parent = {}
+
+    def find(key):
+        while parent.setdefault(key, key) != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    people = []
+    for name, email in authors:
+        if skip_bots and is_bot(name, email):
+            continue
+        email_key = 'email:' + (normalise_email(email) if normalise else email)
+        keys = [email_key]
+        if merge_by_name and name.strip():
+            keys.append('name:' + name.strip().lower())
+        for key in keys[1:]:
+            parent[find(key)] = find(keys[0])
+        people.append(email_key)
+
+    return {find(key) for key in people}
+
+
+def language_bytes(path):
+    """Bytes per language in the checked-out tree, skipping the directories the scanner excludes"""
+    totals = {}
+    stack = [path]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in EXCLUDED_DIRS:
+                    stack.append(entry.path)
+                continue
+            language = EXTENSION_LANGUAGES.get(os.path.splitext(entry.name)[1].lower())
+            if language and entry.is_file(follow_symlinks=False):
+                totals[language] = totals.get(language, 0) + entry.stat(follow_symlinks=False).st_size
+    return totals
+
+
+def analyze_repository(path, normalise=True, skip_bots=True, merge_by_name=True):
+    authors = commit_authors(path)
+    people = distinct_authors(authors, normalise, skip_bots, merge_by_name)
+    return {
+        'path': path,
+        'commits': len(authors),
+        'author_count': len(people),
+        'languages': language_bytes(path),
+    }
+
+
+def analyze_repositories(paths, executor=None, **rules):
+    """Analyze clones in a process pool; returns one result per path, in order"""
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS) as own_executor:
+            return analyze_repositories(paths, own_executor, **rules)
+    futures = [executor.submit(analyze_repository, path, **rules) for path in paths]
+    return [future.result() for future in futures]
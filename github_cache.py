@@ -0,0 +1,246 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from github.Requester import HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass, Requester
+
+# Cache settings
+CACHE_FILE = 'github_cache.db'
+CACHE_FRESH_FOR = 6 * 3600  # Serve a stored response without asking GitHub for this long
+CACHE_TTL = 30 * 24 * 3600  # Drop entries that were not validated for this long
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # Least recently used entries are evicted past this size
+
+# Headers describing the stored body rather than the resource
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+# GraphQL errors that are part of the answer (an unknown login) rather than a failed attempt
+CACHEABLE_GRAPHQL_ERRORS = {'NOT_FOUND'}
+
+
+class ResponseCache:
+    """On-disk store of GitHub responses with their ETag/Last-Modified validators"""
+
+    def __init__(self, path=CACHE_FILE, fresh_for=CACHE_FRESH_FOR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.fresh_for = fresh_for
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    validated_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+            ''')
+            self.connection.execute('DELETE FROM responses WHERE validated_at < ?', (time.time() - self.ttl,))
+        self.total_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT status, headers, body, etag, last_modified, validated_at FROM responses WHERE key = ?',
+                (key,)).fetchone()
+            if row is None:
+                return None
+            with self.connection:
+                self.connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        status, headers, body, etag, last_modified, validated_at = row
+        return {'status': status, 'headers': json.loads(headers), 'body': body, 'etag': etag,
+                'last_modified': last_modified, 'validated_at': validated_at}
+
+    def put(self, key, status, headers, body):
+        headers = {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS}
+        validators = CaseInsensitiveDict(headers)
+        now = time.time()
+        with self.lock, self.connection:
+            previous = self.connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, status, json.dumps(headers), body, validators.get('ETag'), validators.get('Last-Modified'),
+                 now, now, len(body)))
+            self.total_bytes += len(body) - (previous[0] if previous else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def touch(self, key):
+        """Mark an entry as validated after GitHub answered 304 Not Modified"""
+        with self.lock, self.connection:
+            now = time.time()
+            self.connection.execute('UPDATE responses SET validated_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+
+    def _evict(self):
+        # Least recently used first, down to 90% of the budget so eviction does not run on every store
+        target = self.max_bytes * 0.9
+        rows = self.connection.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall()
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            self.connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.total_bytes -= size
+
+    def count(self, outcome):
+        """Add one to the 'hits', 'revalidated' or 'misses' counter; adapters count from several threads"""
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        total = self.hits + self.revalidated + self.misses
+        ratio = (self.hits + self.revalidated) / total if total else 0.0
+        return (f"GitHub response cache: {self.hits} fresh hits, {self.revalidated} revalidated (304), "
+                f"{self.misses} misses, hit ratio {ratio:.1%}")
+
+    def close(self):
+        self.connection.close()
+
+
+class CachingAdapter(HTTPAdapter):
+    """Serves GET requests from the ResponseCache and revalidates them conditionally.
+
+    304 responses do not count against GitHub's rate limit. POSTs to `post_urls`
+    (the GraphQL endpoint) are cached by query text for `fresh_for` seconds only,
+    since GraphQL offers no validators. GraphQL answers 200 even when rate
+    limited, so a POST is only cached when its body has no errors other than
+    CACHEABLE_GRAPHQL_ERRORS; otherwise the retry would get the error back.
+    Its rateLimit block is dropped, so a replay never reports an old budget.
+    """
+
+    def __init__(self, cache, post_urls=(), **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.post_urls = set(post_urls)
+
+    def cache_key(self, request):
+        if request.method == 'GET':
+            return f"GET {request.url} {request.headers.get('Accept', '')}"
+        if request.method == 'POST' and request.url in self.post_urls:
+            body = request.body if isinstance(request.body, bytes) else (request.body or '').encode('utf-8')
+            return f"POST {request.url} {hashlib.sha256(body).hexdigest()}"
+        return None
+
+    def send(self, request, **kwargs):
+        key = self.cache_key(request)
+        if key is None:
+            return super().send(request, **kwargs)
+
+        cached = self.cache.get(key)
+        if cached and time.time() - cached['validated_at'] < self.cache.fresh_for:
+            self.cache.count('hits')
+            return build_response(request, cached['status'], cached['headers'], cached['body'])
+
+        if cached and request.method == 'GET':
+            if cached['etag']:
+                request.headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                request.headers['If-Modified-Since'] = cached['last_modified']
+
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and cached:
+            self.cache.count('revalidated')
+            self.cache.touch(key)
+            # Keep the fresh rate limit headers from the 304 on top of the stored ones
+            headers = CaseInsensitiveDict(cached['headers'])
+            headers.update(response.headers)
+            return build_response(request, cached['status'], headers, cached['body'])
+
+        self.cache.count('misses')
+        if response.status_code == 200:
+            body = response.content
+            if request.method == 'POST':
+                cacheable = graphql_succeeded(response)
+                if cacheable:
+                    body = without_rate_limit(body)
+            else:
+                cacheable = 'ETag' in response.headers or 'Last-Modified' in response.headers
+            if cacheable:
+                self.cache.put(key, response.status_code, dict(response.headers), body)
+        return response
+
+    def close(self):
+        # Shared by every PyGithub connection, which closes its session after each request
+        pass
+
+    def close_all(self):
+        super().close()
+
+
+def graphql_succeeded(response):
+    """Whether a 200 GraphQL response is an answer worth replaying, not a rate limited or failed attempt"""
+    try:
+        payload = response.json()
+    except ValueError:
+        return False
+    if not isinstance(payload, dict):
+        return False
+    errors = payload.get('errors') or []
+    return all(error.get('type') in CACHEABLE_GRAPHQL_ERRORS for error in errors)
+
+
+def without_rate_limit(body):
+    """A GraphQL response body without the rateLimit it was sent with"""
+    payload = json.loads(body)
+    if isinstance(payload.get('data'), dict):
+        payload['data'].pop('rateLimit', None)
+    return json.dumps(payload).encode('utf-8')
+
+
+def build_response(request, status, headers, body):
+    response = requests.Response()
+    response.status_code = status
+    response.reason = 'OK'
+    response.headers = CaseInsensitiveDict({name: value for name, value in headers.items()
+                                            if name.lower() not in DROPPED_HEADERS})
+    response._content = body
+    response.url = request.url
+    response.request = request
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+def install_github_cache(cache, post_urls=()):
+    """Route every PyGithub request through a CachingAdapter backed by `cache`.
+
+    Must run before the first request made through the Github client.
+    Returns an adapter without retries, for other sessions to mount.
+    """
+    adapter = CachingAdapter(cache, post_urls)
+    # One adapter per retry and pool configuration, so PyGithub's retries of transient errors still apply
+    adapters = {}
+    lock = threading.Lock()
+
+    def adapter_for(connection):
+        with lock:
+            key = (connection.retry, connection.pool_size)
+            if key not in adapters:
+                adapters[key] = CachingAdapter(cache, post_urls, max_retries=connection.retry,
+                                               pool_connections=connection.pool_size, pool_maxsize=connection.pool_size)
+            return adapters[key]
+
+    class CachedHTTPSConnection(HTTPSRequestsConnectionClass):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.session.mount('https://', adapter_for(self))
+
+    class CachedHTTPConnection(HTTPRequestsConnectionClass):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.session.mount('http://', adapter_for(self))
+
+    Requester.injectConnectionClasses(CachedHTTPConnection, CachedHTTPSConnection)
+    return adapter
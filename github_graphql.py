@@ -0,0 +1,284 @@
+import json
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import requests
+
+# GitHub GraphQL endpoint (point it to a local mock server for testing)
+GITHUB_GRAPHQL_URL = 'https://api.github.com/graphql'
+
+# Batching
+USERS_PER_QUERY = 10
+REPOS_PER_PAGE = 50
+REPOS_PER_AUTHOR_QUERY = 50
+LANGUAGES_PER_REPO = 100
+HISTORY_SAMPLE = 100  # Commits sampled on the default branch to count authors
+
+# Rate limit handling
+RATE_LIMIT_RESERVE = 50  # Points left untouched for other tools sharing the token
+PACE_BELOW = 1000  # Start spreading requests until the reset below this many points
+MAX_RETRIES = 5
+
+RepoMetadata = namedtuple('RepoMetadata', [
+    'name', 'full_name', 'size', 'fork', 'pushed_at', 'clone_url', 'languages', 'contributor_count',
+])
+RepoMetadata.__doc__ = """Repository fields used by fetch_repos to select candidates.
+
+`languages` maps language name to bytes. `contributor_count` counts distinct
+GitHub users among the commit authors of the default branch, mirroring the
+contributors endpoint; 2 stands for "more than one" when only part of the
+history was sampled. It is None when that could not be determined.
+"""
+
+REPOSITORY_FIELDS = f'''
+    pageInfo {{ hasNextPage endCursor }}
+    nodes {{
+      name
+      nameWithOwner
+      diskUsage
+      isFork
+      pushedAt
+      url
+      languages(first: {LANGUAGES_PER_REPO}, orderBy: {{field: SIZE, direction: DESC}}) {{
+        edges {{ size node {{ name }} }}
+      }}
+      defaultBranchRef {{
+        target {{
+          ... on Commit {{
+            history(first: {HISTORY_SAMPLE}) {{
+              totalCount
+              nodes {{ author {{ user {{ login id }} }} }}
+            }}
+          }}
+        }}
+      }}
+    }}
+'''
+
+
+class GraphQLError(Exception):
+    pass
+
+
+class RateLimitScheduler:
+    """Paces requests from the quota GitHub reports instead of running into it.
+
+    Every response updates the remaining points and reset time. Once fewer than
+    `pace_below` points are left, the scheduler spreads them over the time until
+    the reset, and it sleeps until the reset when only the reserve is left.
+    """
+
+    def __init__(self, reserve=RATE_LIMIT_RESERVE, pace_below=PACE_BELOW, sleep=time.sleep, clock=time.time):
+        self.reserve = reserve
+        self.pace_below = pace_below
+        self.sleep = sleep
+        self.clock = clock
+        self.remaining = None
+        self.reset_at = None
+        self.last_cost = 1
+
+    def update(self, rate_limit):
+        if not rate_limit:
+            return
+        self.remaining = rate_limit['remaining']
+        self.last_cost = max(rate_limit.get('cost', 1), 1)
+        self.reset_at = parse_timestamp(rate_limit['resetAt']).timestamp()
+
+    def wait(self):
+        if self.remaining is None or self.reset_at is None or self.remaining >= self.pace_below:
+            return
+        seconds_to_reset = max(self.reset_at - self.clock(), 0)
+        budget = self.remaining - self.reserve
+        if budget < self.last_cost:
+            delay = seconds_to_reset + 1
+        else:
+            delay = seconds_to_reset * self.last_cost / budget
+        if delay > 0:
+            self.sleep(delay)
+
+    def backoff(self, response, attempt):
+        """Sleep after GitHub rejected a request for exceeding a rate limit"""
+        if response is not None and response.headers.get('Retry-After'):
+            delay = int(response.headers['Retry-After'])
+        elif response is not None and response.headers.get('X-RateLimit-Reset'):
+            delay = max(int(response.headers['X-RateLimit-Reset']) - self.clock(), 0) + 1
+        else:
+            delay = 2 ** attempt
+        self.sleep(delay)
+
+
+class GitHubGraphQL:
+    def __init__(self, token, url=GITHUB_GRAPHQL_URL, scheduler=None, session=None):
+        self.url = url
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.session = session or requests.Session()
+        self.session.headers.update({'Authorization': f'bearer {token}'})
+
+    def execute(self, query):
+        """Run a query, pacing and retrying it around the rate limit"""
+        for attempt in range(MAX_RETRIES):
+            self.scheduler.wait()
+            response = self.session.post(self.url, json={'query': query}, timeout=60)
+
+            if response.status_code in (403, 429) or response.status_code >= 500:
+                self.scheduler.backoff(response, attempt)
+                continue
+            response.raise_for_status()
+
+            payload = response.json()
+            errors = payload.get('errors') or []
+            if any(error.get('type') == 'RATE_LIMITED' for error in errors):
+                self.scheduler.backoff(response, attempt)
+                continue
+
+            data = payload.get('data') or {}
+            self.scheduler.update(data.get('rateLimit'))
+            # Unknown users come back as null with a NOT_FOUND error; anything else is fatal
+            fatal = [error for error in errors if error.get('type') != 'NOT_FOUND']
+            if fatal:
+                raise GraphQLError(fatal[0].get('message', str(fatal[0])))
+            return data
+
+        raise GraphQLError(f'Giving up after {MAX_RETRIES} rate limited attempts')
+
+    def fetch_user_repositories(self, logins):
+        """Fetch the metadata of every repository owned by `logins`.
+
+        Users are batched USERS_PER_QUERY at a time and each user's repository
+        pages are followed in later batches. Returns a dict mapping login to a
+        list of RepoMetadata, or to None when the user does not exist.
+        """
+        repositories = {login: [] for login in logins}
+        pending = [(login, None) for login in logins]
+
+        while pending:
+            batch, pending = pending[:USERS_PER_QUERY], pending[USERS_PER_QUERY:]
+            data = self.execute(build_user_repositories_query(batch))
+
+            for index, (login, _) in enumerate(batch):
+                user = data.get(f'u{index}')
+                if user is None:
+                    repositories[login] = None
+                    continue
+                connection = user['repositories']
+                repositories[login].extend(parse_repository(node) for node in connection['nodes'])
+                if connection['pageInfo']['hasNextPage']:
+                    pending.append((login, connection['pageInfo']['endCursor']))
+
+        for login, repos in repositories.items():
+            if repos:
+                repositories[login] = self.resolve_sampled_authors(repos)
+        return repositories
+
+    def resolve_sampled_authors(self, repos):
+        """Settle repos whose sampled history shows a single author but is incomplete.
+
+        Counts that author's commits on the whole default branch, batched
+        REPOS_PER_AUTHOR_QUERY repositories per query: if they cover every
+        commit the repo has a single contributor, otherwise more than one.
+        """
+        unresolved = [index for index, (repo, check) in enumerate(repos) if check is not None]
+        for start in range(0, len(unresolved), REPOS_PER_AUTHOR_QUERY):
+            batch = [(repos[index][0].full_name, repos[index][1][0]) for index in unresolved[start:start + REPOS_PER_AUTHOR_QUERY]]
+            data = self.execute(build_author_commits_query(batch))
+            for alias, index in enumerate(unresolved[start:start + REPOS_PER_AUTHOR_QUERY]):
+                repo, (_, total_commits) = repos[index]
+                try:
+                    author_commits = data[f'r{alias}']['defaultBranchRef']['target']['history']['totalCount']
+                except (KeyError, TypeError):
+                    continue
+                repos[index] = (repo._replace(contributor_count=1 if author_commits >= total_commits else 2), None)
+        return [repo for repo, _ in repos]
+
+
+class RepositoryMetadataEngine:
+    """Serves per-user repository lists, fetching scheduled users in batches.
+
+    Asking for a user that has not been fetched yet pulls it together with the
+    next scheduled users into a single batched query.
+    """
+
+    def __init__(self, client, batch_size=USERS_PER_QUERY):
+        self.client = client
+        self.batch_size = batch_size
+        self.scheduled = []
+        self.cache = {}
+
+    def schedule(self, logins):
+        self.scheduled.extend(login for login in logins if login not in self.cache)
+
+    def repositories(self, login):
+        if login not in self.cache:
+            upcoming = [other for other in self.scheduled if other != login and other not in self.cache]
+            batch = [login] + upcoming[:self.batch_size - 1]
+            self.cache.update(self.client.fetch_user_repositories(batch))
+            self.scheduled = [other for other in self.scheduled if other not in self.cache]
+        return self.cache.pop(login)
+
+
+def build_user_repositories_query(batch):
+    parts = []
+    for index, (login, cursor) in enumerate(batch):
+        after = f', after: {json.dumps(cursor)}' if cursor else ''
+        parts.append(
+            f'u{index}: user(login: {json.dumps(login)}) {{\n'
+            f'  repositories(first: {REPOS_PER_PAGE}{after}, ownerAffiliations: OWNER) {{{REPOSITORY_FIELDS}}}\n'
+            f'}}'
+        )
+    parts.append('rateLimit { cost remaining resetAt }')
+    return 'query {\n' + '\n'.join(parts) + '\n}'
+
+
+def build_author_commits_query(batch):
+    parts = []
+    for index, (full_name, author_id) in enumerate(batch):
+        owner, name = full_name.split('/', 1)
+        parts.append(
+            f'r{index}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{\n'
+            f'  defaultBranchRef {{ target {{ ... on Commit {{ history(first: 1, author: {{id: {json.dumps(author_id)}}}) {{ totalCount }} }} }} }}\n'
+            f'}}'
+        )
+    parts.append('rateLimit { cost remaining resetAt }')
+    return 'query {\n' + '\n'.join(parts) + '\n}'
+
+
+def parse_repository(node):
+    """Build the RepoMetadata of a repository node.
+
+    Returns it with the (author id, total commits) to check when the sampled
+    history shows a single author but does not cover every commit, else None.
+    """
+    languages = {edge['node']['name']: edge['size'] for edge in node['languages']['edges']}
+
+    contributor_count = 0
+    author_check = None
+    branch = node.get('defaultBranchRef')
+    history = ((branch or {}).get('target') or {}).get('history')
+    if history:
+        authors = {commit['author']['user']['login']: commit['author']['user'].get('id') for commit in history['nodes']
+                   if commit.get('author') and commit['author'].get('user')}
+        contributor_count = len(authors)
+        if contributor_count == 1 and history['totalCount'] > len(history['nodes']):
+            author_id = next(iter(authors.values()))
+            if author_id:
+                author_check = (author_id, history['totalCount'])
+            else:
+                contributor_count = None
+
+    return RepoMetadata(
+        name=node['name'],
+        full_name=node['nameWithOwner'],
+        size=node['diskUsage'] or 0,
+        fork=node['isFork'],
+        pushed_at=parse_timestamp(node['pushedAt']),
+        clone_url=node['url'] + '.git',
+        languages=languages,
+        contributor_count=contributor_count,
+    ), author_check
+
+
+def parse_timestamp(value):
+    if not value:
+        return datetime.fromtimestamp(0, timezone.utc)
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
@@ -0,0 +1,1250 @@
+import ast
+import builtins
+import hashlib
+import io
+import itertools
+import os
+import re
+import tokenize
+import zlib
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from git_history import EXCLUDED_DIRS, EXTENSION_LANGUAGES
+
+LOCAL_ANALYSIS_WORKERS = os.cpu_count() or 4
+FILES_PER_TASK = 8  # Files sent to a worker process at a time
+# Recorded in the manifest in place of SonarQube's analysis id; bump it when the rules change so repos are analyzed again
+LOCAL_ANALYSIS_ID = 'local-1'
+
+# Thresholds of the "Sonar way" profiles the metrics-dataset was scanned with
+COGNITIVE_COMPLEXITY_THRESHOLD = 15
+MAX_PARAMETERS = {'python': 13, 'javascript': 7, 'php': 7}
+MAX_RETURNS = 3  # php:S1142
+MAX_FUNCTION_NESTING = 4  # javascript:S2004
+DUPLICATED_LITERAL_THRESHOLD = 3  # S1192
+MIN_LITERAL_LENGTH = 5
+DUPLICATION_TOKENS = 100  # Copy-paste detection reports equal runs of at least this many tokens
+DUPLICATION_BASE = 1000003
+DUPLICATION_MODULUS = 2 ** 61 - 1
+# SonarJS skips minified files
+MINIFIED_SUFFIXES = ('.min.js', '-min.js')
+MINIFIED_LINE_LENGTH = 200
+
+# Type, severity and impacts of the SonarQube rules reproduced here, as the metrics-dataset reports them.
+# They are the most frequent rules of each language in the dataset, minus the ones that need type or data-flow analysis.
+CRITICAL_SMELL = ('CODE_SMELL', 'CRITICAL', (('MAINTAINABILITY', 'HIGH'),))
+MAJOR_SMELL = ('CODE_SMELL', 'MAJOR', (('MAINTAINABILITY', 'MEDIUM'),))
+MINOR_SMELL = ('CODE_SMELL', 'MINOR', (('MAINTAINABILITY', 'LOW'),))
+INFO_SMELL = ('CODE_SMELL', 'INFO', (('MAINTAINABILITY', 'LOW'),))
+MINOR_BUG = ('BUG', 'MINOR', (('RELIABILITY', 'LOW'),))
+RULES = {
+    'python:S3776': CRITICAL_SMELL,  # Cognitive complexity
+    'python:S1192': CRITICAL_SMELL,  # Duplicated string literals
+    'python:S5754': CRITICAL_SMELL,  # Bare except
+    'python:S1186': CRITICAL_SMELL,  # Empty function
+    'python:S2208': CRITICAL_SMELL,  # Wildcard import
+    'python:S125': MAJOR_SMELL,  # Commented-out code
+    'python:S1542': MAJOR_SMELL,  # Function name
+    'python:S1172': MAJOR_SMELL,  # Unused parameter
+    'python:S5806': MAJOR_SMELL,  # Builtin shadowing
+    'python:S1134': MAJOR_SMELL,  # FIXME
+    'python:S1066': MAJOR_SMELL,  # Collapsible if
+    'python:S107': MAJOR_SMELL,  # Too many parameters
+    'python:S108': MAJOR_SMELL,  # Empty block
+    'python:S112': MAJOR_SMELL,  # Generic exception
+    'python:S117': MINOR_SMELL,  # Local variable and parameter names
+    'python:S1481': MINOR_SMELL,  # Unused local variable
+    'python:S100': MINOR_SMELL,  # Method name
+    'python:S1940': MINOR_SMELL,  # Inverted boolean check
+    'python:S101': MINOR_SMELL,  # Class name
+    'python:S1135': INFO_SMELL,  # TODO
+    'javascript:S3504': CRITICAL_SMELL,  # var
+    'javascript:S3776': CRITICAL_SMELL,
+    'javascript:S2004': CRITICAL_SMELL,  # Functions nested too deep
+    'javascript:S1186': CRITICAL_SMELL,
+    'javascript:S125': MAJOR_SMELL,
+    'javascript:S6774': ('CODE_SMELL', 'MAJOR', (('MAINTAINABILITY', 'LOW'), ('RELIABILITY', 'LOW'))),  # React props validation
+    'javascript:S1121': MAJOR_SMELL,  # Assignment in a condition
+    'javascript:S3358': MAJOR_SMELL,  # Nested ternary
+    'javascript:S1134': MAJOR_SMELL,
+    'javascript:S107': MAJOR_SMELL,
+    'javascript:S1128': MINOR_SMELL,  # Unused import
+    'javascript:S1481': MINOR_SMELL,
+    'javascript:S1135': INFO_SMELL,
+    'php:S1192': CRITICAL_SMELL,
+    'php:S6600': CRITICAL_SMELL,  # Parentheses around a language construct
+    'php:S121': CRITICAL_SMELL,  # Missing curly braces
+    'php:S3776': CRITICAL_SMELL,
+    'php:S1186': CRITICAL_SMELL,
+    'php:S4833': MAJOR_SMELL,  # require/include instead of use
+    'php:S125': MAJOR_SMELL,
+    'php:S112': MAJOR_SMELL,
+    'php:S1142': MAJOR_SMELL,  # Too many returns
+    'php:S107': MAJOR_SMELL,
+    'php:S1134': MAJOR_SMELL,
+    'php:S1131': MINOR_SMELL,  # Trailing whitespace
+    'php:S1781': MINOR_SMELL,  # Upper-case keywords and constants
+    'php:S116': MINOR_SMELL,  # Field name
+    'php:S100': MINOR_SMELL,
+    'php:S2010': MINOR_SMELL,  # "or"/"and" operators
+    'php:S113': MINOR_SMELL,  # No newline at the end of the file
+    'php:S105': MINOR_SMELL,  # Tabs
+    'php:S117': MINOR_SMELL,
+    'php:S1780': MINOR_SMELL,  # Closing tag at the end of the file
+    'php:S1793': MINOR_SMELL,  # "else if"
+    'php:S101': MINOR_SMELL,
+    'php:S1116': MINOR_SMELL,  # Empty statement
+    'php:S1481': MINOR_SMELL,
+    'php:S2003': MINOR_BUG,  # require instead of require_once
+    'php:S1784': MINOR_BUG,  # Method visibility
+    'php:S1135': INFO_SMELL,
+}
+
+PYTHON_FUNCTION_NAME = r'^[a-z_][a-z0-9_]*$'
+PYTHON_CLASS_NAME = r'^_?([A-Z_][a-zA-Z0-9]*|[a-z_][a-z0-9_]*)$'
+PYTHON_LOCAL_NAME = r'^[_a-z][a-z0-9_]*$'
+PHP_FUNCTION_NAME = r'^[a-z][a-zA-Z0-9]*$'
+PHP_FIELD_NAME = r'^[a-z][a-zA-Z0-9]*$'
+PHP_CLASS_NAME = r'^[A-Z][a-zA-Z0-9]*$'
+PHP_LOCAL_NAME = r'^[a-z_][a-zA-Z0-9_]*$'
+BUILTIN_NAMES = {name for name in dir(builtins) if not name.startswith('_')}
+TODO = re.compile(r'(?<!\w)TODO(?!\w)', re.IGNORECASE)
+FIXME = re.compile(r'(?<!\w)FIXME(?!\w)', re.IGNORECASE)
+# Comments that parse as Python without being code
+PYTHON_PRAGMA = re.compile(r'^(type:|noqa|pylint:|pyright:|fmt:|pragma|isort:|mypy:|flake8)', re.IGNORECASE)
+# "i.e. f(x)" parses as an attribute chain
+ABBREVIATION = re.compile(r'\w\.\s')
+OPPOSITE_OPERATORS = {ast.Eq: '!=', ast.NotEq: '==', ast.In: 'not in', ast.NotIn: 'in', ast.Is: 'is not', ast.IsNot: 'is',
+                      ast.Lt: '>=', ast.LtE: '>', ast.Gt: '<=', ast.GtE: '<'}
+# A line of a JS or PHP comment that reads as a statement rather than prose
+CODE_COMMENT = re.compile(r'[;{}]$|^(if|for|foreach|while|switch)\s*\(|^(const|let|var)\s+[\w$]+\s*=|^(import|export)\s+[\w{*]'
+                          r'|^console\.\w+\(|^\$\w+(->\w+)*\s*=[^=]|^<\?php|^[\w$]+(\.[\w$]+)*\([^()]*\)$')
+
+Token = namedtuple('Token', ['kind', 'text', 'line', 'end_line'])
+
+JAVASCRIPT_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>'(?:\\.|[^'\\\n])*'?|"(?:\\.|[^"\\\n])*"?|`(?:\\.|[^`\\])*`?)
+  | (?P<number>0[xXbBoO][0-9a-fA-F_]+n?|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?n?)
+  | (?P<name>[A-Za-z_$\u0080-￿][\w$\u0080-￿]*)
+  | (?P<op>>>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|\?\?=|&&=|\|\|=|=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.|\+\+|--|[-+*/%&|^]=|<<|>>|\*\*
+          |[-+*/%<>=!&|^~?:;,.(){}\[\]@\#])
+  | (?P<other>.)
+''', re.VERBOSE | re.DOTALL)
+TEMPLATE_PLACEHOLDER = re.compile(r'\$\{([^}]*)')  # Unclosed when a nested template literal splits the token
+IDENTIFIER = re.compile(r'(?<![\w$.])[A-Za-z_$][\w$]*')
+JAVASCRIPT_REGEX = re.compile(r'/(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/[a-zA-Z]*')
+# After these a slash starts a regular expression instead of a division
+JAVASCRIPT_REGEX_PREFIX = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw', 'yield', 'await'}
+
+PHP_TOKEN = re.compile(r'''
+    (?P<close>\?>\n?)
+  | (?P<space>\s+)
+  | (?P<comment>(?://|\#(?!\[))(?:[^\n?]|\?(?!>))*|/\*.*?(?:\*/|\Z))
+  | (?P<string>'(?:\\.|[^'\\])*'?|"(?:\\.|[^"\\])*"?|<<<[ \t]*(?P<quote>['"]?)(?P<label>\w+)(?P=quote)\n.*?\n[ \t]*(?P=label)\b)
+  | (?P<variable>\$+[A-Za-z_\u0080-￿][\w\u0080-￿]*)
+  | (?P<number>0[xXbB][0-9a-fA-F_]+|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?)
+  | (?P<name>\\?[A-Za-z_\u0080-￿][\w\u0080-￿]*(?:\\[A-Za-z_\u0080-￿][\w\u0080-￿]*)*)
+  | (?P<op>\*\*=|\.\.\.|<=>|===|!==|<<=|>>=|\?\?=|\?->|->|=>|::|==|!=|<>|<=|>=|&&|\|\||\?\?|\+\+|--|[-+*/%&|^.]=|<<|>>|\*\*
+          |[-+*/%<>=!&|^~?:;,.(){}\[\]@$])
+  | (?P<other>.)
+''', re.VERBOSE | re.DOTALL)
+PHP_OPEN_TAG = re.compile(r'<\?(?:php\b|=)?', re.IGNORECASE)
+PHP_KEYWORDS = {'abstract', 'and', 'array', 'as', 'break', 'callable', 'case', 'catch', 'class', 'clone', 'const', 'continue',
+                'declare', 'default', 'do', 'echo', 'else', 'elseif', 'empty', 'enddeclare', 'endfor', 'endforeach', 'endif',
+                'endswitch', 'endwhile', 'extends', 'final', 'finally', 'fn', 'for', 'foreach', 'function', 'global', 'goto',
+                'if', 'implements', 'include', 'include_once', 'instanceof', 'insteadof', 'interface', 'isset', 'list',
+                'match', 'namespace', 'new', 'or', 'print', 'private', 'protected', 'public', 'readonly', 'require',
+                'require_once', 'return', 'static', 'switch', 'throw', 'trait', 'try', 'unset', 'use', 'var', 'while', 'xor',
+                'yield'}
+PHP_CONSTANTS = {'true', 'false', 'null'}
+PHP_INCLUDES = {'require', 'require_once', 'include', 'include_once'}
+PHP_MODIFIERS = {'abstract', 'final', 'static', 'public', 'private', 'protected'}
+PHP_VISIBILITY = {'public', 'private', 'protected'}
+# Calls that read or write local variables by name, which makes unused-variable checks unreliable
+PHP_SCOPE_FUNCTIONS = {'compact', 'extract', 'get_defined_vars', 'eval'} | PHP_INCLUDES
+PHP_SUPERGLOBALS = {'$this', '$GLOBALS'}
+
+CONTROL_KEYWORDS = {'if', 'elseif', 'for', 'foreach', 'while', 'switch', 'catch', 'with'}
+NESTING_KEYWORDS = CONTROL_KEYWORDS | {'else', 'do'}
+LOGICAL_OPERATORS = {'&&', '||', '??', 'and', 'or'}
+PROPERTY_ACCESS = {'.', '?.', '->', '?->', '::'}
+CLOSING_BRACKETS = {')': '(', ']': '[', '}': '{'}
+# Tokens after which a line break does not end a JavaScript statement
+CONTINUATION_TOKENS = {'=', '+', '-', '*', '/', '%', '?', ':', '&&', '||', '??', '.', '?.', '=>', ',', '(', '[', '{'}
+
+
+# Python
+
+def python_is_code(text):
+    """Whether a comment's text parses as Python statements rather than a word or a sentence"""
+    text = text.strip()
+    if not text or PYTHON_PRAGMA.match(text) or ABBREVIATION.search(text):
+        return False
+    # A commented-out block header like "if x:" only parses with a body
+    for candidate in (text, text + '\n    pass'):
+        try:
+            tree = ast.parse(candidate)
+        except (SyntaxError, ValueError):
+            continue
+        return any(not isinstance(statement, ast.Expr) or isinstance(statement.value, (ast.Call, ast.Await, ast.Subscript))
+                   for statement in tree.body)
+    return False
+
+
+def if_complexity(node, nesting, increment):
+    score = increment + cognitive_complexity(node.test, nesting)
+    score += sum(cognitive_complexity(statement, nesting + 1) for statement in node.body)
+    if node.orelse:
+        first = node.orelse[0]
+        # An elif starts at the column of its if; an if nested in an else is indented further
+        if len(node.orelse) == 1 and isinstance(first, ast.If) and first.col_offset == node.col_offset:
+            score += if_complexity(first, nesting, 1)
+        else:
+            score += 1 + sum(cognitive_complexity(statement, nesting + 1) for statement in node.orelse)
+    return score
+
+
+def cognitive_complexity(node, nesting=0):
+    """SonarSource's cognitive complexity of node and everything under it"""
+    if isinstance(node, ast.If):
+        return if_complexity(node, nesting, 1 + nesting)
+    if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+        header = [node.test] if isinstance(node, ast.While) else [node.target, node.iter]
+        return (1 + nesting + sum(cognitive_complexity(child, nesting) for child in header)
+                + sum(cognitive_complexity(statement, nesting + 1) for statement in node.body + node.orelse))
+    if isinstance(node, ast.Match):
+        return (1 + nesting + cognitive_complexity(node.subject, nesting)
+                + sum(cognitive_complexity(statement, nesting + 1) for case in node.cases for statement in case.body))
+    if isinstance(node, (ast.Try, ast.TryStar)):
+        return (sum(cognitive_complexity(statement, nesting) for statement in node.body + node.orelse + node.finalbody)
+                + sum(1 + nesting + sum(cognitive_complexity(statement, nesting + 1) for statement in handler.body)
+                      for handler in node.handlers))
+    if isinstance(node, ast.IfExp):
+        return (1 + nesting + cognitive_complexity(node.test, nesting)
+                + cognitive_complexity(node.body, nesting + 1) + cognitive_complexity(node.orelse, nesting + 1))
+    if isinstance(node, ast.BoolOp):
+        # Python folds a sequence of the same operator into one node
+        return 1 + sum(cognitive_complexity(value, nesting) for value in node.values)
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return sum(cognitive_complexity(statement, nesting + 1) for statement in node.body)
+    if isinstance(node, ast.Lambda):
+        return cognitive_complexity(node.body, nesting + 1)
+    return sum(cognitive_complexity(child, nesting) for child in ast.iter_child_nodes(node))
+
+
+def cyclomatic_complexity(nodes):
+    complexity = 0
+    for node in nodes:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.If, ast.IfExp, ast.For, ast.AsyncFor,
+                             ast.While, ast.match_case)):
+            complexity += 1
+        elif isinstance(node, ast.BoolOp):
+            complexity += len(node.values) - 1
+    return complexity
+
+
+def docstring(node):
+    """The docstring constant of a module, class or function node, if it has one"""
+    if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) and node.body:
+        first = node.body[0]
+        if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+            return first.value
+    return None
+
+
+def is_empty_body(body):
+    return all(isinstance(statement, ast.Pass)
+               or isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant) and statement.value.value is ...
+               for statement in body)
+
+
+class PythonChecks:
+    """The Python rules of RULES over one parsed module"""
+
+    def __init__(self, tree, comment_lines):
+        self.tree = tree
+        self.comment_lines = comment_lines
+        self.issues = []
+        # One walk of the tree, which every check reuses
+        self.nodes = [tree]
+        self.parents = {}
+        self.children = {}
+        for node in self.nodes:
+            children = self.children[node] = list(ast.iter_child_nodes(node))
+            for child in children:
+                self.parents[child] = node
+            self.nodes.extend(children)
+        self.docstrings = [constant for constant in map(docstring, self.nodes) if constant is not None]
+
+    def issue(self, rule, node, message):
+        self.issues.append((f'python:{rule}', node.lineno, message))
+
+    def has_comment(self, first_line, last_line):
+        return any(line in self.comment_lines for line in range(first_line, last_line + 1))
+
+    def descendants(self, node):
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            yield node
+            pending.extend(self.children[node])
+
+    def scope_names(self, body):
+        """First assignment of each name in a scope's statements, without the functions and classes defined in it.
+
+        Also returns the names declared global or nonlocal, and whether the scope reads locals() or vars().
+        """
+        stores, declared, dynamic = {}, set(), False
+        pending = list(body)
+        while pending:
+            node = pending.pop()
+            if isinstance(node, (ast.Global, ast.Nonlocal)):
+                declared.update(node.names)
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                first = stores.get(node.id)
+                if first is None or (node.lineno, node.col_offset) < (first.lineno, first.col_offset):
+                    stores[node.id] = node
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ('locals', 'vars'):
+                dynamic = True
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+                pending.extend(self.children[node])
+        return sorted(stores.values(), key=lambda node: (node.lineno, node.col_offset)), declared, dynamic
+
+    def enclosing_function(self, node):
+        node = self.parents.get(node)
+        while node is not None and not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            node = self.parents.get(node)
+        return node
+
+    def run(self):
+        """Check the module; returns its cognitive complexity"""
+        cognitive = 0
+        string_literals = defaultdict(list)
+        skipped_strings = {id(node) for node in self.docstrings}
+        for node in self.nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.check_function(node)
+                if self.enclosing_function(node) is None:
+                    # Nested functions count into the function they are defined in
+                    complexity = sum(cognitive_complexity(statement) for statement in node.body)
+                    cognitive += complexity
+                    if complexity > COGNITIVE_COMPLEXITY_THRESHOLD:
+                        self.issue('S3776', node, f'Refactor this function to reduce its Cognitive Complexity from {complexity} '
+                                                  f'to the {COGNITIVE_COMPLEXITY_THRESHOLD} allowed.')
+            elif isinstance(node, ast.ClassDef):
+                if not re.match(PYTHON_CLASS_NAME, node.name):
+                    self.issue('S101', node, f'Rename class "{node.name}" to match the regular expression {PYTHON_CLASS_NAME}.')
+            elif isinstance(node, ast.If):
+                self.check_if(node)
+            elif isinstance(node, (ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try)):
+                for block in (node.body, getattr(node, 'orelse', []), getattr(node, 'finalbody', [])):
+                    self.check_block(block)
+            elif isinstance(node, ast.ExceptHandler):
+                self.check_except(node)
+            elif isinstance(node, ast.Raise):
+                raised = node.exc.func if isinstance(node.exc, ast.Call) else node.exc
+                if isinstance(raised, ast.Name) and raised.id in ('Exception', 'BaseException'):
+                    self.issue('S112', node, 'Replace this generic exception class with a more specific one.')
+            elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+                if isinstance(node.operand, ast.Compare) and len(node.operand.ops) == 1:
+                    opposite = OPPOSITE_OPERATORS[type(node.operand.ops[0])]
+                    self.issue('S1940', node, f'Use the opposite operator ("{opposite}") instead.')
+            elif isinstance(node, ast.ImportFrom) and any(alias.name == '*' for alias in node.names):
+                self.issue('S2208', node, 'Import only needed names or import the module and then use its members.')
+            elif isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in skipped_strings:
+                if len(node.value) >= MIN_LITERAL_LENGTH and not isinstance(self.parents.get(node), ast.JoinedStr):
+                    string_literals[node.value].append(node)
+
+        # Module-level statements outside functions and classes
+        for statement in self.tree.body:
+            if not isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                cognitive += cognitive_complexity(statement)
+        self.check_shadowing(self.scope_names(self.tree.body)[0])
+
+        for value, nodes in string_literals.items():
+            if len(nodes) >= DUPLICATED_LITERAL_THRESHOLD:
+                self.issue('S1192', nodes[0], f"Define a constant instead of duplicating this literal '{value}' {len(nodes)} times.")
+        return cognitive
+
+    def check_if(self, node):
+        self.check_block(node.body)
+        self.check_block(node.orelse)
+        inner = node.body[0]
+        if not node.orelse and len(node.body) == 1 and isinstance(inner, ast.If) and not inner.orelse:
+            self.issue('S1066', inner, 'Merge this if statement with the enclosing one.')
+
+    def check_block(self, block):
+        if block and all(isinstance(statement, ast.Pass) for statement in block):
+            if not self.has_comment(block[0].lineno - 1, block[-1].end_lineno):
+                self.issue('S108', block[0], 'Either remove or fill this block of code.')
+
+    def check_except(self, node):
+        if any(isinstance(child, ast.Raise) for statement in node.body for child in self.descendants(statement)):
+            return
+        if node.type is None:
+            self.issue('S5754', node, 'Specify an exception class to catch or reraise the exception')
+        elif isinstance(node.type, ast.Name) and node.type.id == 'BaseException':
+            self.issue('S5754', node, 'Catch a more specific exception or reraise the exception')
+
+    def check_function(self, node):
+        kind = 'method' if isinstance(self.parents.get(node), ast.ClassDef) else 'function'
+        if not re.match(PYTHON_FUNCTION_NAME, node.name):
+            if kind == 'method':
+                self.issue('S100', node, f'Rename method "{node.name}" to match the regular expression {PYTHON_FUNCTION_NAME}.')
+            else:
+                self.issue('S1542', node, f'Rename function "{node.name}" to match the regular expression {PYTHON_FUNCTION_NAME}.')
+
+        parameters = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        if len(parameters) > MAX_PARAMETERS['python']:
+            self.issue('S107', node, f'{kind.capitalize()} "{node.name}" has {len(parameters)} parameters, which is greater '
+                                     f'than the {MAX_PARAMETERS["python"]} authorized.')
+
+        empty = is_empty_body(node.body)
+        if empty and not self.has_comment(node.lineno, node.end_lineno):
+            self.issue('S1186', node, f'Add a nested comment explaining why this {kind} is empty, or complete the implementation.')
+
+        # Names read anywhere in the function, nested functions included
+        loaded = {child.id for child in self.descendants(node) if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Store)}
+        for parameter in parameters:
+            if not re.match(PYTHON_LOCAL_NAME, parameter.arg):
+                self.issue('S117', parameter, f'Rename this parameter "{parameter.arg}" to match the regular expression '
+                                              f'{PYTHON_LOCAL_NAME}.')
+            # Methods and decorated functions often take parameters their callers impose
+            if (kind == 'function' and not node.decorator_list and not empty and parameter.arg not in loaded
+                    and not parameter.arg.startswith('_')):
+                self.issue('S1172', parameter, f'Remove the unused function parameter "{parameter.arg}".')
+        self.check_locals(node, loaded)
+
+    def check_locals(self, function, loaded):
+        stores, declared, dynamic = self.scope_names(function.body)
+        for node in stores:
+            name = node.id
+            if name in declared:
+                continue
+            if not re.match(PYTHON_LOCAL_NAME, name):
+                self.issue('S117', node, f'Rename this local variable "{name}" to match the regular expression {PYTHON_LOCAL_NAME}.')
+            if name in loaded or dynamic or name.startswith('_'):
+                continue
+            parent = self.parents.get(node)
+            target_of = self.parents.get(parent) if isinstance(parent, (ast.Tuple, ast.List)) else parent
+            if isinstance(target_of, (ast.For, ast.AsyncFor)):
+                self.issue('S1481', node, f'Replace the unused loop index "{name}" with "_".')
+            elif isinstance(parent, (ast.Tuple, ast.List)) and isinstance(target_of, ast.Assign):
+                self.issue('S1481', node, f'Replace the unused local variable "{name}" with "_".')
+            elif isinstance(parent, (ast.Assign, ast.AnnAssign)):
+                self.issue('S1481', node, f'Remove the unused local variable "{name}".')
+        self.check_shadowing(stores)
+
+    def check_shadowing(self, stores):
+        for node in stores:
+            if node.id in BUILTIN_NAMES:
+                self.issue('S5806', node, 'Rename this variable; it shadows a builtin.')
+
+
+def python_comment_issues(comments, code_lines):
+    """TODO/FIXME and commented-out code; comments are (line, text) pairs"""
+    issues = []
+    code_comment_lines = []
+    for line, text in comments:
+        if TODO.search(text):
+            issues.append(('python:S1135', line, 'Complete the task associated to this "TODO" comment.'))
+        if FIXME.search(text):
+            issues.append(('python:S1134', line, 'Take the required action to fix the issue indicated by this "FIXME" comment.'))
+        if line not in code_lines and python_is_code(text.lstrip('#')):
+            code_comment_lines.append(line)
+    # One issue per run of consecutive commented-out lines
+    for index, line in enumerate(code_comment_lines):
+        if index == 0 or code_comment_lines[index - 1] != line - 1:
+            issues.append(('python:S125', line, 'Remove this commented out code.'))
+    return issues
+
+
+def analyze_python(source):
+    """(code lines, complexity, cognitive complexity, issues, duplication tokens) of a Python file"""
+    code_lines, comments, tokens = set(), [], []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type == tokenize.COMMENT:
+                comments.append((token.start[0], token.string))
+            elif token.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER):
+                code_lines.update(range(token.start[0], token.end[0] + 1))
+                text = '$STRING' if token.type == tokenize.STRING else '$NUMBER' if token.type == tokenize.NUMBER else token.string
+                tokens.append((text, token.start[0]))
+    except (tokenize.TokenError, SyntaxError):
+        pass  # Keep what was read before the error
+
+    try:
+        tree = ast.parse(source)
+        checks = PythonChecks(tree, {line for line, _ in comments})
+        for node in checks.docstrings:
+            code_lines.difference_update(range(node.lineno, node.end_lineno + 1))
+        cognitive = checks.run()
+    except (SyntaxError, ValueError, RecursionError):
+        # SonarQube parses Python 2 too; without a tree only the lines and the comments are measured
+        return code_lines, 0, 0, python_comment_issues(comments, code_lines), tokens
+    return code_lines, cyclomatic_complexity(checks.nodes), cognitive, checks.issues + python_comment_issues(comments, code_lines), tokens
+
+
+# JavaScript and PHP
+
+def tokenize_javascript(source):
+    tokens = []
+    position, line, previous = 0, 1, None
+    while position < len(source):
+        match, kind = None, None
+        # A slash starts a regular expression where an operand is expected
+        if source[position] == '/' and source[position + 1:position + 2] not in ('/', '*') and (
+                previous is None or previous.kind == 'op' and previous.text not in (')', ']', '}')
+                or previous.kind == 'name' and previous.text in JAVASCRIPT_REGEX_PREFIX):
+            match, kind = JAVASCRIPT_REGEX.match(source, position), 'regex'
+        if match is None:
+            match = JAVASCRIPT_TOKEN.match(source, position)
+            kind = match.lastgroup
+        text = match.group()
+        end_line = line + text.count('\n')
+        if kind != 'space':
+            token = Token(kind, text, line, end_line)
+            tokens.append(token)
+            if kind != 'comment':
+                previous = token
+        position, line = match.end(), end_line
+    return tokens
+
+
+def tokenize_php(source):
+    """PHP tokens, with the text outside <?php ... ?> as 'html' tokens"""
+    tokens = []
+    position, line = 0, 1
+    while position < len(source):
+        opening = PHP_OPEN_TAG.search(source, position)
+        html = source[position:opening.start() if opening else len(source)]
+        if html:
+            tokens.append(Token('html', html, line, line + html.count('\n')))
+            line += html.count('\n')
+        if opening is None:
+            break
+        tokens.append(Token('open', opening.group(), line, line))
+        position = opening.end()
+        while position < len(source):
+            match = PHP_TOKEN.match(source, position)
+            kind, text = match.lastgroup, match.group()
+            if kind in ('quote', 'label'):
+                kind = 'string'
+            end_line = line + text.count('\n')
+            if kind != 'space':
+                tokens.append(Token(kind, text, line, end_line))
+            position, line = match.end(), end_line
+            if kind == 'close':
+                break
+    return tokens
+
+
+class Frame:
+    """A function body, or the top level of the file"""
+
+    def __init__(self, kind, name, line, start=0, parameters=0, depth=0, named=False):
+        self.kind = kind  # 'file', 'function', 'method' or 'arrow'
+        self.name = name
+        self.named = named  # Whether the name is the function's own, rather than the variable it is assigned to
+        self.line = line
+        self.start = start  # Index of the opening brace in the code tokens
+        self.end = None
+        self.parameters = parameters
+        self.depth = depth  # Functions it is nested in
+        self.empty = False
+        self.cognitive = 0
+        self.nesting = 0
+        self.returns = 0
+        self.variables = Counter()
+        self.assigned = {}
+        self.globals = set()
+        self.dynamic_scope = False
+        self.props = None  # For component-like functions: the props they destructure, or the name they take props as
+
+
+class TokenAnalyzer:
+    """Functions, nesting and the JavaScript or PHP rules of RULES over a token stream, tracked with a bracket stack"""
+
+    def __init__(self, language, tokens, source):
+        self.language = language
+        self.tokens = tokens
+        self.source = source
+        self.code = [token for token in tokens if token.kind not in ('comment', 'open', 'close', 'html')]
+        self.comment_lines = {line for token in tokens if token.kind == 'comment' for line in range(token.line, token.end_line + 1)}
+        self.issues = []
+        self.complexity = 0
+        self.frames = [Frame('file', None, 1)]
+        self.functions = []
+        self.brackets = []  # Open brackets, each a dict; braces have a 'kind'
+        self.pending_function = None
+        self.pending_class = None
+        self.expect_body = None  # Control keyword whose body should start at the next token
+        self.last_closed = None
+        self.popped_brace = None
+        self.do_while = None
+        self.ternaries = [0]  # Open ternaries per bracket level
+        self.logical = [None]  # Last logical operator per bracket level
+
+    def issue(self, rule, line, message):
+        self.issues.append((f'{self.language}:{rule}', line, message))
+
+    def text(self, index):
+        """Text of a code token; PHP keywords and names are case-insensitive, so they are lower-cased"""
+        if 0 <= index < len(self.code):
+            token = self.code[index]
+            return token.text.lower() if self.language == 'php' and token.kind == 'name' else token.text
+        return None
+
+    def kind(self, index):
+        return self.code[index].kind if 0 <= index < len(self.code) else None
+
+    @property
+    def frame(self):
+        return self.frames[-1]
+
+    def increment(self, nesting=True):
+        self.frame.cognitive += 1 + (self.frame.nesting if nesting else 0)
+
+    def run(self):
+        for index, token in enumerate(self.code):
+            self.step(index, token)
+        for frame in self.functions:
+            if frame.end is None:
+                frame.end = len(self.code)
+        self.file_rules()
+        self.comment_rules()
+        return self.issues
+
+    def step(self, index, token):
+        text = self.text(index)
+        previous = self.text(index - 1)
+        if self.brackets and self.brackets[-1]['char'] == '(' and text != ')':
+            self.brackets[-1]['items'] = True
+        if self.expect_body is not None:
+            keyword, self.expect_body = self.expect_body, None
+            if text != '{':
+                self.braceless_body(keyword, index, token)
+        if (self.language == 'javascript' and index and token.line > self.code[index - 1].end_line
+                and previous not in CONTINUATION_TOKENS and text not in CONTINUATION_TOKENS | {'?', ')', ']', '}', '||', '&&'}):
+            # Without semicolons a line break ends the statement
+            self.ternaries[-1] = 0
+            self.logical[-1] = None
+
+        if token.kind == 'name':
+            if previous not in PROPERTY_ACCESS:
+                self.keyword(index, token, text, previous)
+        elif token.kind == 'variable':
+            self.variable(index, token)
+        elif text == '{':
+            self.open_brace(index, token, previous)
+        elif text in ('(', '['):
+            self.brackets.append({'char': text, 'owner': previous, 'owner_index': index - 1, 'start': index,
+                                  'commas': 0, 'items': False})
+            self.ternaries.append(self.ternaries[-1] > 0)
+            self.logical.append(None)
+        elif text in CLOSING_BRACKETS:
+            self.close_bracket(index, token, text)
+        elif text == ';':
+            self.statement_end(index, token, previous)
+        elif text == ',':
+            if self.brackets and self.brackets[-1]['char'] == '(':
+                self.brackets[-1]['commas'] += 1
+            self.ternaries[-1] = 0
+            self.logical[-1] = None
+        elif text == '?' and (self.kind(index - 1) in ('name', 'variable', 'number', 'string', 'regex') or previous in (')', ']')):
+            self.complexity += 1
+            self.increment()
+            if self.ternaries[-1] and self.language == 'javascript':
+                self.issue('S3358', token.line, 'Extract this nested ternary operation into an independent statement.')
+            self.ternaries[-1] += 1
+        elif text in LOGICAL_OPERATORS:
+            self.logical_operator(text)
+        elif text == '=' and self.language == 'javascript':
+            self.assignment(index, token)
+
+    def keyword(self, index, token, text, previous):
+        if text in LOGICAL_OPERATORS:
+            self.logical_operator(text)
+            if self.language == 'php':
+                self.issue('S2010', token.line, f'Replace "{token.text}" with "{"||" if text == "or" else "&&"}".')
+            return
+        if text in ('if', 'elseif'):
+            self.complexity += 1
+            self.increment(nesting=text == 'if' and previous != 'else')
+            if previous == 'else' and self.language == 'php':
+                self.issue('S1793', token.line, 'Replace this "else if" keyword sequence by "elseif" keyword.')
+        elif text == 'else':
+            if self.text(index + 1) != 'if':
+                self.increment(nesting=False)
+                self.expect_body = 'else'
+        elif text in ('for', 'foreach', 'while', 'do', 'switch', 'catch'):
+            if text == 'while' and previous == '}' and self.popped_brace == 'do':
+                self.do_while = index  # The while of a do ... while closes the do
+            else:
+                self.increment()
+                if text not in ('switch', 'catch'):
+                    self.complexity += 1
+            if text == 'do':
+                self.expect_body = 'do'
+        elif text == 'case':
+            self.complexity += 1
+        elif text == 'function':
+            following = self.text(index + 1)
+            named = self.kind(index + 1) == 'name'
+            name = self.code[index + 1].text if named else None
+            if following == '&' and self.kind(index + 2) == 'name':
+                named, name = True, self.code[index + 2].text
+            elif name is None and previous in ('=', ':') and self.kind(index - 2) in ('name', 'variable'):
+                name = self.code[index - 2].text
+            self.pending_function = {'depth': len(self.brackets), 'name': name, 'named': named, 'line': token.line,
+                                     'keyword_index': index, 'parameters': None}
+        elif text in ('class', 'interface', 'trait') and previous not in ('::', 'new'):
+            name = self.code[index + 1].text if self.kind(index + 1) == 'name' else None
+            self.pending_class = {'depth': len(self.brackets)}
+            if self.language == 'php' and name and text == 'class' and not re.match(PHP_CLASS_NAME, name):
+                self.issue('S101', token.line, f'Rename class "{name}" to match the regular expression {PHP_CLASS_NAME}.')
+        elif text == 'return':
+            self.frame.returns += 1
+        elif text == 'var' and self.language == 'javascript':
+            self.issue('S3504', token.line, 'Unexpected var, use let or const instead.')
+        elif text == 'global' and self.language == 'php':
+            position = index + 1
+            while self.kind(position) == 'variable' or self.text(position) == ',':
+                self.frame.globals.add(self.code[position].text)
+                position += 1
+
+        if self.language == 'php':
+            self.php_keyword(index, token, text)
+
+    def php_keyword(self, index, token, text):
+        if text in PHP_CONSTANTS | PHP_KEYWORDS and token.text != text and self.text(index + 1) != '::':
+            kind = 'constant' if text in PHP_CONSTANTS else 'keyword'
+            self.issue('S1781', token.line, f'Write this "{token.text}" {kind} in lower case.')
+        if text in PHP_INCLUDES:
+            self.issue('S4833', token.line, f'Replace "{text}" with namespace import mechanism through the "use" keyword.')
+            if not text.endswith('_once'):
+                self.issue('S2003', token.line, f'Replace "{text}" with "{text}_once".')
+        if text in PHP_SCOPE_FUNCTIONS:
+            self.frame.dynamic_scope = True
+        if text == 'throw' and self.text(index + 1) == 'new' and self.text(index + 2) in ('exception', '\\exception'):
+            self.issue('S112', token.line, 'Define and throw a dedicated exception instead of using a generic one.')
+
+    def variable(self, index, token):
+        frame = self.frame
+        frame.variables[token.text] += 1
+        if token.text.startswith('$$'):
+            frame.dynamic_scope = True
+        if self.text(index + 1) == '=' and self.text(index - 1) not in PROPERTY_ACCESS and token.text not in frame.assigned:
+            frame.assigned[token.text] = token.line
+        # A field is a variable declared straight in a class body
+        if self.brackets and self.brackets[-1].get('kind') == 'class' and not re.match(PHP_FIELD_NAME, token.text[1:]):
+            self.issue('S116', token.line, f'Rename this field "{token.text}" to match the regular expression {PHP_FIELD_NAME}.')
+
+    def logical_operator(self, text):
+        # Only a change of operator in a sequence like a && b || c adds to the cognitive complexity
+        self.complexity += 1
+        if self.logical[-1] != text:
+            self.increment(nesting=False)
+        self.logical[-1] = text
+
+    def assignment(self, index, token):
+        # Only assignments in the condition of an if or a while, e.g. while ((match = re.exec(s)))
+        for bracket in reversed(self.brackets):
+            if bracket['char'] != '(':
+                return
+            if bracket['owner'] in ('if', 'while'):
+                break
+        else:
+            return
+        start = index - 1
+        while self.text(start - 1) == '.' and self.kind(start - 2) == 'name':
+            start -= 2
+        target = ''.join(token.text for token in self.code[start:index])
+        self.issue('S1121', token.line, f'Extract the assignment of "{target}" from this expression.')
+
+    def statement_end(self, index, token, previous):
+        self.ternaries[-1] = 0
+        self.logical[-1] = None
+        if self.pending_function is not None and self.pending_function['depth'] == len(self.brackets):
+            self.pending_function = None  # An abstract or interface method has no body
+        if self.language == 'php' and not (self.brackets and self.brackets[-1]['char'] == '(') and previous in (';', '{'):
+            self.issue('S1116', token.line, 'Remove this empty statement.')
+
+    def braceless_body(self, keyword, index, token):
+        if self.language == 'php' and self.text(index) != ':' and not (keyword == 'else' and self.text(index) == 'if'):
+            self.issue('S121', token.line, 'Add curly braces around the nested statement(s).')
+
+    def open_brace(self, index, token, previous):
+        brace = {'char': '{', 'kind': 'block', 'start': index}
+        pending = self.pending_function
+        keyword = self.body_keyword(index)
+        if pending is not None and pending['depth'] == len(self.brackets):
+            self.pending_function = None
+            in_class = bool(self.brackets) and self.brackets[-1].get('kind') == 'class'
+            parameters = pending['parameters']
+            self.enter_function(brace, 'method' if in_class else 'function', pending['name'], pending['line'], index,
+                                self.count_parameters(parameters), pending['named'])
+            if self.language == 'php':
+                self.php_function(pending, in_class)
+            else:
+                self.react_props(brace['frame'], parameters)
+        elif previous == '=>' and self.language == 'javascript':
+            parameters = self.last_closed if self.text(index - 2) == ')' else None
+            start = parameters['start'] if parameters else index - 2
+            name = self.code[start - 2].text if self.text(start - 1) == '=' and self.kind(start - 2) == 'name' else None
+            self.enter_function(brace, 'arrow', name, token.line, index,
+                                self.count_parameters(parameters) if parameters else 1)
+            self.react_props(brace['frame'], parameters or {'start': start - 1, 'end': start + 1})
+        elif self.pending_class is not None and self.pending_class['depth'] == len(self.brackets):
+            self.pending_class = None
+            brace['kind'] = 'class'
+        elif keyword is not None:
+            brace['kind'] = 'control'
+            brace['keyword'] = keyword
+            self.frame.nesting += 1
+        elif (previous == ')' and self.language == 'javascript' and self.last_closed is not None
+              and self.kind(self.last_closed['owner_index']) == 'name' and self.last_closed['owner'] not in CONTROL_KEYWORDS):
+            # A method: name(parameters) {
+            owner = self.code[self.last_closed['owner_index']]
+            self.enter_function(brace, 'method', owner.text, owner.line, index, self.count_parameters(self.last_closed), True)
+        self.brackets.append(brace)
+        self.ternaries.append(0)
+        self.logical.append(None)
+
+    def body_keyword(self, index):
+        """The control keyword whose body the brace at index opens, if any"""
+        previous = self.text(index - 1)
+        if previous in ('else', 'do'):
+            return previous
+        if previous == ')' and self.last_closed is not None and self.last_closed['end'] == index - 1 \
+                and self.last_closed['owner'] in CONTROL_KEYWORDS:
+            return self.last_closed['owner']
+        return None
+
+    def enter_function(self, brace, kind, name, line, start, parameters, named=False):
+        depth = len(self.frames) - 1
+        frame = Frame(kind, name, line, start, parameters, depth, named)
+        self.complexity += 1
+        brace['kind'] = 'function'
+        brace['frame'] = frame
+        self.frames.append(frame)
+        self.functions.append(frame)
+        if self.language == 'javascript' and depth == MAX_FUNCTION_NESTING:
+            self.issue('S2004', line, f'Refactor this code to not nest functions more than {MAX_FUNCTION_NESTING} levels deep.')
+
+    def php_function(self, pending, in_class):
+        name = pending['name']
+        if pending['named'] and not name.startswith('__') and not re.match(PHP_FUNCTION_NAME, name):
+            self.issue('S100', pending['line'], f'Rename function "{name}" to match the regular expression {PHP_FUNCTION_NAME}.')
+        if in_class:
+            modifiers = set()
+            position = pending['keyword_index'] - 1
+            while self.text(position) in PHP_MODIFIERS:
+                modifiers.add(self.text(position))
+                position -= 1
+            if not modifiers & PHP_VISIBILITY:
+                self.issue('S1784', pending['line'], f'Explicitly mention the visibility of this method "{name}".')
+
+    def count_parameters(self, bracket):
+        if bracket is None or not bracket['items']:
+            return 0
+        return bracket['commas'] + 1
+
+    def react_props(self, frame, parameters):
+        """Remember the props a component-like function takes, for the props validation rule"""
+        if not frame.name or not frame.name[:1].isupper() or parameters is None:
+            return
+        names = self.code[parameters['start'] + 1:parameters['end']]
+        if names and names[0].text == '{':
+            # Destructured, as in ({a, b: c, d = 1})
+            depth, props = 0, []
+            for position, token in enumerate(names):
+                if token.text in ('{', '[', '('):
+                    depth += 1
+                elif token.text in ('}', ']', ')'):
+                    depth -= 1
+                elif depth == 1 and token.kind == 'name' and names[position - 1].text in ('{', ','):
+                    props.append((token.text, token.line))
+            frame.props = props
+        elif len(names) == 1 and names[0].kind == 'name':
+            frame.props = names[0].text
+
+    def close_bracket(self, index, token, text):
+        if not self.brackets or self.brackets[-1]['char'] != CLOSING_BRACKETS[text]:
+            return  # Unbalanced, e.g. after a misread regular expression
+        bracket = self.brackets.pop()
+        self.ternaries.pop()
+        self.logical.pop()
+        bracket['end'] = index
+        if text == ')':
+            self.last_closed = bracket
+            pending = self.pending_function
+            if pending is not None and pending['parameters'] is None and pending['depth'] == len(self.brackets):
+                pending['parameters'] = bracket
+            if (self.language == 'php' and bracket['owner'] in PHP_INCLUDES | {'echo', 'print', 'return'}
+                    and self.kind(bracket['owner_index']) == 'name' and self.text(index + 1) in (';', None)):
+                self.issue('S6600', token.line, f'Remove the parentheses from this "{bracket["owner"]}" call.')
+            if bracket['owner'] in CONTROL_KEYWORDS and bracket['owner_index'] != self.do_while and self.text(index + 1) != '{':
+                self.expect_body = bracket['owner']
+        elif text == '}':
+            self.popped_brace = bracket.get('keyword')
+            if bracket['kind'] == 'control':
+                self.frame.nesting -= 1
+            elif bracket['kind'] == 'function':
+                frame = self.frames.pop()
+                frame.end = index
+                frame.empty = bracket['start'] == index - 1 and not any(
+                    line in self.comment_lines for line in range(self.code[index - 1].line, token.line + 1))
+
+    def file_rules(self):
+        language = self.language
+        limit = MAX_PARAMETERS[language]
+        for frame in self.functions:
+            word = 'method' if frame.kind == 'method' else 'function'
+            if frame.cognitive > COGNITIVE_COMPLEXITY_THRESHOLD:
+                self.issue('S3776', frame.line, f'Refactor this function to reduce its Cognitive Complexity from {frame.cognitive} '
+                                                f'to the {COGNITIVE_COMPLEXITY_THRESHOLD} allowed.')
+            if frame.parameters > limit:
+                if language == 'php':
+                    message = f'This {word} has {frame.parameters} parameters, which is greater than the {limit} authorized.'
+                elif frame.named:
+                    message = f"Function '{frame.name}' has too many parameters ({frame.parameters}). Maximum allowed is {limit}."
+                else:
+                    message = f'Function has too many parameters ({frame.parameters}). Maximum allowed is {limit}.'
+                self.issue('S107', frame.line, message)
+            if frame.empty and language == 'php':
+                self.issue('S1186', frame.line, f'Add a nested comment explaining why this {word} is empty, throw an Exception '
+                                                f'or complete the implementation.')
+            elif frame.empty and frame.kind != 'arrow':
+                self.issue('S1186', frame.line, f"Unexpected empty {word} '{frame.name}'." if frame.named
+                                                else f'Unexpected empty {word}.')
+            if language == 'php':
+                self.php_function_rules(frame, word)
+        if language == 'javascript':
+            self.javascript_file_rules()
+        else:
+            self.php_file_rules()
+
+    def php_function_rules(self, frame, word):
+        if frame.returns > MAX_RETURNS:
+            self.issue('S1142', frame.line, f'This {word} has {frame.returns} returns, which is more than the {MAX_RETURNS} allowed.')
+        for variable, line in frame.assigned.items():
+            if variable in PHP_SUPERGLOBALS or variable in frame.globals:
+                continue
+            if not re.match(PHP_LOCAL_NAME, variable[1:]):
+                self.issue('S117', line, f'Rename this local variable "{variable}" to match the regular expression {PHP_LOCAL_NAME}.')
+            if frame.variables[variable] == 1 and not frame.dynamic_scope:
+                self.issue('S1481', line, f'Remove this unused "{variable}" local variable.')
+
+    def php_file_rules(self):
+        lines = self.source.split('\n')
+        for number, line in enumerate(lines, 1):
+            if line != line.rstrip(' \t'):
+                self.issue('S1131', number, 'Remove the useless trailing whitespaces at the end of this line.')
+        if '\t' in self.source:
+            self.issue('S105', self.source[:self.source.index('\t')].count('\n') + 1,
+                       'Replace all tab characters in this file by sequences of white-spaces.')
+        if self.source and not self.source.endswith('\n'):
+            self.issue('S113', len(lines), 'Add a new line at the end of this file.')
+        significant = [token for token in self.tokens if token.kind != 'html' or token.text.strip()]
+        if significant and significant[-1].kind == 'close':
+            self.issue('S1780', significant[-1].line, 'Remove this closing tag "?>".')
+
+        literals = defaultdict(list)
+        for token in self.code:
+            if token.kind == 'string' and token.text[:1] in ('"', "'") and len(token.text) - 2 >= MIN_LITERAL_LENGTH:
+                literals[token.text[1:-1]].append(token)
+        for value, tokens in literals.items():
+            if len(tokens) >= DUPLICATED_LITERAL_THRESHOLD:
+                self.issue('S1192', tokens[0].line, f'Define a constant instead of duplicating this literal "{value}" {len(tokens)} times.')
+
+    def name_uses(self, start, end):
+        """Identifier uses between two tokens, not counting property names but counting the ones in template literal placeholders"""
+        uses = Counter(self.code[index].text for index in range(start, end)
+                       if self.code[index].kind == 'name' and self.text(index - 1) not in PROPERTY_ACCESS)
+        for token in self.code[start:end]:
+            if token.kind == 'string' and token.text.startswith('`'):
+                for placeholder in TEMPLATE_PLACEHOLDER.findall(token.text):
+                    uses.update(IDENTIFIER.findall(placeholder))
+        return uses
+
+    def javascript_file_rules(self):
+        uses = self.name_uses(0, len(self.code))
+        has_jsx = any(token.text == '<' and self.kind(index + 1) == 'name'
+                      and self.text(index - 1) in ('(', 'return', '=>', '?', ':', '&&', '||', ',', '>', '}')
+                      for index, token in enumerate(self.code))
+        # Innermost function of every token; a local variable is only used inside it (or the functions nested in it)
+        enclosing = [None] * len(self.code)
+        for frame in sorted(self.functions, key=lambda frame: frame.start - frame.end):
+            enclosing[frame.start:frame.end] = [frame] * (frame.end - frame.start)
+        function_uses = {}
+
+        for index, token in enumerate(self.code):
+            if token.text == 'import' and enclosing[index] is None and self.text(index + 1) not in ('(', '.'):
+                for name, line in self.import_names(index):
+                    # The JSX transform needs React in scope without naming it
+                    if uses[name] <= 1 and not (name == 'React' and has_jsx):
+                        self.issue('S1128', line, f"Remove this unused import of '{name}'.")
+            elif token.text in ('const', 'let', 'var') and enclosing[index] is not None and token.kind == 'name':
+                frame = enclosing[index]
+                if id(frame) not in function_uses:
+                    function_uses[id(frame)] = self.name_uses(frame.start, frame.end)
+                for name, line in self.declared_names(index + 1):
+                    if function_uses[id(frame)][name] <= 1:
+                        self.issue('S1481', line, f"Remove the declaration of the unused '{name}' variable.")
+
+        if has_jsx and not uses['propTypes'] and not any(token.text == 'propTypes' for token in self.code):
+            self.react_props_rules()
+
+    def import_names(self, index):
+        """Local names an import statement binds, with their lines"""
+        names = []
+        position = index + 1
+        while position < len(self.code) and self.text(position) not in ('from', ';') and self.kind(position) != 'string':
+            text = self.text(position)
+            # In "a as b" the local name is b
+            if self.kind(position) == 'name' and text not in ('as', 'type') and self.text(position + 1) != 'as':
+                names.append((text, self.code[position].line))
+            position += 1
+        return names
+
+    def declared_names(self, position):
+        """Names a const, let or var declaration binds, with their lines"""
+        names = []
+        while position < len(self.code):
+            text = self.text(position)
+            if self.kind(position) == 'name':
+                names.append((text, self.code[position].line))
+                position += 1
+            elif text in ('{', '['):
+                # A destructuring pattern binds the names that are not keys or defaults
+                depth, pattern, rest = 0, [], False
+                while position < len(self.code):
+                    text = self.text(position)
+                    if text in ('{', '[', '('):
+                        depth += 1
+                    elif text in ('}', ']', ')'):
+                        depth -= 1
+                        if depth == 0:
+                            position += 1
+                            break
+                    elif (depth == 1 and self.kind(position) == 'name' and self.text(position + 1) in (',', '}', ']', '=')
+                          and self.text(position - 1) != '=' and self.text(position - 1) not in PROPERTY_ACCESS):
+                        pattern.append((text, self.code[position].line))
+                    elif depth == 1 and text == '...':
+                        # Like SonarQube, the names next to a rest element are not reported: they are there to leave it out
+                        rest = True
+                    position += 1
+                if not rest:
+                    names.extend(pattern)
+            else:
+                return names
+            position = self.next_declarator(position)
+            if position is None:
+                return names
+        return names
+
+    def next_declarator(self, position):
+        """Skip an initializer; the position of the next declarator of the declaration, or None at its end"""
+        depth = 0
+        while position < len(self.code):
+            text = self.text(position)
+            if text in ('{', '[', '('):
+                depth += 1
+            elif text in ('}', ']', ')'):
+                depth -= 1
+                if depth < 0:
+                    return None
+            elif depth == 0 and text in (';', 'in', 'of'):
+                return None
+            elif depth == 0 and text == ',':
+                return position + 1
+            if (depth == 0 and position + 1 < len(self.code) and self.code[position + 1].line > self.code[position].line
+                    and text not in CONTINUATION_TOKENS and self.kind(position + 1) == 'name'):
+                return None  # No semicolon: the declaration ended with the line
+            position += 1
+        return None
+
+    def react_props_rules(self):
+        for frame in self.functions:
+            if isinstance(frame.props, list):
+                for prop, line in frame.props:
+                    self.issue('S6774', line, f"'{prop}' is missing in props validation")
+            elif frame.props is not None:
+                self.props_reads(frame.start, frame.end, [frame.props])
+        # Class components read this.props
+        self.props_reads(0, len(self.code), ['this', 'props'])
+
+    def props_reads(self, start, end, prefix):
+        reported = set()
+        length = 2 * len(prefix)
+        for index in range(start, end):
+            if all(self.text(index + 2 * offset) == part and self.text(index + 2 * offset + 1) == '.'
+                   for offset, part in enumerate(prefix)) and self.kind(index + length) == 'name':
+                prop = self.text(index + length)
+                if prop not in reported:
+                    reported.add(prop)
+                    self.issue('S6774', self.code[index + length].line, f"'{prop}' is missing in props validation")
+
+    def comment_rules(self):
+        code_lines = {line for token in self.code for line in range(token.line, token.end_line + 1)}
+        fixme = ('Take the required action to fix the issue indicated by this comment.' if self.language == 'javascript'
+                 else 'Take the required action to fix the issue indicated by this "FIXME" comment.')
+        previous_code_comment = None
+        for token in self.tokens:
+            if token.kind != 'comment':
+                continue
+            if TODO.search(token.text):
+                self.issue('S1135', token.line, 'Complete the task associated to this "TODO" comment.')
+            if FIXME.search(token.text):
+                self.issue('S1134', token.line, fixme)
+
+            # Commented-out code: once per block comment or run of line comments, documentation and trailing comments aside
+            if token.text.startswith('/**') or token.line in code_lines:
+                previous_code_comment = None
+                continue
+            text = token.text[2:-2] if token.text.startswith('/*') else token.text.lstrip('/#')
+            lines = [line.strip().lstrip('*').strip() for line in text.split('\n')]
+            lines = [line for line in lines if line]
+            is_code = bool(lines) and 2 * sum(1 for line in lines if CODE_COMMENT.search(line)) >= len(lines)
+            if is_code and previous_code_comment != token.line - 1:
+                self.issue('S125', token.line, 'Remove this commented out code.')
+            previous_code_comment = token.end_line if is_code else None
+
+
+def analyze_tokens(language, source):
+    """(code lines, complexity, cognitive complexity, issues, duplication tokens) of a JavaScript or PHP file"""
+    tokens = tokenize_javascript(source) if language == 'javascript' else tokenize_php(source)
+    analyzer = TokenAnalyzer(language, tokens, source)
+    issues = analyzer.run()
+    code_lines = set()
+    for token in tokens:
+        if token.kind == 'html':
+            # Inline HTML counts, its blank lines aside
+            code_lines.update(token.line + offset for offset, line in enumerate(token.text.split('\n')) if line.strip())
+        elif token.kind != 'comment':
+            code_lines.update(range(token.line, token.end_line + 1))
+    cognitive = sum(frame.cognitive for frame in analyzer.frames[:1] + analyzer.functions)
+    duplication = [('$STRING' if token.kind == 'string' else '$NUMBER' if token.kind == 'number' else token.text, token.line)
+                   for token in analyzer.code]
+    return code_lines, analyzer.complexity, cognitive, issues, duplication
+
+
+# Files and repositories
+
+def is_minified(path, source):
+    lines = source.count('\n') + 1
+    return path.endswith(MINIFIED_SUFFIXES) or len(source) / lines > MINIFIED_LINE_LENGTH
+
+
+def duplication_windows(tokens):
+    """Rolling hash of every run of DUPLICATION_TOKENS tokens, with the lines it spans"""
+    if len(tokens) < DUPLICATION_TOKENS:
+        return []
+    # crc32, unlike hash(), is the same in every worker process
+    values = [zlib.crc32(text.encode('utf-8', 'surrogatepass')) for text, _ in tokens]
+    power = pow(DUPLICATION_BASE, DUPLICATION_TOKENS - 1, DUPLICATION_MODULUS)
+    windows = []
+    value_hash = 0
+    for index, value in enumerate(values):
+        if index >= DUPLICATION_TOKENS:
+            value_hash = (value_hash - values[index - DUPLICATION_TOKENS] * power) % DUPLICATION_MODULUS
+        value_hash = (value_hash * DUPLICATION_BASE + value) % DUPLICATION_MODULUS
+        if index >= DUPLICATION_TOKENS - 1:
+            windows.append((value_hash, tokens[index - DUPLICATION_TOKENS + 1][1], tokens[index][1]))
+    return windows
+
+
+def analyze_file(path):
+    """Measures, issues and duplication windows of one source file; None for files SonarQube would skip.
+
+    A file that couldn't be analyzed gives only its path and the error, so its repository is known to be incomplete.
+    """
+    language = EXTENSION_LANGUAGES[os.path.splitext(path)[1]]
+    try:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            source = file.read()
+        if language == 'javascript' and is_minified(path, source):
+            return None
+        analyze = analyze_python if language == 'python' else lambda source: analyze_tokens(language, source)
+        code_lines, complexity, cognitive, issues, tokens = analyze(source)
+    except Exception as e:
+        print(f"Couldn't analyze {path}: {e}")
+        return {'path': path, 'error': str(e)}
+    return {
+        'path': path,
+        'ncloc': len(code_lines),
+        'complexity': complexity,
+        'cognitive_complexity': cognitive,
+        'issues': sorted(issues, key=lambda issue: issue[1]),
+        'windows': duplication_windows(tokens),
+    }
+
+
+def source_files(repo_path):
+    """The files the scanner would pick up, in a stable order"""
+    paths = []
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = sorted(name for name in dirs if name not in EXCLUDED_DIRS)
+        paths.extend(os.path.join(root, name) for name in sorted(files) if os.path.splitext(name)[1] in EXTENSION_LANGUAGES)
+    return paths
+
+
+def add_duplicated_lines(results):
+    """Lines of each file covered by a run of tokens that also appears elsewhere in the repository"""
+    counts = Counter(window[0] for result in results for window in result['windows'])
+    for result in results:
+        lines = set()
+        for value_hash, first_line, last_line in result.pop('windows'):
+            if counts[value_hash] > 1:
+                lines.update(range(first_line, last_line + 1))
+        result['duplicated_lines'] = len(lines)
+
+
+def repository_analysis(project_key, results):
+    """Files and issues of one repository, shaped like SonarQube's component tree and issue search results"""
+    add_duplicated_lines(results)
+    components, issues = [], []
+    for result in results:
+        path = os.path.normpath(result['path']).replace(os.sep, '/')
+        components.append({'qualifier': 'FIL', 'path': path,
+                           'measures': [{'metric': metric, 'value': str(result[metric])}
+                                        for metric in ('ncloc', 'complexity', 'cognitive_complexity', 'duplicated_lines')]})
+        for index, (rule, line, message) in enumerate(result['issues']):
+            issue_type, severity, impacts = RULES[rule]
+            key = hashlib.sha1(f'{project_key}:{path}:{index}:{rule}:{line}'.encode()).hexdigest()[:20]
+            issues.append({'key': key, 'component': f'{project_key}:{path}', 'line': line, 'rule': rule, 'type': issue_type,
+                           'impacts': [{'softwareQuality': quality, 'severity': level} for quality, level in impacts],
+                           'severity': severity, 'status': 'OPEN', 'message': message})
+    return components, issues
+
+
+def analyze_repositories(repositories, executor=None):
+    """(repo_path, project_key, components, issues, failed) of each (repo_path, project_key) pair, in order.
+
+    failed lists the files that couldn't be analyzed, which are missing from the components and issues.
+
+    The files of all the repositories go through one map over the executor's
+    worker processes, so small repositories still keep every worker busy, and
+    each repository is yielded as soon as its last file is analyzed.
+    """
+    repositories = [(repo_path, project_key, source_files(repo_path)) for repo_path, project_key in repositories]
+    paths = [path for _, _, files in repositories for path in files]
+    results = executor.map(analyze_file, paths, chunksize=FILES_PER_TASK) if executor else map(analyze_file, paths)
+    for repo_path, project_key, files in repositories:
+        file_results = [result for result in itertools.islice(results, len(files)) if result is not None]
+        failed = [result['path'] for result in file_results if 'error' in result]
+        file_results = [result for result in file_results if 'error' not in result]
+        yield (repo_path, project_key) + repository_analysis(project_key, file_results) + (failed,)
+
+
+def analyze_repository(repo_path, project_key, executor=None):
+    _, _, components, issues, _ = next(analyze_repositories([(repo_path, project_key)], executor))
+    return components, issues
+
+
+def local_analysis_executor(workers=LOCAL_ANALYSIS_WORKERS):
+    return ProcessPoolExecutor(max_workers=workers)
@@ -0,0 +1,120 @@
+import argparse
+import glob
+import os
+
+import pandas as pd
+
+from agregator import SEVERITIES, load_condensed
+from git_history import EXTENSION_LANGUAGES
+from metrics_loader import METRICS_DATASET, load_condensed_reports
+
+# Dataset agregator.py builds from the local backend's reports (agregator.py --repos results-local --dataset ...)
+LOCAL_DATASET_DIR = 'metrics-parquet-local'
+CALIBRATION_REPORT = 'local_calibration.csv'
+CALIBRATION_SUMMARY = 'local_calibration_summary.csv'
+# Languages with less code than this on either side give no density
+MIN_LOC = 500
+CONDENSED_SUFFIX = '_condensed_report.xlsx'
+
+# Severities compared together; the local rules are a subset, so the groups are calibrated separately
+SEVERITY_GROUPS = {
+    'total': SEVERITIES,
+    'high': ['BLOCKER', 'CRITICAL'],
+    'medium': ['MAJOR'],
+    'low': ['MINOR', 'INFO'],
+}
+
+
+def language_totals(issues, consolidated):
+    """LOC and issues of each SEVERITY_GROUPS group per (user, language), from condensed views with a 'user' column"""
+    languages = {extension.lstrip('.'): language for extension, language in EXTENSION_LANGUAGES.items()}
+    loc = consolidated.assign(language=consolidated['File Extension'].astype(str).str.lower().map(languages))
+    loc = loc.dropna(subset=['language']).groupby(['user', 'language'])['Total LOC'].sum().rename('loc')
+
+    issues = issues.assign(language=issues['File Extension'].astype(str).str.lower().map(languages))
+    issues = issues.dropna(subset=['language'])
+    counts = pd.DataFrame({group: issues[severities].sum(axis=1) for group, severities in SEVERITY_GROUPS.items()})
+    counts = counts.groupby([issues['user'], issues['language']]).sum()
+    return pd.concat([loc, counts], axis=1).fillna(0).astype('float64')
+
+
+def sonarqube_totals(dataset_dir=METRICS_DATASET):
+    """language_totals of the condensed workbooks SonarQube's reports were aggregated into"""
+    paths = sorted(glob.glob(os.path.join(dataset_dir, '**', f'*{CONDENSED_SUFFIX}'), recursive=True))
+    issues, consolidated = [], []
+    for path, sheets in load_condensed_reports(paths).items():
+        # Users without any scanned repository have an empty workbook
+        if 'Condensed Issues' not in sheets:
+            continue
+        user = os.path.basename(path)[:-len(CONDENSED_SUFFIX)]
+        issues.append(sheets['Condensed Issues'].assign(user=user))
+        consolidated.append(sheets['Condensed Consolidated'].assign(user=user))
+    return language_totals(pd.concat(issues, ignore_index=True), pd.concat(consolidated, ignore_index=True))
+
+
+def local_totals(dataset_dir=LOCAL_DATASET_DIR):
+    views = load_condensed(dataset_dir=dataset_dir)
+    issues, consolidated = views['Condensed Issues'], views['Condensed Consolidated']
+    return language_totals(issues.assign(user=issues['user'].astype(str)),
+                           consolidated.assign(user=consolidated['user'].astype(str)))
+
+
+def calibrate(sonarqube, local, min_loc=MIN_LOC):
+    """Issues per KLOC of both backends for every (user, language, group) with at least min_loc on each side"""
+    both = sonarqube.join(local, how='inner', lsuffix='_sonarqube', rsuffix='_local')
+    both = both[(both['loc_sonarqube'] >= min_loc) & (both['loc_local'] >= min_loc)]
+    rows = []
+    for group in SEVERITY_GROUPS:
+        sonarqube_density = both[f'{group}_sonarqube'] / both['loc_sonarqube'] * 1000
+        local_density = both[f'{group}_local'] / both['loc_local'] * 1000
+        rows.append(pd.DataFrame({
+            'group': group,
+            'sonarqube_loc': both['loc_sonarqube'],
+            'local_loc': both['loc_local'],
+            'sonarqube_issues': both[f'{group}_sonarqube'],
+            'local_issues': both[f'{group}_local'],
+            'sonarqube_density': sonarqube_density,
+            'local_density': local_density,
+            # Undefined where SonarQube found nothing of the group
+            'density_ratio': (local_density / sonarqube_density).where(sonarqube_density > 0),
+        }))
+    return pd.concat(rows).reset_index()
+
+
+def summarize(calibration):
+    """Per language and group: how far the local densities are from SonarQube's, and whether they rank developers alike"""
+    def summary(rows):
+        # A rank correlation needs a few developers, and some spread on both sides
+        ranked = len(rows) >= 3 and rows['sonarqube_density'].nunique() > 1 and rows['local_density'].nunique() > 1
+        return pd.Series({
+            'developers': len(rows),
+            'median_density_ratio': rows['density_ratio'].median(),
+            'spearman': rows['sonarqube_density'].corr(rows['local_density'], method='spearman') if ranked else float('nan'),
+            'loc_ratio': rows['local_loc'].sum() / rows['sonarqube_loc'].sum(),
+        })
+    summaries = {key: summary(rows) for key, rows in calibration.groupby(['language', 'group'], sort=True)}
+    return pd.DataFrame(summaries).T.astype({'developers': 'int64'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the local backend's issue densities with SonarQube's, per developer and language")
+    parser.add_argument('--local-dataset', default=LOCAL_DATASET_DIR, help='Dataset aggregated from the local reports')
+    parser.add_argument('--metrics-dataset', default=METRICS_DATASET, help='Folder with the condensed SonarQube workbooks')
+    parser.add_argument('--output', default=CALIBRATION_REPORT, help='Per developer densities; the summary goes next to it')
+    parser.add_argument('--min-loc', type=int, default=MIN_LOC, help='Least LOC of a language on each side to compare it')
+    args = parser.parse_args()
+
+    calibration = calibrate(sonarqube_totals(args.metrics_dataset), local_totals(args.local_dataset), args.min_loc)
+    if calibration.empty:
+        print("No developer has reports from both backends")
+        return
+    summary = summarize(calibration)
+    summary_file = os.path.join(os.path.dirname(args.output), CALIBRATION_SUMMARY)
+    calibration.to_csv(args.output, index=False)
+    summary.to_csv(summary_file, index_label=['language', 'group'])
+    print(summary.to_string(float_format=lambda value: f'{value:.2f}'))
+    print(f"Calibration written to {args.output} and {summary_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+METRICS_DATASET = 'metrics-dataset'
+# Combined sheets of every workbook, one Parquet file per sheet, and the manifest of the workbooks they came from
+LOADER_CACHE_DIR = '.metrics_cache'
+LOADER_MANIFEST = 'manifest.json'
+LOADER_WORKERS = os.cpu_count() or 1
+SOURCE_COLUMN = 'Source File'
+
+
+def file_state(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def read_workbook(path):
+    """Every sheet of a workbook, from a single open and parse of the file"""
+    return pd.read_excel(path, sheet_name=None)
+
+
+def sheet_cache_file(cache_dir, sheet):
+    return os.path.join(cache_dir, sheet.lower().replace(' ', '_') + '.parquet')
+
+
+class MetricsCache:
+    """The sheets of a set of workbooks, combined into one table per sheet name.
+
+    The manifest keeps the size, mtime and hash of each workbook and the
+    [name, columns] of each of its sheets in order, so empty and missing
+    sheets come back as they were in the workbook.
+    """
+
+    def __init__(self, cache_dir=LOADER_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.manifest_file = os.path.join(cache_dir, LOADER_MANIFEST)
+        self.entries = {}
+        self.touched = False  # Entries whose mtime changed without their contents
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def is_current(self, path):
+        """Whether the cached sheets of `path` match the file; a changed mtime alone is confirmed with its hash"""
+        entry = self.entries.get(path)
+        if entry is None or not os.path.exists(path):
+            return False
+        state = file_state(path)
+        if state == {key: entry[key] for key in state}:
+            return True
+        if file_hash(path) != entry['sha256']:
+            return False
+        entry.update(state)
+        self.touched = True
+        return True
+
+    def load(self):
+        """{sheet name: combined DataFrame with SOURCE_COLUMN} of everything cached"""
+        sheets = {sheet for entry in self.entries.values() for sheet, _ in entry['sheets']}
+        return {sheet: pd.read_parquet(sheet_cache_file(self.cache_dir, sheet))
+                for sheet in sheets if os.path.exists(sheet_cache_file(self.cache_dir, sheet))}
+
+    def save(self, combined, entries):
+        """Replace the cache with `combined` sheets, built from the workbooks in `entries`"""
+        temporary = self.cache_dir + '.tmp'
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+        for sheet, df in combined.items():
+            df.to_parquet(sheet_cache_file(temporary, sheet), index=False)
+        with open(os.path.join(temporary, LOADER_MANIFEST), 'w', encoding='utf-8') as file:
+            json.dump(entries, file, indent=1, sort_keys=True)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.replace(temporary, self.cache_dir)
+        self.entries = entries
+
+
+def combine(frames_by_file, sheets):
+    """One DataFrame per sheet name with the rows of every workbook, tagged with SOURCE_COLUMN"""
+    combined = {}
+    for sheet in sheets:
+        # Empty sheets are left out, their object columns would widen the dtypes of the others
+        frames = [df.assign(**{SOURCE_COLUMN: path}) for path, workbook in frames_by_file.items()
+                  for name, df in workbook.items() if name == sheet and len(df)]
+        if frames:
+            combined[sheet] = pd.concat(frames, ignore_index=True)
+    return combined
+
+
+def load_condensed_reports(paths, cache_dir=LOADER_CACHE_DIR, workers=LOADER_WORKERS):
+    """{path: {sheet name: DataFrame}} of the given workbooks, as pd.read_excel(path, sheet_name=None) returns them.
+
+    Workbooks unchanged since the last call come from the cache; the others
+    are read in a pool of `workers` processes and the cache is rewritten to
+    hold the workbooks of this call.
+    """
+    paths = list(paths)
+    cache = MetricsCache(cache_dir)
+    current = [path for path in paths if cache.is_current(path)]
+    stale = [path for path in paths if path not in set(current)]
+
+    cached = cache.load() if current else {}
+    workbooks = {}
+    if current:
+        current_set = set(current)
+        for sheet, df in cached.items():
+            df = df[df[SOURCE_COLUMN].isin(current_set)]
+            for path, rows in df.groupby(SOURCE_COLUMN, sort=False):
+                workbooks.setdefault(path, {})[sheet] = rows
+        for path in current:
+            sheets = workbooks.setdefault(path, {})
+            workbooks[path] = {
+                sheet: sheets[sheet][columns].reset_index(drop=True) if sheet in sheets else pd.DataFrame(columns=columns or None)
+                for sheet, columns in cache.entries[path]['sheets']
+            }
+
+    if stale:
+        print(f"Reading {len(stale)} of {len(paths)} workbooks")
+        if workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as executor:
+                workbooks.update(zip(stale, executor.map(read_workbook, stale)))
+        else:
+            workbooks.update((path, read_workbook(path)) for path in stale)
+
+    if stale or cache.touched or set(cache.entries) != set(paths):
+        entries = {path: cache.entries[path] for path in current}
+        for path in stale:
+            entries[path] = dict(file_state(path), sha256=file_hash(path),
+                                 sheets=[[sheet, df.columns.tolist()] for sheet, df in workbooks[path].items()])
+        sheets = {sheet for entry in entries.values() for sheet, _ in entry['sheets']}
+        cache.save(combine({path: workbooks[path] for path in paths}, sheets), entries)
+    return {path: workbooks[path] for path in paths}
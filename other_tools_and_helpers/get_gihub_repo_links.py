@@ -1,6 +1,11 @@
 import os
+import sys
 import csv
-from git import Repo
+
+# Make the top-level scripts importable when running from other_tools_and_helpers/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from repo_inventory import load_inventory
 
 # Define the path to the repos_v2 folder
 repos_folder = '../repos_v2'
@@ -16,29 +21,15 @@ with open(output_csv, mode='w', newline='') as csv_file:
     # Write the header
     writer.writeheader()
 
-    # Iterate over each user directory in the repos_v2 folder
-    for username in os.listdir(repos_folder):
-        user_path = os.path.join(repos_folder, username)
-
-        # Check if the path is a directory
-        if os.path.isdir(user_path):
-            # Iterate over each repo directory within the user directory
-            for repo_name in os.listdir(user_path):
-                repo_path = os.path.join(user_path, repo_name)
-
-                # Check if the path is a directory and contains a .git folder
-                if os.path.isdir(repo_path) and os.path.exists(os.path.join(repo_path, '.git')):
-                    try:
-                        # Open the repository
-                        repo = Repo(repo_path)
-
-                        # Get the remote URL
-                        remote_url = next(repo.remote().urls)
-
-                        # Write the data to the CSV file
-                        writer.writerow({'Username': username, 'Repo Name': repo_name, 'Remote URL': remote_url})
+    # The remote URLs come from the inventory, which reads .git/config directly
+    for entry in load_inventory(repos_folder).repos():
+        if not entry['git']:
+            continue
+        if entry['remote_url'] is None:
+            print(f"Error processing repository {entry['repo']} for user {entry['user']}: no remote")
+            continue
 
-                    except Exception as e:
-                        print(f"Error processing repository {repo_name} for user {username}: {e}")
+        # Write the data to the CSV file
+        writer.writerow({'Username': entry['user'], 'Repo Name': entry['repo'], 'Remote URL': entry['remote_url']})
 
-print(f"CSV file '{output_csv}' has been created.")
\ No newline at end of file
+print(f"CSV file '{output_csv}' has been created.")
@@ -0,0 +1,130 @@
+import argparse
+import json
+import random
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for https://api.github.com/graphql, answering the batched
+# user/repository queries built by github_graphql.py. Point
+# fetch_repos.GITHUB_GRAPHQL_URL (or GitHubGraphQL(url=...)) to it.
+
+USER_QUERY = re.compile(r'(u\d+): user\(login: "([^"]+)"\) \{\s*repositories\(first: (\d+)(?:, after: "([^"]*)")?')
+AUTHOR_QUERY = re.compile(r'(r\d+): repository\(owner: "([^"]+)", name: "([^"]+)"\).*?author: \{id: "([^"]+)"\}')
+LANGUAGES = ['JavaScript', 'Python', 'PHP', 'HTML', 'CSS', 'Shell', 'Java']
+
+
+def generate_users(num_users, repos_per_user, seed=0):
+    rng = random.Random(seed)
+    users = {}
+    for i in range(num_users):
+        login = f'dev{i}'
+        repos = []
+        for j in range(repos_per_user):
+            languages = rng.sample(LANGUAGES, rng.randint(1, 3))
+            total_commits = rng.randint(1, 300)
+            sampled = min(total_commits, 100)
+            if rng.random() < 0.7:
+                sample_authors, owner_commits = [login] * sampled, total_commits
+            elif total_commits <= 100:
+                sample_authors = [login if k % 2 == 0 else f'helper{j}' for k in range(sampled)]
+                owner_commits = sample_authors.count(login)
+            else:
+                # The helper only committed past the sampled page
+                sample_authors, owner_commits = [login] * sampled, total_commits - 10
+            repos.append({
+                'name': f'repo{j}',
+                'nameWithOwner': f'{login}/repo{j}',
+                'diskUsage': rng.randint(10, 50000),
+                'isFork': rng.random() < 0.2,
+                'pushedAt': (datetime(2024, 1, 1, tzinfo=timezone.utc) - timedelta(days=rng.randint(0, 3000))).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'url': f'https://github.com/{login}/repo{j}',
+                'languages': {'edges': [{'size': rng.randint(100, 100000), 'node': {'name': name}} for name in languages]},
+                'defaultBranchRef': {'target': {'history': {
+                    'totalCount': total_commits,
+                    'nodes': [{'author': {'user': {'login': author, 'id': f'U_{author}'}}} for author in sample_authors],
+                }}},
+                '_commits_by_author': {f'U_{login}': owner_commits},
+            })
+        users[login] = repos
+    return users
+
+
+class MockGitHub:
+    def __init__(self, users, rate_limit=5000):
+        self.users = users
+        self.remaining = rate_limit
+        self.reset_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def answer(self, query):
+        with self.lock:
+            self.queries += 1
+            if self.remaining <= 0:
+                return {'errors': [{'type': 'RATE_LIMITED', 'message': 'API rate limit exceeded'}]}
+            self.remaining -= 1
+
+        data, errors = {}, []
+        for alias, login, first, after in USER_QUERY.findall(query):
+            if login not in self.users:
+                data[alias] = None
+                errors.append({'type': 'NOT_FOUND', 'path': [alias], 'message': f"Could not resolve to a User with the login of '{login}'."})
+                continue
+            start = int(after) if after else 0
+            end = start + int(first)
+            repos = self.users[login]
+            data[alias] = {'repositories': {
+                'pageInfo': {'hasNextPage': end < len(repos), 'endCursor': str(end)},
+                'nodes': [{key: value for key, value in repo.items() if not key.startswith('_')} for repo in repos[start:end]],
+            }}
+        for alias, owner, name, author_id in AUTHOR_QUERY.findall(query):
+            repo = next((repo for repo in self.users.get(owner, []) if repo['name'] == name), None)
+            if repo is None:
+                data[alias] = None
+                continue
+            commits = repo['_commits_by_author'].get(author_id, 0)
+            data[alias] = {'defaultBranchRef': {'target': {'history': {'totalCount': commits}}}}
+        data['rateLimit'] = {'cost': 1, 'remaining': self.remaining, 'resetAt': self.reset_at.strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+        payload = {'data': data}
+        if errors:
+            payload['errors'] = errors
+        return payload
+
+
+def serve(mock, port=0):
+    """Start the mock in a background thread; returns the server (see server.server_address)"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            response = json.dumps(mock.answer(body['query'])).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve a mock GitHub GraphQL endpoint')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--repos', type=int, default=80)
+    parser.add_argument('--rate-limit', type=int, default=5000)
+    args = parser.parse_args()
+
+    server = serve(MockGitHub(generate_users(args.users, args.repos), args.rate_limit), args.port)
+    print(f"Mock GitHub GraphQL endpoint on http://127.0.0.1:{args.port}/graphql")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,247 @@
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the SonarQube web API endpoints used by fetch_sonar_qube.py.
+# Point fetch_sonar_qube.SONARQUBE_URL to it.
+
+SEVERITIES = ['INFO', 'MINOR', 'MAJOR', 'CRITICAL', 'BLOCKER']
+TYPES = ['CODE_SMELL', 'BUG', 'VULNERABILITY']
+EXTENSIONS = ['js', 'jsx', 'py', 'php']
+MAX_RESULT_WINDOW = 10000
+
+
+def generate_project(project_key, num_files, num_issues, seed=0, files=None):
+    """Random issues and ncloc measures; `files` (paths) replaces the generated file list"""
+    rng = random.Random(f'{seed}-{project_key}')
+    if files is None:
+        files = [f'src/dir{i % 7}/file{i}.{rng.choice(EXTENSIONS)}' for i in range(num_files)]
+    issues = []
+    for i in range(num_issues):
+        path = rng.choice(files)
+        issues.append({
+            'key': f'{project_key}-issue-{i}',
+            'component': f'{project_key}:{path}',
+            'project': project_key,
+            'rule': f'rule:S{rng.randint(100, 999)}',
+            'type': rng.choice(TYPES),
+            'impacts': [{'softwareQuality': 'MAINTAINABILITY', 'severity': rng.choice(['LOW', 'MEDIUM', 'HIGH'])}],
+            'severity': rng.choice(SEVERITIES),
+            'status': 'OPEN',
+            'message': f'Issue {i}',
+            'line': rng.randint(1, 500),
+        })
+    issues.sort(key=lambda issue: (issue['component'], issue['line'], issue['key']))
+    components = []
+    for path in files:
+        ncloc = rng.randint(5, 800)
+        measures = {'ncloc': ncloc, 'complexity': ncloc // rng.randint(4, 12), 'cognitive_complexity': ncloc // rng.randint(3, 15),
+                    'duplicated_lines': rng.choice([0, 0, 0, rng.randint(1, ncloc)])}
+        components.append({'key': f'{project_key}:{path}', 'path': path, 'qualifier': 'FIL',
+                           'measures': [{'metric': metric, 'value': str(value)} for metric, value in measures.items()]})
+    return {'issues': issues, 'components': components}
+
+
+class MockSonarQube:
+    def __init__(self, projects=None, latency=0.0):
+        self.projects = projects or {}
+        self.latency = latency  # Seconds added to every response, to stand in for the network and server
+        self.created = {key: key for key in self.projects}  # project key -> name
+        self.tasks = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def submit_task(self, project_key, duration, data=None, error=None):
+        """What a scanner upload does: queue an analysis that ends after `duration` seconds.
+
+        On success the project's issues and components become `data`; with
+        `error` the task fails with that message. Returns the task id.
+        """
+        with self.lock:
+            task_id = f'AX{len(self.tasks):06d}'
+            self.tasks[task_id] = {'id': task_id, 'componentKey': project_key, 'submittedAt': time.time(),
+                                   'endsAt': time.time() + duration, 'data': data, 'error': error}
+        return task_id
+
+    def task_payload(self, task):
+        if time.time() < task['endsAt']:
+            status = 'IN_PROGRESS'
+        elif task['error']:
+            status = 'FAILED'
+        else:
+            status = 'SUCCESS'
+            if task['data'] is not None and task['componentKey'] not in self.projects:
+                self.projects[task['componentKey']] = task['data']
+        payload = {'id': task['id'], 'type': 'REPORT', 'componentKey': task['componentKey'], 'status': status,
+                   'submittedAt': datetime.fromtimestamp(task['submittedAt'], timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+0000')}
+        if status == 'SUCCESS':
+            payload['analysisId'] = 'AN' + task['id']
+        if status == 'FAILED':
+            payload['errorMessage'] = task['error']
+        return payload
+
+    def get_api_ce_task(self, params):
+        task = self.tasks.get(params.get('id'))
+        if task is None:
+            return 404, {'errors': [{'msg': f"No activity found for task '{params.get('id')}'"}]}
+        return 200, {'task': self.task_payload(task)}
+
+    def post_api_ce_submit(self, params):
+        """Upload of an analysis report; the mock takes the analyzed file paths, one per line, in `files`"""
+        files = [path for path in params.get('files', '').splitlines() if path]
+        data = generate_project(params['projectKey'], len(files), int(params.get('issues', 10 * len(files))), files=files)
+        task_id = self.submit_task(params['projectKey'], float(params.get('duration', 1.0)), data)
+        return 200, {'taskId': task_id, 'projectId': params['projectKey']}
+
+    def get_api_ce_activity_status(self, params):
+        pending = sum(1 for task in self.tasks.values() if time.time() < task['endsAt'])
+        return 200, {'pending': pending, 'inProgress': 0, 'failing': 0, 'pendingTime': 0}
+
+    def get_api_ce_activity(self, params):
+        statuses = set(params['status'].split(',')) if 'status' in params else None
+        tasks = [self.task_payload(task) for task in self.tasks.values()]
+        tasks = [task for task in tasks if statuses is None or task['status'] in statuses]
+        size = int(params.get('ps', 100))
+        return 200, {'paging': {'pageIndex': 1, 'pageSize': size, 'total': len(tasks)}, 'tasks': tasks[:size]}
+
+    def get_api_projects_search(self, params):
+        keys = params.get('projects', '').split(',') if params.get('projects') else list(self.created)
+        components = [{'key': key, 'name': self.created[key], 'qualifier': 'TRK'} for key in keys if key in self.created]
+        return 200, {'paging': {'pageIndex': 1, 'pageSize': 100, 'total': len(components)}, 'components': components}
+
+    def post_api_projects_create(self, params):
+        if params['project'] in self.created:
+            return 400, {'errors': [{'msg': f"Could not create Project with key: \"{params['project']}\". A similar key already exists"}]}
+        self.created[params['project']] = params['name']
+        return 200, {'project': {'key': params['project'], 'name': params['name'], 'qualifier': 'TRK'}}
+
+    def post_api_projects_delete(self, params):
+        if params['project'] not in self.created:
+            return 404, {'errors': [{'msg': f"Project '{params['project']}' not found"}]}
+        del self.created[params['project']]
+        self.projects.pop(params['project'], None)
+        return 200, {}
+
+    def handle(self, method, path, params):
+        with self.lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        handler = getattr(self, method.lower() + '_' + path.strip('/').replace('/', '_'), None)
+        if handler is None:
+            return 404, {'errors': [{'msg': f'Unknown url: {path}'}]}
+        return handler(params)
+
+    def get_api_issues_search(self, params):
+        project = self.projects.get(params.get('componentKeys'))
+        if project is None:
+            return 200, {'total': 0, 'paging': {'pageIndex': 1, 'pageSize': 100, 'total': 0}, 'issues': [], 'facets': []}
+        page, size = int(params.get('p', 1)), int(params.get('ps', 100))
+        if size > 500:
+            return 400, {'errors': [{'msg': "'ps' value (%d) must be less than 500" % size}]}
+        if page * size > MAX_RESULT_WINDOW:
+            return 400, {'errors': [{'msg': f'Can return only the first {MAX_RESULT_WINDOW} results. {page * size}th result asked.'}]}
+
+        issues = project['issues']
+        for parameter, field in (('severities', 'severity'), ('types', 'type')):
+            if parameter in params:
+                allowed = set(params[parameter].split(','))
+                issues = [issue for issue in issues if issue[field] in allowed]
+        if 'files' in params:
+            allowed = set(params['files'].split(','))
+            issues = [issue for issue in issues if issue['component'].split(':', 1)[1] in allowed]
+
+        facets = []
+        for facet in params.get('facets', '').split(','):
+            field = {'severities': 'severity', 'types': 'type', 'files': 'component'}.get(facet)
+            if field is None:
+                continue
+            counts = {}
+            for issue in issues:
+                value = issue[field].split(':', 1)[1] if facet == 'files' else issue[field]
+                counts[value] = counts.get(value, 0) + 1
+            facets.append({'property': facet, 'values': [{'val': value, 'count': count} for value, count in counts.items()]})
+
+        return 200, {
+            'total': len(issues),
+            'p': page,
+            'ps': size,
+            'paging': {'pageIndex': page, 'pageSize': size, 'total': len(issues)},
+            'issues': issues[(page - 1) * size:page * size],
+            'facets': facets,
+        }
+
+    def get_api_measures_component_tree(self, params):
+        # Either a project key or the key of a directory inside it (project:path)
+        project_key, _, directory = params.get('component', '').partition(':')
+        project = self.projects.get(project_key)
+        components = project['components'] if project else []
+        if directory:
+            components = [component for component in components if component['path'].startswith(directory.rstrip('/') + '/')]
+        if project is None or (directory and not components):
+            return 404, {'errors': [{'msg': f"Component key '{params.get('component')}' not found"}]}
+        page, size = int(params.get('p', 1)), int(params.get('ps', 100))
+        if size > 500:
+            return 400, {'errors': [{'msg': "'ps' value (%d) must be less than 500" % size}]}
+        metrics = set(params.get('metricKeys', '').split(','))
+        return 200, {
+            'paging': {'pageIndex': page, 'pageSize': size, 'total': len(components)},
+            'baseComponent': {'key': params['component'], 'qualifier': 'DIR' if directory else 'TRK'},
+            'components': [dict(component, measures=[measure for measure in component['measures'] if measure['metric'] in metrics])
+                           for component in components[(page - 1) * size:page * size]],
+        }
+
+
+def serve(mock, port=0):
+    """Start the mock in a background thread; returns the server (see server.server_address)"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def respond(self, method, params):
+            status, payload = mock.handle(method, urlparse(self.path).path, params)
+            response = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def do_GET(self):
+            params = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+            self.respond('GET', params)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+            params = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+            params.update({key: values[-1] for key, values in parse_qs(body).items()})
+            self.respond('POST', params)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve a mock SonarQube web API')
+    parser.add_argument('--port', type=int, default=9001)
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--files', type=int, default=150)
+    parser.add_argument('--issues', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    projects = {f'dev{i}_repo{i}': generate_project(f'dev{i}_repo{i}', args.files, args.issues) for i in range(args.projects)}
+    server = serve(MockSonarQube(projects, args.latency), args.port)
+    print(f"Mock SonarQube on http://127.0.0.1:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
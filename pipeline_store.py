@@ -0,0 +1,382 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from agregator import IMPACTS, SEVERITIES, condense, structure_impacts
+from skills_parser import experience_ordinals, parse_skills
+
+STORE_FILE = 'pipeline.db'
+
+# The flat files the pipeline used to hand over between stages, now written from the store
+PROFILES_CSV = 'workana_profiles.csv'
+REPOS_REPORT = 'collected_repos_report.xlsx'
+DEVELOPERS_CSV = 'all_developer_metrics_workana_sonarqube.csv'
+
+PROFILE_COLUMNS = ['url', 'github', 'name', 'title', 'location', 'hourly_rate', 'skills', 'description']
+# Language flag columns of the collected repos report
+REPORT_LANGUAGES = ['javascript', 'python', 'php']
+# Same mapping as the analysis notebook
+EXTENSION_LANGUAGES = {
+    'js': 'JavaScript',
+    'ts': 'TypeScript',
+    'py': 'Python',
+    'php': 'PHP',
+    'sql': 'SQL',
+    'html': 'HTML',
+    'css': 'CSS',
+    'rb': 'Ruby',
+    'go': 'Go/Golang',
+    'rs': 'Rust',
+    'lua': 'Lua',
+    'ps1': 'Powershell',
+}
+# Per extension of a scanned repository: LOC, issues by severity, issues impacting each quality, and all issues
+METRIC_COLUMNS = ['loc'] + [severity.lower() for severity in SEVERITIES] + [impact.lower() for impact in IMPACTS] + ['total_issues']
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS profiles (
+        url TEXT PRIMARY KEY,
+        github TEXT,
+        github_username TEXT,
+        name TEXT,
+        title TEXT,
+        location TEXT,
+        hourly_rate TEXT,
+        skills TEXT,
+        description TEXT,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS profiles_github_username ON profiles (github_username);
+    CREATE TABLE IF NOT EXISTS candidate_repos (
+        username TEXT NOT NULL,
+        repository TEXT NOT NULL,
+        clone_url TEXT,
+        size INTEGER,
+        languages TEXT NOT NULL,
+        selected INTEGER NOT NULL,
+        reason TEXT,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (username, repository)
+    );
+    CREATE TABLE IF NOT EXISTS clones (
+        username TEXT NOT NULL,
+        repository TEXT NOT NULL,
+        path TEXT NOT NULL,
+        status TEXT NOT NULL,
+        error TEXT,
+        bytes INTEGER,
+        duration REAL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (username, repository)
+    );
+    CREATE INDEX IF NOT EXISTS clones_status ON clones (status);
+    CREATE TABLE IF NOT EXISTS scans (
+        project_key TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        repository TEXT NOT NULL,
+        repo_path TEXT NOT NULL,
+        scan_project TEXT,
+        analysis_id TEXT,
+        status TEXT NOT NULL,
+        issues_file TEXT,
+        consolidated_file TEXT,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS scans_username ON scans (username);
+    CREATE TABLE IF NOT EXISTS metrics (
+        project_key TEXT NOT NULL REFERENCES scans (project_key) ON DELETE CASCADE,
+        extension TEXT NOT NULL,
+        loc INTEGER NOT NULL,
+        blocker INTEGER NOT NULL,
+        critical INTEGER NOT NULL,
+        info INTEGER NOT NULL,
+        major INTEGER NOT NULL,
+        minor INTEGER NOT NULL,
+        reliability INTEGER NOT NULL,
+        maintainability INTEGER NOT NULL,
+        security INTEGER NOT NULL,
+        total_issues INTEGER NOT NULL,
+        PRIMARY KEY (project_key, extension)
+    );
+    CREATE TABLE IF NOT EXISTS extension_languages (
+        extension TEXT PRIMARY KEY,
+        language TEXT NOT NULL
+    );
+'''
+
+# LOC and issues of every developer and language, with the notebook's severity groups
+DEVELOPER_METRICS_QUERY = '''
+    SELECT scans.username, extension_languages.language,
+           SUM(metrics.loc) AS loc,
+           SUM(metrics.total_issues) AS total_issues,
+           SUM(metrics.blocker + metrics.critical) AS high_issues,
+           SUM(metrics.major) AS medium_issues,
+           SUM(metrics.minor + metrics.info) AS low_issues,
+           SUM(metrics.reliability) AS reliability_issues,
+           SUM(metrics.maintainability) AS maintainability_issues
+    FROM scans
+    JOIN metrics ON metrics.project_key = scans.project_key
+    JOIN extension_languages ON extension_languages.extension = lower(metrics.extension)
+    WHERE scans.status = 'reported'
+    GROUP BY scans.username, extension_languages.language
+    ORDER BY scans.username, extension_languages.language
+'''
+DEVELOPER_FIELDS = ['loc', 'total_issues', 'high_issues', 'medium_issues', 'low_issues', 'reliability_issues', 'maintainability_issues']
+
+SCANNED_PROFILES_QUERY = '''
+    SELECT profiles.* FROM profiles
+    JOIN (SELECT DISTINCT username FROM scans WHERE status = 'reported') AS scanned
+      ON profiles.github_username = scanned.username
+    ORDER BY profiles.rowid
+'''
+
+COLLECTED_REPOS_QUERY = '''
+    SELECT candidate_repos.username, candidate_repos.repository, candidate_repos.languages
+    FROM clones
+    JOIN candidate_repos USING (username, repository)
+    WHERE clones.status = 'cloned' AND candidate_repos.selected
+    ORDER BY clones.updated_at
+'''
+
+# Selected repositories whose analysis has no reports yet, largest first, for the streaming pipeline
+UNSCANNED_REPOS_QUERY = '''
+    SELECT candidate_repos.username, candidate_repos.repository, candidate_repos.clone_url, candidate_repos.size
+    FROM candidate_repos
+    LEFT JOIN scans USING (username, repository)
+    WHERE candidate_repos.selected AND candidate_repos.clone_url IS NOT NULL
+      AND (scans.status IS NULL OR scans.status != 'reported')
+    ORDER BY candidate_repos.size DESC, candidate_repos.username, candidate_repos.repository
+'''
+
+
+def github_username(github):
+    return github.rstrip('/').split('/')[-1] if github else None
+
+
+def read_profiles_csv(path):
+    """Profiles from the semicolon-delimited CSV, descriptions in their triple quotes as the scraper wrote them"""
+    with open(path, mode='r', encoding='utf-8') as file:
+        return list(csv.DictReader(file, delimiter=';'))
+
+
+def write_profiles_csv(path, records, append=False):
+    """Profiles in the CSV layout the scraper always wrote: ';'-delimited, descriptions in triple quotes"""
+    mode = 'a' if append and os.path.exists(path) else 'w'
+    with open(path, mode=mode, newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, delimiter=';')
+        if mode == 'w':  # Only write header for new file
+            writer.writerow(PROFILE_COLUMNS)
+        for record in records:
+            writer.writerow([record[column] for column in PROFILE_COLUMNS])
+
+
+def report_metrics(issues_file, consolidated_file):
+    """METRIC_COLUMNS per file extension of one repository's reports, counted as agregator.py condenses them"""
+    issues = structure_impacts(pd.read_csv(issues_file, dtype=str, keep_default_na=False))
+    views = condense(issues, pd.read_csv(consolidated_file))
+
+    severities = views['Condensed Issues'].groupby('File Extension', observed=True)[SEVERITIES + ['Total Issues']].sum()
+    impacts = views['Condensed Issues by Impact'].groupby('File Extension', observed=True)[IMPACTS].sum()
+    loc = views['Condensed Consolidated'].set_index('File Extension')['Total LOC'].rename('loc')
+    metrics = pd.concat([loc, severities, impacts], axis=1).fillna(0).astype('int64')
+    metrics.columns = [column.lower().replace(' ', '_') for column in metrics.columns]
+    metrics.index = metrics.index.astype('str')
+    return metrics[METRIC_COLUMNS].rename_axis('extension').reset_index()
+
+
+class PipelineStore:
+    """SQLite store of the pipeline state: profiles, candidate repos, clones, scans and per-extension metrics.
+
+    Every stage writes its results as it goes, each call in its own
+    transaction, and the flat files are exported from it. WAL mode lets the
+    stages run at the same time in different processes.
+    """
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.executemany('INSERT OR REPLACE INTO extension_languages VALUES (?, ?)', EXTENSION_LANGUAGES.items())
+
+    # Profiles
+
+    def upsert_profiles(self, records):
+        now = time.time()
+        rows = [[record.get(column) for column in PROFILE_COLUMNS] + [github_username(record.get('github')), now] for record in records]
+        with self.lock, self.connection:
+            self.connection.executemany(f'''
+                INSERT INTO profiles ({', '.join(PROFILE_COLUMNS)}, github_username, updated_at)
+                VALUES ({', '.join('?' * (len(PROFILE_COLUMNS) + 2))})
+                ON CONFLICT (url) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in PROFILE_COLUMNS[1:])},
+                    github_username = excluded.github_username, updated_at = excluded.updated_at
+            ''', rows)
+
+    def import_profiles_csv(self, path=PROFILES_CSV):
+        """Bring the store up to date with the profiles CSV, which is still edited outside the pipeline
+        (e.g. by anonimize_workana_profile_names.py); returns how many profiles were added or changed"""
+        if not os.path.exists(path):
+            return 0
+        stored = {profile['url']: profile for profile in self.profiles()}
+        changed = [record for record in read_profiles_csv(path)
+                   if stored.get(record['url']) != {column: record.get(column) for column in PROFILE_COLUMNS}]
+        if changed:
+            self.upsert_profiles(changed)
+            print(f"Imported {len(changed)} new or changed profiles from {path} into {self.path}")
+        return len(changed)
+
+    def has_profile(self, url):
+        with self.lock:
+            return self.connection.execute('SELECT 1 FROM profiles WHERE url = ?', (url,)).fetchone() is not None
+
+    def profile_urls(self):
+        with self.lock:
+            return {row[0] for row in self.connection.execute('SELECT url FROM profiles')}
+
+    def profiles(self):
+        """Every profile as a {column: value} dict, in the order they were first stored"""
+        with self.lock:
+            rows = self.connection.execute(f'SELECT {", ".join(PROFILE_COLUMNS)} FROM profiles ORDER BY rowid').fetchall()
+        return [dict(zip(PROFILE_COLUMNS, row)) for row in rows]
+
+    # Candidate repositories and clones
+
+    def record_candidate(self, username, repository, languages, selected, reason=None, clone_url=None, size=None):
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO candidate_repos VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (username, repository, clone_url, size, json.dumps(sorted(languages)), int(selected), reason, time.time()))
+
+    def record_clone(self, username, repository, result):
+        """Store a clone_engine.CloneResult"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO clones VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (username, repository, result.path, 'cloned' if result.returncode == 0 else 'failed', result.error,
+                 result.bytes, result.duration, time.time()))
+
+    def is_cloned(self, username, repository):
+        with self.lock:
+            row = self.connection.execute('SELECT status FROM clones WHERE username = ? AND repository = ?',
+                                          (username, repository)).fetchone()
+        return row is not None and row[0] == 'cloned'
+
+    def collected_repos(self):
+        """Selected and cloned repositories with binary language flags, as in the collected repos report"""
+        with self.lock:
+            rows = self.connection.execute(COLLECTED_REPOS_QUERY).fetchall()
+        return pd.DataFrame([
+            dict({'username': username, 'repository': repository},
+                 **{language: int(language in json.loads(languages)) for language in REPORT_LANGUAGES})
+            for username, repository, languages in rows
+        ], columns=['username', 'repository'] + REPORT_LANGUAGES)
+
+    def unscanned_repos(self):
+        """(username, repository, clone_url, size in KB) of every selected repository without reports"""
+        with self.lock:
+            return self.connection.execute(UNSCANNED_REPOS_QUERY).fetchall()
+
+    # Scans and metrics
+
+    def record_scan(self, project_key, project_name, repo_path, scan_project, status, analysis_id=None, reports=()):
+        """Store the state of a repository's analysis; with its two report files, also their per-extension metrics"""
+        username, _, repository = project_name.partition('/')
+        reports = list(reports)
+        metrics = report_metrics(*reports) if len(reports) == 2 else None
+        issues_file, consolidated_file = reports if len(reports) == 2 else (None, None)
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM metrics WHERE project_key = ?', (project_key,))
+            self.connection.execute(
+                'INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (project_key, username, repository, repo_path, scan_project, analysis_id, status, issues_file,
+                 consolidated_file, time.time()))
+            if metrics is not None:
+                self.connection.executemany(
+                    f'INSERT INTO metrics (project_key, extension, {", ".join(METRIC_COLUMNS)}) VALUES ({", ".join("?" * (len(METRIC_COLUMNS) + 2))})',
+                    [(project_key, *row) for row in metrics.itertuples(index=False)])
+
+    def has_scan(self, project_key):
+        """Whether the metrics of a repository's reports are stored"""
+        with self.lock:
+            row = self.connection.execute('SELECT status FROM scans WHERE project_key = ?', (project_key,)).fetchone()
+        return row is not None and row[0] == 'reported'
+
+    def developer_metrics(self, languages=None):
+        """The analysis table: every scanned developer's profile, <Lang>_exp_ordinal columns and
+        <Lang>_loc/_total_issues/... columns per language, joined on the indexed GitHub username"""
+        with self.lock:
+            long = pd.read_sql_query(DEVELOPER_METRICS_QUERY, self.connection)
+            profiles = pd.read_sql_query(SCANNED_PROFILES_QUERY, self.connection)
+        languages = list(languages) if languages is not None else sorted(long['language'].unique())
+        long = long[long['language'].isin(languages)]
+
+        wide = long.pivot(index='username', columns='language', values=DEVELOPER_FIELDS)
+        wide = wide.reindex(columns=pd.MultiIndex.from_product([DEVELOPER_FIELDS, languages])).fillna(0).astype('int64')
+        metrics = pd.DataFrame(index=wide.index)
+        for language in languages:
+            for field in DEVELOPER_FIELDS:
+                metrics[f'{language}_{field}'] = wide[(field, language)]
+            loc = metrics[f'{language}_loc']
+            metrics[f'{language}_issue_density'] = (metrics[f'{language}_total_issues'] / loc * 1000).where(loc > 0)
+        metrics['total_loc'] = wide['loc'].sum(axis=1)
+        metrics['total_issues'] = wide['total_issues'].sum(axis=1)
+
+        profiles = profiles[PROFILE_COLUMNS + ['github_username']]
+        ordinals = experience_ordinals(parse_skills(profiles['skills'], report_unmatched=False), languages, profiles.index)
+        profiles = pd.concat([profiles, ordinals], axis=1)
+        return profiles.merge(metrics.rename_axis('username').reset_index(), left_on='github_username', right_on='username')
+
+    # Exports
+
+    def export_profiles(self, path=PROFILES_CSV):
+        write_profiles_csv(path, self.profiles())
+        print(f"Profiles exported to {path}")
+
+    def export_repos_report(self, path=REPOS_REPORT):
+        repos = self.collected_repos()
+        if len(repos):
+            repos.to_excel(path, index=False)
+            print(f"Report saved to {path}")
+
+    def export_developer_metrics(self, path=DEVELOPERS_CSV, languages=None):
+        self.developer_metrics(languages).to_csv(path, index=False)
+        print(f"Developer metrics exported to {path}")
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the flat files of the pipeline from its SQLite store')
+    parser.add_argument('--store', default=STORE_FILE)
+    parser.add_argument('--profiles', default=PROFILES_CSV, help='Profiles CSV, synced into the store first')
+    parser.add_argument('--repos-report', default=REPOS_REPORT)
+    parser.add_argument('--developers', default=DEVELOPERS_CSV)
+    parser.add_argument('--languages', nargs='*', default=None, help='Languages of the developer metrics; all by default')
+    parser.add_argument('--export', nargs='+', choices=['profiles', 'repos', 'developers'], default=['repos', 'developers'])
+    args = parser.parse_args()
+
+    store = PipelineStore(args.store)
+    try:
+        store.import_profiles_csv(args.profiles)
+        if 'profiles' in args.export:
+            store.export_profiles(args.profiles)
+        if 'repos' in args.export:
+            store.export_repos_report(args.repos_report)
+        if 'developers' in args.export:
+            store.export_developer_metrics(args.developers, args.languages)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
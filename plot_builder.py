@@ -0,0 +1,283 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+from density_metrics import ISSUE_SEVERITIES, MIN_LOC_THRESHOLD, calculate_issue_densities
+from resampling import RESAMPLES, bootstrap_intervals, error_bars
+from skills_parser import MORE_THAN_FIVE_YEARS, THREE_TO_FIVE_YEARS, UNDER_THREE_YEARS
+
+PLOTS_DIR = 'plots'
+# Hash of every figure's inputs as last rendered, kept next to the figures
+PLOT_MANIFEST = '.plot_manifest.json'
+PLOT_VERSION = 1  # Bumped when the drawing code changes, so every figure is rendered again
+PLOT_WORKERS = os.cpu_count() or 1
+PLOT_DPI = 300
+# The notebook draws under sns.set(style="whitegrid"), whose context is 'notebook'
+PLOT_STYLE = 'whitegrid'
+PLOT_CONTEXT = 'notebook'
+
+METRICS_CSV = 'all_developer_metrics_workana_sonarqube.csv'
+PROGRAMMING_LANGUAGES = ['JavaScript', 'PHP', 'Python']
+EXPERIENCE_LEVELS = [UNDER_THREE_YEARS, THREE_TO_FIVE_YEARS, MORE_THAN_FIVE_YEARS]
+# Same seed as the notebook's bootstrap, so the error bars match its figures
+PLOT_SEED = 42
+LANGUAGE_COLORS = ['#FFFFFF', '#D3D3D3', '#808080']  # White, light gray, dark gray
+
+# kind picks the drawing function; params and data are plain JSON, which is what the figure's hash is taken over
+FigureSpec = namedtuple('FigureSpec', ['kind', 'filename', 'params', 'data'])
+
+
+def severity_title(severity):
+    return severity.capitalize()
+
+
+def level_values(by_experience, experience_levels):
+    return [float(by_experience.get(level, 0)) for level in experience_levels]
+
+
+def level_intervals(intervals, language, densities, experience_levels):
+    """[low, high] of each level, collapsed onto the density where there is no interval"""
+    bounds = intervals.get(language, {}) if intervals is not None else {}
+    return [[float(value) for value in bounds.get(level, (density, density))]
+            for level, density in zip(experience_levels, densities)]
+
+
+def language_figure(average_issue_density, severity, experience_levels=EXPERIENCE_LEVELS,
+                    languages=PROGRAMMING_LANGUAGES, intervals=None, dpi=PLOT_DPI):
+    """Bars of every language per experience level, with the average over the languages as diamonds"""
+    averages = {language: level_values(average_issue_density.get(language, {}), experience_levels) for language in languages}
+    return FigureSpec('language', f'Issue_Density_{severity}'.replace(' ', '_') + '.png',
+                      {'severity': severity, 'experience_levels': experience_levels, 'languages': languages,
+                       'colors': LANGUAGE_COLORS, 'figsize': [6, 3], 'dpi': dpi},
+                      {'averages': averages,
+                       'intervals': None if intervals is None else {
+                           language: level_intervals(intervals, language, densities, experience_levels)
+                           for language, densities in averages.items()}})
+
+
+def average_figure(average_issue_density, severity, experience_levels=EXPERIENCE_LEVELS, dpi=PLOT_DPI):
+    """One bar per experience level: the average density over the languages that have any"""
+    title = f'Average Issue Density for {severity} by Years of Experience'
+    averages = []
+    for level in experience_levels:
+        # Zeros are languages without data at that level, not densities of 0
+        densities = [density for density in (by_experience.get(level, 0) for by_experience in average_issue_density.values())
+                     if density != 0]
+        averages.append(float(np.mean(densities)) if densities else 0.0)
+    return FigureSpec('average', title.replace(' ', '_').replace(':', '').replace('/', '_') + '.png',
+                      {'title': title, 'experience_levels': experience_levels, 'figsize': [10, 6], 'dpi': dpi},
+                      {'averages': averages})
+
+
+def single_language_figure(average_issue_density, severity, language, experience_levels=EXPERIENCE_LEVELS,
+                           intervals=None, dpi=PLOT_DPI):
+    """The bars of one language per experience level, with their bootstrap intervals"""
+    averages = level_values(average_issue_density.get(language, {}), experience_levels)
+    return FigureSpec('single_language', f'Issue_Density_{severity}_{language}'.replace(' ', '_').replace('/', '_') + '.png',
+                      {'title': f'{severity} Issue Density in {language} by Years of Experience',
+                       'experience_levels': experience_levels, 'figsize': [6, 3], 'dpi': dpi},
+                      {'averages': averages,
+                       'intervals': None if intervals is None else level_intervals(intervals, language, averages, experience_levels)})
+
+
+def figure_specs(densities_by_severity, intervals=None, languages=PROGRAMMING_LANGUAGES, experience_levels=EXPERIENCE_LEVELS,
+                 dpi=PLOT_DPI):
+    """Every figure of every severity: all languages together, their average, and each language alone.
+
+    `densities_by_severity` is the output of density_metrics.calculate_issue_densities and
+    `intervals` the one of resampling.bootstrap_intervals.
+    """
+    specs = []
+    for severity, (average_issue_density, _) in densities_by_severity.items():
+        title = severity_title(severity)
+        bars = error_bars(intervals, severity) if intervals is not None else None
+        specs.append(language_figure(average_issue_density, title, experience_levels, languages, bars, dpi))
+        specs.append(average_figure(average_issue_density, title, experience_levels, dpi))
+        specs.extend(single_language_figure(average_issue_density, title, language, experience_levels, bars, dpi)
+                     for language in languages)
+    return specs
+
+
+def figure_hash(spec):
+    """Hash of everything a figure is drawn from; the figure is only rendered again when it changes"""
+    content = json.dumps([PLOT_VERSION, PLOT_STYLE, PLOT_CONTEXT, matplotlib.__version__, spec.kind, spec.params, spec.data],
+                         sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def error_bar_lengths(densities, bounds):
+    return [[density - low for density, (low, _) in zip(densities, bounds)],
+            [high - density for density, (_, high) in zip(densities, bounds)]]
+
+
+def draw_language(fig, params, data):
+    ax = fig.subplots()
+    bar_width = 0.15
+    experience_levels = params['experience_levels']
+    x = np.arange(len(experience_levels))
+
+    for i, language in enumerate(reversed(params['languages'])):
+        densities = data['averages'][language]
+        yerr = error_bar_lengths(densities, data['intervals'][language]) if data['intervals'] is not None else None
+        ax.bar(x + i * bar_width, densities, bar_width, color=params['colors'][i], edgecolor='black',
+               label=language, alpha=1, yerr=yerr, capsize=2)
+
+    # Dummy scatter for the legend entry of the averages
+    ax.scatter([], [], marker='D', color='black', s=100, label='Average', zorder=3)
+    for i, level in enumerate(experience_levels):
+        densities = [data['averages'][language][i] for language in params['languages'] if data['averages'][language][i] > 0]
+        if densities:
+            ax.scatter(i + bar_width, np.mean(densities), marker='D', color='black', s=100, zorder=3)
+
+    ax.set_xlabel('Years of Experience')
+    ax.set_ylabel('Issue Density (KLOC)')
+    ax.set_xticks(x + bar_width)
+    ax.set_xticklabels(experience_levels)
+    ax.legend(bbox_to_anchor=(1, 1), loc='upper left')
+
+
+def draw_average(fig, params, data):
+    ax = fig.subplots()
+    averages = data['averages']
+    bars = ax.bar(params['experience_levels'], averages, color='#FFFFFF', edgecolor='black')
+    ax.set_title(params['title'])
+    ax.set_xlabel('Years of Experience')
+    ax.set_ylabel('Average Issue Density (per 1000 LOC)')
+    if max(averages) > 0:
+        ax.set_ylim(0, max(averages) * 1.1)  # 10% of headroom for the value labels
+
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2.0, height, f'{height:.3f}', ha='center', va='bottom')
+
+
+def draw_single_language(fig, params, data):
+    ax = fig.subplots()
+    densities = data['averages']
+    yerr = error_bar_lengths(densities, data['intervals']) if data['intervals'] is not None else None
+    ax.bar(params['experience_levels'], densities, 0.45, color='#FFFFFF', edgecolor='black', yerr=yerr, capsize=2)
+    ax.set_title(params['title'])
+    ax.set_xlabel('Years of Experience')
+    ax.set_ylabel('Issue Density (KLOC)')
+
+
+DRAW = {'language': draw_language, 'average': draw_average, 'single_language': draw_single_language}
+
+
+def draw(spec):
+    """The figure of a spec, drawn without pyplot so it renders with Agg whatever the interactive backend is"""
+    with sns.axes_style(PLOT_STYLE), sns.plotting_context(PLOT_CONTEXT):
+        fig = Figure(figsize=spec.params['figsize'])
+        DRAW[spec.kind](fig, spec.params, spec.data)
+        fig.tight_layout()
+    return fig
+
+
+def save(fig, spec, plots_dir=PLOTS_DIR):
+    os.makedirs(plots_dir, exist_ok=True)
+    path = os.path.join(plots_dir, spec.filename)
+    # Written aside and moved into place, so an interrupted build never leaves a truncated figure
+    fig.savefig(path + '.tmp', format='png', dpi=spec.params['dpi'], bbox_inches='tight')
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def render(spec, plots_dir=PLOTS_DIR):
+    save(draw(spec), spec, plots_dir)
+    return spec.filename
+
+
+def use_agg():
+    matplotlib.use('Agg')
+
+
+def load_plot_manifest(plots_dir=PLOTS_DIR):
+    path = os.path.join(plots_dir, PLOT_MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_plot_manifest(entries, plots_dir=PLOTS_DIR):
+    path = os.path.join(plots_dir, PLOT_MANIFEST)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(entries, file, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def save_and_record(fig, spec, plots_dir=PLOTS_DIR):
+    """Save a figure drawn outside build_plots (the notebook) and record it, so build_plots knows it is up to date"""
+    path = save(fig, spec, plots_dir)
+    manifest = load_plot_manifest(plots_dir)
+    manifest[spec.filename] = figure_hash(spec)
+    save_plot_manifest(manifest, plots_dir)
+    return path
+
+
+def build_plots(specs, plots_dir=PLOTS_DIR, workers=PLOT_WORKERS, force=False):
+    """Render the figures whose inputs changed since they were last rendered, in a pool of `workers` processes.
+
+    Returns the file names of the rendered figures.
+    """
+    os.makedirs(plots_dir, exist_ok=True)
+    manifest = load_plot_manifest(plots_dir)
+    hashes = {spec.filename: figure_hash(spec) for spec in specs}
+    stale = [spec for spec in specs if force or manifest.get(spec.filename) != hashes[spec.filename]
+             or not os.path.exists(os.path.join(plots_dir, spec.filename))]
+    print(f"{len(specs) - len(stale)} of {len(specs)} figures are up to date")
+
+    rendered = []
+    try:
+        if workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(stale)), initializer=use_agg) as executor:
+                futures = [executor.submit(render, spec, plots_dir) for spec in stale]
+                for future in as_completed(futures):
+                    rendered.append(future.result())
+                    manifest[rendered[-1]] = hashes[rendered[-1]]
+        else:
+            for spec in stale:
+                rendered.append(render(spec, plots_dir))
+                manifest[spec.filename] = hashes[spec.filename]
+    finally:
+        # Whatever was rendered before a failure is not rendered again
+        save_plot_manifest(manifest, plots_dir)
+    return rendered
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render every issue density figure into the plots folder, skipping the unchanged ones')
+    parser.add_argument('--metrics', default=METRICS_CSV, help="The notebook's merged developer metrics")
+    parser.add_argument('--plots', default=PLOTS_DIR)
+    parser.add_argument('--workers', type=int, default=PLOT_WORKERS)
+    parser.add_argument('--min-loc', type=int, default=MIN_LOC_THRESHOLD)
+    parser.add_argument('--resamples', type=int, default=RESAMPLES, help='Bootstrap resamples of the error bars, 0 for none')
+    parser.add_argument('--force', action='store_true', help='Render every figure, changed or not')
+    args = parser.parse_args()
+
+    use_agg()
+    started_at = time.monotonic()
+    df = pd.read_csv(args.metrics)
+    densities_by_severity = calculate_issue_densities(df, PROGRAMMING_LANGUAGES, ISSUE_SEVERITIES, min_loc=args.min_loc)
+    intervals = None
+    if args.resamples:
+        intervals = bootstrap_intervals(densities_by_severity, EXPERIENCE_LEVELS, n_resamples=args.resamples, seed=PLOT_SEED)
+
+    rendered = build_plots(figure_specs(densities_by_severity, intervals), args.plots, args.workers, args.force)
+    for filename in sorted(rendered):
+        print(f"Rendered {os.path.join(args.plots, filename)}")
+    print(f"Rendered {len(rendered)} figures in {time.monotonic() - started_at:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from clone_engine import directory_size
+
+REPO_FOLDER = 'repos_v2'
+# Kept inside the repos folder, so every script finds the same inventory whatever its working directory
+INVENTORY_FILE = '.inventory.json'
+INVENTORY_VERSION = 1
+INVENTORY_WORKERS = 8  # Users scanned at once; the walk is I/O bound
+REPORT_SUFFIXES = {'_issues.csv': 'issues', '_consolidated.csv': 'consolidated'}
+
+
+def read_text(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def resolve_git_dir(repo_path):
+    """The repository's git directory; .git may also be a file pointing elsewhere, as in worktrees"""
+    git_path = os.path.join(repo_path, '.git')
+    if os.path.isdir(git_path):
+        return git_path
+    text = read_text(git_path)
+    if text and text.startswith('gitdir:'):
+        return os.path.normpath(os.path.join(repo_path, text[len('gitdir:'):].strip()))
+    return None
+
+
+def read_head(git_dir):
+    """Commit id of HEAD from .git/HEAD and its loose or packed ref; None for a branch with no commits"""
+    head = (read_text(os.path.join(git_dir, 'HEAD')) or '').strip()
+    if not head.startswith('ref:'):
+        return head or None
+    ref = head[len('ref:'):].strip()
+    commit = read_text(os.path.join(git_dir, ref))
+    if commit:
+        return commit.strip()
+    for line in (read_text(os.path.join(git_dir, 'packed-refs')) or '').splitlines():
+        commit, _, name = line.partition(' ')
+        if name == ref:
+            return commit
+    return None
+
+
+def read_remote_url(git_dir):
+    """URL of the 'origin' remote in .git/config, or of the first remote when there is no origin"""
+    urls = {}
+    remote = None
+    for line in (read_text(os.path.join(git_dir, 'config')) or '').splitlines():
+        line = line.strip()
+        if line.startswith('['):
+            # [remote "origin"]
+            section, _, name = line.strip('[]').partition(' ')
+            remote = name.strip('"') if section == 'remote' else None
+        elif remote is not None and remote not in urls:
+            key, _, value = line.partition('=')
+            if key.strip() == 'url':
+                urls[remote] = value.strip()
+    return urls.get('origin', next(iter(urls.values()), None))
+
+
+def scan_repo(repo_entry, previous):
+    """Inventory entry of a repository directory, reusing `previous` for what did not change.
+
+    HEAD is read on every scan; the report files are listed again when the
+    directory's entries changed, the remote when .git/config changed, and the
+    size, which walks the whole tree, when either HEAD or the entries changed.
+    """
+    previous = previous or {}
+    path = repo_entry.path
+    mtime_ns = repo_entry.stat().st_mtime_ns
+    git_dir = resolve_git_dir(path)
+    entry = {'path': path, 'mtime_ns': mtime_ns, 'git': git_dir is not None, 'head': None,
+             'remote_url': None, 'config_mtime_ns': None}
+
+    if git_dir is not None:
+        entry['head'] = read_head(git_dir)
+        try:
+            entry['config_mtime_ns'] = os.stat(os.path.join(git_dir, 'config')).st_mtime_ns
+        except OSError:
+            pass
+        if entry['config_mtime_ns'] is not None and entry['config_mtime_ns'] == previous.get('config_mtime_ns'):
+            entry['remote_url'] = previous['remote_url']
+        else:
+            entry['remote_url'] = read_remote_url(git_dir)
+
+    entries_changed = mtime_ns != previous.get('mtime_ns')
+    if entries_changed:
+        # Same files, and the same order, as glob('*.csv') gave the scripts that walked the folders
+        entry['reports'] = sorted([name, table] for name in (item.name for item in os.scandir(path)
+                                                             if item.is_file() and not item.name.startswith('.'))
+                                  for suffix, table in REPORT_SUFFIXES.items() if name.endswith(suffix))
+    else:
+        entry['reports'] = previous['reports']
+    entry['size'] = directory_size(path) if entries_changed or entry['head'] != previous.get('head') else previous['size']
+    return entry
+
+
+def scan_user(user_entry, previous):
+    previous = previous or {}
+    return {repo.name: scan_repo(repo, previous.get(repo.name))
+            for repo in os.scandir(user_entry.path) if repo.is_dir()}
+
+
+class RepoInventory:
+    """Users and repositories under a repos folder: remote URL, HEAD commit, size and report files of each.
+
+    Built with os.scandir and direct reads of .git/HEAD, refs and config, one
+    thread per user, and updated incrementally from the previous inventory.
+    """
+
+    def __init__(self, repos_dir=REPO_FOLDER, path=None):
+        self.repos_dir = repos_dir
+        self.path = path or os.path.join(repos_dir, INVENTORY_FILE)
+        self.users_repos = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == INVENTORY_VERSION:
+                self.users_repos = data['users']
+
+    def update(self, workers=INVENTORY_WORKERS):
+        """Bring the inventory up to date with the folder and save it when anything changed"""
+        user_entries = sorted((entry for entry in os.scandir(self.repos_dir) if entry.is_dir()), key=lambda entry: entry.name)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            scanned = dict(zip((entry.name for entry in user_entries),
+                               executor.map(lambda entry: scan_user(entry, self.users_repos.get(entry.name)), user_entries)))
+        if scanned != self.users_repos:
+            self.users_repos = scanned
+            self.save()
+        return self
+
+    def users(self):
+        return sorted(self.users_repos)
+
+    def repos(self, user=None):
+        """Entries of every repository, or of one user's, with 'user' and 'repo' names; sorted by user and repo"""
+        users = [user] if user is not None else self.users()
+        return [dict(entry, user=name, repo=repo) for name in users
+                for repo, entry in sorted(self.users_repos.get(name, {}).items())]
+
+    def report_files(self, user):
+        """(repository, table, path) of every CSV report of a user"""
+        return [(entry['repo'], table, os.path.join(entry['path'], name))
+                for entry in self.repos(user) for name, table in entry['reports']]
+
+    def save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'version': INVENTORY_VERSION, 'users': self.users_repos}, file, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+
+
+def load_inventory(repos_dir=REPO_FOLDER, workers=INVENTORY_WORKERS, path=None):
+    """The up to date inventory of `repos_dir`"""
+    return RepoInventory(repos_dir, path).update(workers)
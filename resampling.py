@@ -0,0 +1,125 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+RESAMPLES = 10000
+CONFIDENCE = 0.95
+SEED = 0
+# Elements of the resample index matrix generated at once; bounds the memory of each chunk to a few tens of MB
+MAX_CHUNK_ELEMENTS = 2 ** 22
+RESAMPLING_WORKERS = 1
+
+
+def chunk_sizes(n_resamples, n):
+    """Rows per chunk so that a (rows, n) index matrix stays within MAX_CHUNK_ELEMENTS"""
+    rows = max(1, MAX_CHUNK_ELEMENTS // max(n, 1))
+    return [min(rows, n_resamples - start) for start in range(0, n_resamples, rows)]
+
+
+def bootstrap_means(values, n_resamples, rng):
+    """Means of `n_resamples` bootstrap samples of `values`, drawn as index matrices a chunk at a time"""
+    values = np.asarray(values, dtype=float)
+    means = []
+    for rows in chunk_sizes(n_resamples, len(values)):
+        indices = rng.integers(0, len(values), size=(rows, len(values)))
+        means.append(values[indices].mean(axis=1))
+    return np.concatenate(means)
+
+
+def permutation_spearman(x, y, n_resamples, rng):
+    """Spearman's rho of x and y, and its two-sided permutation p-value from shuffling x"""
+    x_ranks = rankdata(x)
+    y_ranks = rankdata(y)
+    x_centered = x_ranks - x_ranks.mean()
+    y_centered = y_ranks - y_ranks.mean()
+    # Permuting x leaves both norms unchanged, so every rho is a dot product over the same denominator
+    scale = np.sqrt((x_centered ** 2).sum() * (y_centered ** 2).sum())
+    if scale == 0:
+        return np.nan, np.nan
+    rho = x_centered @ y_centered / scale
+
+    exceed = 0
+    for rows in chunk_sizes(n_resamples, len(x)):
+        permuted = rng.permuted(np.broadcast_to(x_centered, (rows, len(x))), axis=1)
+        exceed += np.count_nonzero(np.abs(permuted @ y_centered / scale) >= abs(rho) - 1e-12)
+    return rho, (exceed + 1) / (n_resamples + 1)
+
+
+def _bootstrap_cell(args):
+    values, n_resamples, confidence, seed = args
+    means = bootstrap_means(values, n_resamples, np.random.default_rng(seed))
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(means, [tail, 100 - tail])
+    return low, high
+
+
+def _trend_cell(args):
+    experience, densities, n_resamples, seed = args
+    return permutation_spearman(experience, densities, n_resamples, np.random.default_rng(seed))
+
+
+def _run(function, tasks, workers):
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            return list(executor.map(function, tasks))
+    return [function(task) for task in tasks]
+
+
+def cell_seeds(seed, count):
+    """One independent seed per cell, so the results do not depend on the number of workers"""
+    return np.random.SeedSequence(seed).spawn(count)
+
+
+def bootstrap_intervals(densities_by_severity, experience_levels, n_resamples=RESAMPLES, confidence=CONFIDENCE,
+                        seed=SEED, workers=RESAMPLING_WORKERS):
+    """Percentile bootstrap interval of the mean density of every severity, language and experience level.
+
+    `densities_by_severity` is the output of density_metrics.calculate_issue_densities.
+    """
+    cells = [(severity, language, experience, densities)
+             for severity, (_, all_densities) in densities_by_severity.items()
+             for language, by_experience in all_densities.items()
+             for experience, densities in by_experience.items()
+             if experience in experience_levels and len(densities) > 0]
+    seeds = cell_seeds(seed, len(cells))
+    bounds = _run(_bootstrap_cell, [(densities, n_resamples, confidence, cell_seed)
+                                    for (_, _, _, densities), cell_seed in zip(cells, seeds)], workers)
+    return pd.DataFrame([
+        {'severity': severity, 'language': language, 'experience': experience, 'n': len(densities),
+         'mean': np.mean(densities), 'ci_low': low, 'ci_high': high}
+        for (severity, language, experience, densities), (low, high) in zip(cells, bounds)
+    ], columns=['severity', 'language', 'experience', 'n', 'mean', 'ci_low', 'ci_high'])
+
+
+def experience_trend_tests(densities_by_severity, experience_levels, n_resamples=RESAMPLES, seed=SEED,
+                           workers=RESAMPLING_WORKERS):
+    """Spearman's rho between experience (the position in `experience_levels`) and density, with
+    permutation p-values, for every severity and language and for all languages together"""
+    cells = []
+    for severity, (_, all_densities) in densities_by_severity.items():
+        pooled_experience, pooled_densities = [], []
+        for language, by_experience in all_densities.items():
+            experience = [rank for rank, level in enumerate(experience_levels) for _ in by_experience.get(level, [])]
+            densities = [density for level in experience_levels for density in by_experience.get(level, [])]
+            cells.append((severity, language, experience, densities))
+            pooled_experience += experience
+            pooled_densities += densities
+        cells.append((severity, 'All', pooled_experience, pooled_densities))
+
+    seeds = cell_seeds(seed, len(cells))
+    tests = _run(_trend_cell, [(experience, densities, n_resamples, cell_seed)
+                               for (_, _, experience, densities), cell_seed in zip(cells, seeds)], workers)
+    return pd.DataFrame([
+        {'severity': severity, 'language': language, 'n': len(densities), 'rho': rho, 'p_value': p_value}
+        for (severity, language, _, densities), (rho, p_value) in zip(cells, tests)
+    ], columns=['severity', 'language', 'n', 'rho', 'p_value'])
+
+
+def error_bars(intervals, severity):
+    """{language: {experience: (ci_low, ci_high)}} of one severity, for the density bar plots"""
+    bars = {}
+    for row in intervals[intervals['severity'] == severity].itertuples(index=False):
+        bars.setdefault(row.language, {})[row.experience] = (row.ci_low, row.ci_high)
+    return bars
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from git_history import EXCLUDED_DIRS, EXTENSION_LANGUAGES
+
+MANIFEST_FILE = 'scan_manifest.json'
+FINGERPRINT_WORKERS = 8
+
+
+def is_scanned_file(path):
+    """Whether the scanner's inclusions/exclusions take this repo-relative path"""
+    parts = path.split('/')
+    return os.path.splitext(parts[-1])[1].lower() in EXTENSION_LANGUAGES and not EXCLUDED_DIRS.intersection(parts[:-1])
+
+
+def repo_fingerprint(repo_path):
+    """(HEAD commit, hash of the scanned source files) of a repository.
+
+    For git repos the hash covers the blob ids in the index, so no file is
+    read; other directories fall back to hashing the file contents.
+    """
+    digest = hashlib.sha256()
+    head = subprocess.run(['git', '-C', repo_path, 'rev-parse', 'HEAD'], capture_output=True, text=True)
+    files = subprocess.run(['git', '-C', repo_path, 'ls-files', '-s', '-z'], capture_output=True, text=True)
+    if head.returncode == 0 and files.returncode == 0:
+        for entry in files.stdout.split('\0'):
+            # <mode> <blob id> <stage>\t<path>
+            info, _, path = entry.partition('\t')
+            if path and is_scanned_file(path):
+                digest.update(f'{path}\0{info.split()[1]}\0'.encode('utf-8'))
+        return head.stdout.strip(), digest.hexdigest()
+
+    for root, dirs, names in os.walk(repo_path):
+        dirs[:] = sorted(name for name in dirs if name not in EXCLUDED_DIRS)
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, repo_path).replace(os.sep, '/')
+            if is_scanned_file(relative):
+                digest.update(relative.encode('utf-8') + b'\0')
+                with open(path, 'rb') as file:
+                    digest.update(hashlib.sha256(file.read()).digest())
+    return None, digest.hexdigest()
+
+
+def fingerprint_repositories(repo_paths, workers=FINGERPRINT_WORKERS):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(repo_paths, executor.map(repo_fingerprint, repo_paths)))
+
+
+class ScanManifest:
+    """What was analyzed for each project key: HEAD, source hash, analysis id and report files.
+
+    Stored as JSON and rewritten after every change, so an interrupted run
+    keeps what it finished.
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def needs_analysis(self, project_key, repo_path, fingerprint):
+        """Why the repo must be (re)analyzed: 'new', 'changed' or 'incomplete'; None if its results are current"""
+        head, source_hash = fingerprint
+        entry = self.entries.get(project_key)
+        if entry is None:
+            # Reports from before the manifest existed are taken as they are
+            reports = [f'{repo_path}/{project_key}_issues.csv', f'{repo_path}/{project_key}_consolidated.csv']
+            if all(os.path.exists(report) for report in reports):
+                self.record(project_key, repo_path, fingerprint, None, project_key, reports, adopted=True, save=False)
+                return None
+            return 'new'
+        if entry['head'] != head or entry['source_hash'] != source_hash:
+            return 'changed'
+        if entry['analysis_id'] is None and not entry.get('adopted'):
+            return 'incomplete'
+        if not all(os.path.exists(report) for report in entry['reports']):
+            return 'incomplete'
+        return None
+
+    def record(self, project_key, repo_path, fingerprint, analysis_id, scan_project, reports, adopted=False, save=True):
+        head, source_hash = fingerprint
+        self.entries[project_key] = {
+            'repo_path': repo_path,
+            'head': head,
+            'source_hash': source_hash,
+            'analysis_id': analysis_id,
+            'scan_project': scan_project,  # The project the repo was scanned in, its own or a batch
+            'reports': list(reports),
+        }
+        if adopted:
+            self.entries[project_key]['adopted'] = True
+        if save:
+            self.save()
+
+    def save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.entries, file, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
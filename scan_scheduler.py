@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import time
+from collections import namedtuple
+
+import aiohttp
+
+from git_history import language_bytes
+from sonarqube_ce import read_report_task
+from sonarqube_client import SonarQubeError
+
+# Scanner settings
+SCANNER_COMMAND = 'sonar-scanner'
+SCANNER_HOME = os.path.abspath('.sonar')  # Shared SONAR_USER_HOME, so plugins and caches are downloaded once
+SCANNER_WORK_ROOT = os.path.abspath('.scannerwork')  # One work directory per running scan, removed afterwards
+SCAN_INCLUSIONS = '**/*.js,**/*.jsx,**/*.php,**/*.py'
+SCAN_EXCLUSIONS = '**/node_modules/**,**/vendor/**,**/dist/**,**/.git/**'
+
+# Concurrency
+SCAN_MAX_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # Each scanner JVM keeps about two cores busy
+CE_QUEUE_TOLERANCE = 2  # Pending Compute Engine tasks allowed before scans are throttled
+QUEUE_CHECK_INTERVAL = 5  # Seconds between api/ce/activity_status checks
+
+# Batching: repos with less source than SMALL_REPO_BYTES share one scanner run, as modules of one project
+SMALL_REPO_BYTES = 256 * 1024
+BATCH_MAX_REPOS = 20
+# Batch projects are keyed by their membership; fetch_sonar_qube.py deletes the ones no repo is scanned in any more
+BATCH_KEY_PREFIX = 'batch_'
+# Copy-paste detection would compare the files of different repos of a batch; fetch_sonar_qube.py measures
+# the duplicated lines of batched repos one repo at a time instead
+BATCH_CPD_EXCLUSIONS = '**/*'
+
+# repos: list of (repo_path, project_key, project_name); a single repo job scans it under its own key
+ScanJob = namedtuple('ScanJob', ['project_key', 'project_name', 'repos'])
+
+
+def plan_scan_jobs(repos, small_bytes=SMALL_REPO_BYTES, batch_size=BATCH_MAX_REPOS):
+    """One job per large repo and one per group of up to `batch_size` small repos"""
+    jobs, small = [], []
+    for repo in repos:
+        if batch_size > 1 and sum(language_bytes(repo[0]).values()) < small_bytes:
+            small.append(repo)
+        else:
+            jobs.append(ScanJob(repo[1], repo[2], [repo]))
+
+    for start in range(0, len(small), batch_size):
+        batch = small[start:start + batch_size]
+        if len(batch) == 1:
+            jobs.append(ScanJob(batch[0][1], batch[0][2], batch))
+            continue
+        digest = hashlib.sha1(','.join(sorted(repo[1] for repo in batch)).encode('utf-8')).hexdigest()[:12]
+        jobs.append(ScanJob(f'{BATCH_KEY_PREFIX}{digest}', f'Batch of {len(batch)} repositories', batch))
+    return jobs
+
+
+def scanner_command(job, work_dir, url, token):
+    command = [
+        SCANNER_COMMAND,
+        f'-Dsonar.projectKey={job.project_key}',
+        f'-Dsonar.host.url={url}',
+        f'-Dsonar.token={token}',
+        '-Dsonar.scm.exclusions.disabled=true',
+        f'-Dsonar.inclusions={SCAN_INCLUSIONS}',
+        f'-Dsonar.exclusions={SCAN_EXCLUSIONS}',
+        f'-Dsonar.working.directory={work_dir}',
+    ]
+    if len(job.repos) == 1:
+        command.append(f'-Dsonar.sources={job.repos[0][0]}')
+        return command
+
+    # File paths stay relative to the current directory, as in a single repo scan, so issues can be split by repo path
+    modules = [f'm{index}' for index in range(len(job.repos))]
+    command.append(f'-Dsonar.modules={",".join(modules)}')
+    command.append(f'-Dsonar.cpd.exclusions={BATCH_CPD_EXCLUSIONS}')
+    for module, (repo_path, _, _) in zip(modules, job.repos):
+        command.append(f'-D{module}.sonar.projectBaseDir={repo_path}')
+        command.append(f'-D{module}.sonar.sources=.')
+    return command
+
+
+class ScanScheduler:
+    """Runs sonar-scanner jobs, as many at once as the CPU and the server's Compute Engine queue allow"""
+
+    def __init__(self, client, url, token, max_workers=SCAN_MAX_WORKERS):
+        self.client = client
+        self.url = url
+        self.token = token
+        self.max_workers = max_workers
+        self.running = 0
+        self.condition = asyncio.Condition()
+        self.queue_depth = 0
+        self.checked_at = None
+        self.repos_scanned = 0
+        self.started_at = time.monotonic()
+
+    async def allowed_workers(self):
+        if self.checked_at is None or time.monotonic() - self.checked_at > QUEUE_CHECK_INTERVAL:
+            self.checked_at = time.monotonic()
+            try:
+                self.queue_depth = (await self.client.ce_activity_status())['pending']
+            except (aiohttp.ClientError, asyncio.TimeoutError, SonarQubeError) as e:
+                print(f"Could not read the Compute Engine queue: {e}")
+        # Every pending task past the tolerance takes a scan slot away, so scans do not outrun the server
+        return max(1, self.max_workers - max(0, self.queue_depth - CE_QUEUE_TOLERANCE))
+
+    async def scan(self, job):
+        """Run the scanner for `job`; returns its report task, or None if nothing was submitted"""
+        while True:
+            # Read outside the lock: the queue check is an HTTP request
+            allowed = await self.allowed_workers()
+            async with self.condition:
+                if self.running < allowed:
+                    self.running += 1
+                    break
+                try:
+                    await asyncio.wait_for(self.condition.wait(), QUEUE_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+        try:
+            return await self.run_scanner(job)
+        finally:
+            async with self.condition:
+                self.running -= 1
+                self.condition.notify_all()
+            self.repos_scanned += len(job.repos)
+            print(f"Scanned {self.repos_scanned} repositories, {self.throughput():.1f} repos/min")
+
+    async def run_scanner(self, job):
+        work_dir = os.path.join(SCANNER_WORK_ROOT, job.project_key)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        os.makedirs(SCANNER_HOME, exist_ok=True)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *scanner_command(job, work_dir, self.url, self.token),
+                env=dict(os.environ, SONAR_USER_HOME=SCANNER_HOME))
+            returncode = await process.wait()
+            if returncode != 0:
+                print(f"sonar-scanner exited with {returncode} for {job.project_key}")
+            # The background task the scan submitted, if it got that far
+            return read_report_task(work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def throughput(self):
+        """Repositories scanned per minute since the scheduler started"""
+        minutes = (time.monotonic() - self.started_at) / 60
+        return self.repos_scanned / minutes if minutes else 0.0
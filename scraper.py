@@ -1,5 +1,8 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
+import lxml.html
 import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
@@ -8,10 +11,17 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import queue
+import sqlite3
+import threading
 import time
 import csv
 import sys
 import os
+from pipeline_store import STORE_FILE, PipelineStore, write_profiles_csv
 
 class MaxCollected(Exception):  
     pass
@@ -20,9 +30,30 @@ class MaxCollected(Exception):
 LANGUAGES = ['en', 'es', 'pt', 'fr', 'ru', 'it', 'zc']
 TECHNOLOGIES = ['javascript', 'python', 'php']
 EXISTING_PROFILES_FILE = 'workana_profiles.csv'
+FRONTIER_FILE = 'scraper_frontier.db'
 
-def load_existing_profiles():
-    """Load existing profiles to avoid duplicates"""
+# Parallel crawl settings
+NUM_WORKERS = 4
+PAGE_LOAD_TIMEOUT = 15  # Max seconds to wait for the elements we parse
+DETAILS_TIMEOUT = 5  # Max seconds to wait for "Ver mais detalhes" to expand
+# Elements of a profile page the parser reads; a profile may lack the skills or the description
+PROFILE_SELECTORS = ('div[itemprop="name"]', 'div#section-skills', 'div#section-description')
+MISSING_ELEMENTS_DELAY = 3  # Seconds a loaded page still gets to render missing elements, the fixed wait used before
+
+# Browserless fast path settings
+BASE_URL = "https://www.workana.com"
+HTTP_TIMEOUT = 20
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8,es;q=0.7',
+}
+LISTING_ARTICLE_CLASS = 'js-worker listing worker-item'
+
+def load_existing_profiles(store=None):
+    """Load existing profiles to avoid duplicates; from the store's index when there is one"""
+    if store is not None:
+        store.import_profiles_csv(EXISTING_PROFILES_FILE)
+        return store.profile_urls()
     existing_profiles = set()
     try:
         with open(EXISTING_PROFILES_FILE, mode='r', encoding='utf-8') as file:
@@ -33,16 +64,53 @@ def load_existing_profiles():
         pass
     return existing_profiles
 
+def create_driver(driver_path=None, headless=True):
+    """Start a Chrome instance, headless by default, for the parallel crawl"""
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    service = ChromeService(driver_path or ChromeDriverManager().install())
+    return webdriver.Chrome(service=service, options=options)
+
+def _page_ready(*selectors, settle=0):
+    """Wait condition: the elements we parse are present, or the document finished loading and
+    `settle` seconds passed without some of them"""
+    started = time.monotonic()
+    def condition(driver):
+        if all(driver.find_elements(By.CSS_SELECTOR, selector) for selector in selectors):
+            return True
+        return (driver.execute_script('return document.readyState') == 'complete'
+                and time.monotonic() - started >= settle)
+    return condition
+
+def _details_expanded(button):
+    """Wait condition: the "Ver mais detalhes" link was consumed by the click"""
+    def condition(driver):
+        try:
+            return not button.is_displayed() or "Ver mais detalhes" not in button.text
+        except StaleElementReferenceException:
+            return True
+    return condition
+
+def wait_for(driver, condition, timeout=PAGE_LOAD_TIMEOUT):
+    try:
+        WebDriverWait(driver, timeout).until(condition)
+    except TimeoutException:
+        print(f"Timed out waiting for {driver.current_url}")
+
+def listing_url(page, language, technology=None):
+    if technology:
+        return f"{BASE_URL}/{language}/freelancers/{technology}?query=github.com&worker_type=0&page={page}"
+    return f"{BASE_URL}/freelancers?language={language}&query=github.com&worker_type=0&page={page}"
+
 def get_profile_links(driver, page, language, technology=None):
     """Modified to handle language and technology filters"""
-    base_url = "https://www.workana.com"
-    if technology:
-        url = f"{base_url}/{language}/freelancers/{technology}?query=github.com&worker_type=0&page={page}"
-    else:
-        url = f"{base_url}/freelancers?language={language}&query=github.com&worker_type=0&page={page}"
+    url = listing_url(page, language, technology)
     
     driver.get(url)
-    time.sleep(3)  # Wait for the page to load
+    wait_for(driver, _page_ready('article.js-worker'))
 
     soup = BeautifulSoup(driver.page_source, 'html.parser')
     
@@ -55,7 +123,7 @@ def get_profile_links(driver, page, language, technology=None):
 
 def get_profile_data(driver, profile_url):
     driver.get(profile_url)
-    time.sleep(3)  # Wait for the page to load
+    wait_for(driver, _page_ready(*PROFILE_SELECTORS, settle=MISSING_ELEMENTS_DELAY))
 
     # Click on "Ver mais detalhes" link
     try:
@@ -63,7 +131,7 @@ def get_profile_data(driver, profile_url):
         for button in more_details_buttons:
             if "Ver mais detalhes" in button.text:
                 driver.execute_script("arguments[0].click();", button)
-                time.sleep(2)  # Wait for the additional content to load
+                wait_for(driver, _details_expanded(button), DETAILS_TIMEOUT)
     except Exception as e:
         print(f"Could not click 'Ver mais detalhes': {e}")
 
@@ -125,34 +193,339 @@ def scrape_workana(num_pages, existing_profiles):
     
     return all_profiles
 
+def create_http_session(pool_size=NUM_WORKERS):
+    """Pooled HTTP session shared by the listing and profile fetchers"""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HTTP_HEADERS)
+    return session
+
+def _classes(element):
+    return element.get('class', '').split()
+
+def parse_profile_links(html):
+    """Extract profile links from a listing page with the lxml backend"""
+    root = lxml.html.fromstring(html)
+    profile_links = []
+    for article in root.iter('article'):
+        if ' '.join(_classes(article)) != LISTING_ARTICLE_CLASS:
+            continue
+        for anchor in article.iter('a'):
+            if anchor.get('href') is not None:
+                profile_links.append(anchor.get('href'))
+                break
+    return profile_links
+
+def get_profile_links_http(session, page, language, technology=None):
+    response = session.get(listing_url(page, language, technology), timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    return parse_profile_links(response.content)
+
+def _parse_profile_tree(html, profile_url):
+    """Walk the profile document once, filling each field from its first match.
+
+    Returns the profile data and whether the page hides content behind the
+    "Ver mais detalhes" link, which only a browser can expand.
+    """
+    root = lxml.html.fromstring(html)
+    profile_data = {
+        'url': profile_url,
+        'name': None,
+        'title': None,
+        'location': None,
+        'hourly_rate': None,
+        'description': None,
+        'github': None,
+        'skills': None,
+    }
+    needs_expansion = False
+
+    for element in root.iter():
+        tag = element.tag
+        if not isinstance(tag, str):  # Comments and processing instructions
+            continue
+
+        if tag == 'div':
+            if profile_data['name'] is None and element.get('itemprop') == 'name':
+                profile_data['name'] = element.text_content().strip()
+            elif profile_data['hourly_rate'] is None and 'h3' in _classes(element):
+                profile_data['hourly_rate'] = element.text_content().strip()
+            elif profile_data['description'] is None and element.get('id') == 'section-description':
+                profile_data['description'] = element.text_content().strip().replace('\n', ' ').replace('\r', ' ')
+            elif profile_data['skills'] is None and element.get('id') == 'section-skills':
+                profile_data['skills'] = _parse_skills_rows(element)
+        elif tag == 'section':
+            if profile_data['title'] is None and 'profile-role' in _classes(element):
+                h1 = next(element.iter('h1'), None)
+                profile_data['title'] = h1.text_content().strip() if h1 is not None else 'N/A'
+        elif tag == 'span':
+            if profile_data['location'] is None and 'country-name' in _classes(element):
+                profile_data['location'] = element.text_content().strip()
+        elif tag == 'a':
+            href = element.get('href')
+            if profile_data['github'] is None and href and "github.com" in href:
+                profile_data['github'] = href
+            if not needs_expansion and {'link', 'small'} <= set(_classes(element)):
+                needs_expansion = "Ver mais detalhes" in element.text_content()
+
+    for field, value in profile_data.items():
+        if value is None:
+            profile_data[field] = [] if field == 'skills' else 'N/A'
+
+    return profile_data, needs_expansion
+
+def _parse_skills_rows(skills_section):
+    skills = []
+    for row in skills_section.iter('tr'):
+        cells = list(row.iter('td'))
+        skill_cell = next((cell for cell in cells if 'skills' in _classes(cell)), None)
+        if skill_cell is None or len(cells) <= 3:
+            continue
+        skills.append({'skill': skill_cell.text_content().strip(), 'years_of_experience': cells[3].text_content().rstrip()})
+    return skills
+
+def parse_profile(html, profile_url):
+    """Single-pass lxml equivalent of the parsing done in get_profile_data"""
+    return _parse_profile_tree(html, profile_url)[0]
+
+def get_profile_data_http(session, profile_url):
+    """Fetch and parse a profile without a browser.
+
+    Returns None when the skills table or description needs the
+    "Ver mais detalhes" expansion, so the caller can fall back to Selenium.
+    """
+    response = session.get(profile_url, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    profile_data, needs_expansion = _parse_profile_tree(response.content, profile_url)
+    if needs_expansion:
+        return None
+    return profile_data
+
+class CrawlFrontier:
+    """Persistent crawl state so an interrupted crawl resumes where it stopped.
+
+    Records which (language, technology, page) listings were visited and
+    which profile URLs are still queued.
+    """
+
+    def __init__(self, path=FRONTIER_FILE):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS pages (
+                    language TEXT NOT NULL,
+                    technology TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    new_links INTEGER NOT NULL,
+                    PRIMARY KEY (language, technology, page)
+                );
+                -- Filters were once marked exhausted for good after a page without new profiles
+                DROP TABLE IF EXISTS exhausted_filters;
+                CREATE TABLE IF NOT EXISTS profiles (
+                    url TEXT PRIMARY KEY,
+                    done INTEGER NOT NULL DEFAULT 0
+                );
+            ''')
+
+    def is_page_done(self, language, technology, page):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT 1 FROM pages WHERE language = ? AND technology = ? AND page = ?',
+                (language, technology or '', page)).fetchone()
+        return row is not None
+
+    def mark_page_done(self, language, technology, page, new_links):
+        """Queue the page's new profile URLs and mark the page visited in one transaction"""
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO profiles (url) VALUES (?)', [(link,) for link in new_links])
+            self.connection.execute(
+                'INSERT OR REPLACE INTO pages (language, technology, page, new_links) VALUES (?, ?, ?, ?)',
+                (language, technology or '', page, len(new_links)))
+
+    def known_profiles(self):
+        with self.lock:
+            return {row[0] for row in self.connection.execute('SELECT url FROM profiles')}
+
+    def queued_profiles(self):
+        with self.lock:
+            return [row[0] for row in self.connection.execute('SELECT url FROM profiles WHERE done = 0 ORDER BY rowid')]
+
+    def mark_profile_done(self, url):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO profiles (url, done) VALUES (?, 1)', (url,))
+
+    def close(self):
+        self.connection.close()
+
+def iter_filters():
+    """Listing filters in crawl order: by language first, then by technology"""
+    for lang in LANGUAGES:
+        yield lang, None
+    for tech in TECHNOLOGIES:
+        for lang in LANGUAGES:
+            yield lang, tech
+
+def crawl_workana(num_pages, existing_profiles, workers=NUM_WORKERS, headless=True, fetch='browser', frontier=None, store=None):
+    """Crawl with a bounded pool of headless drivers.
+
+    One driver walks the listing pages and feeds new profile URLs into a shared
+    queue; `workers` drivers take URLs from the queue and parse the profiles.
+    With fetch='http' pages are downloaded through a pooled HTTP session instead,
+    and a worker only starts a driver for profiles that need "Ver mais detalhes".
+
+    Every profile is appended to the CSV as soon as it is parsed and the crawl
+    state is checkpointed in `frontier`, so a restarted crawl first finishes the
+    queued profiles and then skips the listing pages already visited.
+    Returns the number of new profiles written.
+    """
+    use_http = fetch == 'http'
+    session = create_http_session(workers + 1) if use_http else None
+    frontier = frontier or CrawlFrontier(':memory:')
+    driver_path = []
+    profile_queue = queue.Queue(maxsize=workers * 10)
+    written = [0]
+    lock = threading.Lock()
+
+    # Resume: finish profiles queued by an interrupted run unless they already reached the CSV
+    pending_profiles = []
+    for link in frontier.queued_profiles():
+        if link in existing_profiles:
+            frontier.mark_profile_done(link)
+        else:
+            pending_profiles.append(link)
+    existing_profiles.update(frontier.known_profiles())
+    if pending_profiles:
+        print(f"Resuming {len(pending_profiles)} queued profiles")
+
+    def new_driver():
+        with lock:
+            if not driver_path:
+                driver_path.append(ChromeDriverManager().install())
+        return create_driver(driver_path[0], headless)
+
+    def produce_links():
+        driver = None
+        try:
+            for link in pending_profiles:
+                profile_queue.put(link)
+
+            for lang, tech in iter_filters():
+                print(f"Scraping {tech or 'all'} profiles for language: {lang}")
+                for page in range(1, num_pages + 1):
+                    if frontier.is_page_done(lang, tech, page):
+                        continue
+                    if driver is None and not use_http:
+                        driver = new_driver()
+                    try:
+                        if use_http:
+                            profile_links = get_profile_links_http(session, page, lang, tech)
+                        else:
+                            profile_links = get_profile_links(driver, page, lang, tech)
+                    except requests.RequestException as e:
+                        print(f"Could not fetch listing page {page} for {lang}/{tech}: {e}")
+                        continue
+                    # Past the last page the listing is empty; a slow render looks the same, so nothing is
+                    # recorded and the next run tries the page again
+                    if not profile_links:
+                        break
+                    with lock:
+                        new_links = [link for link in dict.fromkeys(profile_links) if link not in existing_profiles]
+                        existing_profiles.update(new_links)
+                    # The filters overlap, so a page of profiles we already have says nothing about the next ones
+                    frontier.mark_page_done(lang, tech, page, new_links)
+                    for link in new_links:
+                        profile_queue.put(link)
+        finally:
+            if driver:
+                driver.quit()
+            # One sentinel per worker so every consumer stops
+            for _ in range(workers):
+                profile_queue.put(None)
+
+    def consume_profiles():
+        driver = None
+        try:
+            while True:
+                link = profile_queue.get()
+                if link is None:
+                    break
+                # Nothing escapes the loop: a consumer that died would leave the producer blocked on the full queue
+                try:
+                    profile_data = get_profile_data_http(session, link) if use_http else None
+                    if profile_data is None:
+                        driver = driver or new_driver()
+                        profile_data = get_profile_data(driver, link)
+                    with lock:
+                        append_to_csv([profile_data], store)
+                        frontier.mark_profile_done(link)
+                        written[0] += 1
+                except Exception as e:
+                    # Left queued in the frontier, so the next run retries it
+                    print(f"Could not scrape profile {link}: {e}")
+        finally:
+            if driver:
+                driver.quit()
+
+    with ThreadPoolExecutor(max_workers=workers + 1) as executor:
+        futures = [executor.submit(produce_links)]
+        futures += [executor.submit(consume_profiles) for _ in range(workers)]
+        for future in as_completed(futures):
+            future.result()
+
+    return written[0]
+
 # Modified main execution
-def append_to_csv(profiles):
-    """Append new profiles to the CSV file"""
-    mode = 'a' if os.path.exists(EXISTING_PROFILES_FILE) else 'w'
-    with open(EXISTING_PROFILES_FILE, mode=mode, newline='', encoding='utf-8') as file:
-        writer = csv.writer(file, delimiter=';')
-        if mode == 'w':  # Only write header for new file
-            writer.writerow(['url', 'github', 'name', 'title', 'location', 'hourly_rate', 'skills', 'description'])
-        for profile in profiles:
-            skills = ', '.join([f"{skill['skill']} ({skill['years_of_experience']})" for skill in profile['skills']])
-            writer.writerow([
-                profile['url'],
-                profile['github'],
-                profile['name'],
-                profile['title'],
-                profile['location'],
-                profile['hourly_rate'],
-                skills,
-                f'"""{profile["description"]}"""'
-            ])
+def profile_record(profile):
+    """A scraped profile as the flat record kept in the store and the CSV"""
+    record = dict(profile)
+    record['skills'] = ', '.join([f"{skill['skill']} ({skill['years_of_experience']})" for skill in profile['skills']])
+    record['description'] = f'"""{profile["description"]}"""'
+    return record
+
+def append_to_csv(profiles, store=None):
+    """Upsert new profiles into the store, if any, and append them to the CSV file"""
+    records = [profile_record(profile) for profile in profiles]
+    if store is not None:
+        store.upsert_profiles(records)
+    write_profiles_csv(EXISTING_PROFILES_FILE, records, append=True)
 
 if __name__ == "__main__":
-    num_pages_to_scrape = 17
-    existing_profiles = load_existing_profiles()
+    parser = argparse.ArgumentParser(description='Collect public Workana profiles')
+    parser.add_argument('--pages', type=int, default=17, help='Listing pages to visit per filter')
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS, help='Number of headless profile drivers')
+    parser.add_argument('--serial', action='store_true', help='Use the original single-browser crawl')
+    parser.add_argument('--show-browser', action='store_true', help='Run the pool drivers with a visible window')
+    parser.add_argument('--fetch', choices=['browser', 'http'], default='browser',
+                        help="'http' downloads pages without Chrome and only falls back to it for expandable profiles")
+    parser.add_argument('--frontier', default=FRONTIER_FILE, help='Checkpoint file used to resume an interrupted crawl')
+    parser.add_argument('--restart', action='store_true', help='Discard the checkpoint and crawl every listing again')
+    parser.add_argument('--store', default=STORE_FILE, help='Pipeline store the profiles are upserted into')
+    args = parser.parse_args()
+
+    num_pages_to_scrape = args.pages
+    store = PipelineStore(args.store)
+    existing_profiles = load_existing_profiles(store)
     print(f"Found {len(existing_profiles)} existing profiles")
     
-    new_profiles = scrape_workana(num_pages_to_scrape, existing_profiles)
-    print(f"Scraped {len(new_profiles)} new profiles")
-    
-    append_to_csv(new_profiles)
-    print(f"Total profiles after scraping: {len(existing_profiles) + len(new_profiles)}")
+    if args.serial:
+        new_profiles = scrape_workana(num_pages_to_scrape, existing_profiles)
+        print(f"Scraped {len(new_profiles)} new profiles")
+        
+        append_to_csv(new_profiles, store)
+        print(f"Total profiles after scraping: {len(existing_profiles) + len(new_profiles)}")
+    else:
+        if args.restart and os.path.exists(args.frontier):
+            os.remove(args.frontier)
+        frontier = CrawlFrontier(args.frontier)
+        try:
+            written = crawl_workana(num_pages_to_scrape, existing_profiles, max(1, args.workers),
+                                    not args.show_browser, args.fetch, frontier, store)
+        finally:
+            frontier.close()
+        print(f"Scraped {written} new profiles")
+        print(f"Total profiles after scraping: {len(load_existing_profiles(store))}")
+    store.close()
@@ -0,0 +1,104 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+NO_XP = "No experience"
+UNDER_THREE_YEARS = "<3"
+THREE_TO_FIVE_YEARS = "3-5"
+MORE_THAN_FIVE_YEARS = ">5"
+
+SKILL_SEPARATOR = ', '
+# Workana renders a skill as "<name> (1 ano)", "<name> (1 a 3 anos)" or "<name> (5 to 10 years)", tried first,
+# and "<name> (+10 anos)"; both match at the start of the skill only, like re.match
+RANGE_PATTERN = r'^(?P<skill>.+?)\s*\((?P<start>\d+)(?:\s*(?:to|a)\s*(?P<end>\d+)?)?\s*(?:years?|anos?)\)'
+OPEN_PATTERN = r'^(?P<skill>.+?)\s*\(\+(?P<start>\d+)\s*(?:years?|anos?)\)'
+# Skills whose name contains the key count as that language; later entries win
+MERGED_LANGUAGES = {'sql': 'SQL', 'html': 'HTML'}
+# (first year, last year) of each Workana range, 0 for an open range; from 10 years on the last year is ignored
+EXPERIENCE_BUCKETS = {
+    (1, 0): UNDER_THREE_YEARS,
+    (1, 3): UNDER_THREE_YEARS,
+    (3, 5): THREE_TO_FIVE_YEARS,
+    (5, 10): MORE_THAN_FIVE_YEARS,
+    (10, 0): MORE_THAN_FIVE_YEARS,
+}
+
+
+def parse_distinct_skills(skills):
+    """skill, language and experience of each skill string; all NaN where it has no years of experience,
+    or years in a range Workana is not known to use, which are reported"""
+    parsed = skills.str.extract(RANGE_PATTERN)
+    parsed = parsed.fillna(skills[parsed['skill'].isna()].str.extract(OPEN_PATTERN))
+    matched = parsed['skill'].notna()
+
+    start = parsed.loc[matched, 'start'].astype(int)
+    end = parsed.loc[matched, 'end'].fillna('0').astype(int).where(start < 10, 0)
+    experience = pd.Series(EXPERIENCE_BUCKETS).reindex(pd.MultiIndex.from_arrays([start, end])).to_numpy()
+    unexpected = pd.isna(experience)
+    for skill in skills[matched][unexpected]:
+        print(f"Unexpected experience range in skill: {skill}")
+    matched[matched] = ~unexpected
+    experience = experience[~unexpected]
+
+    name = parsed.loc[matched, 'skill'].str.strip()
+    language = name
+    for key, merged in MERGED_LANGUAGES.items():
+        language = language.mask(name.str.contains(key, case=False, regex=False), merged)
+
+    result = pd.DataFrame({'skill': name, 'language': language, 'experience': experience}, index=name.index)
+    return result.reindex(skills.index)
+
+
+def parse_skills(skills, report_unmatched=True):
+    """One row per skill with years of experience in a column of Workana skills strings:
+    profile (the index label in `skills`), skill, language and experience bucket.
+
+    The column is split and dictionary-encoded once in Arrow, and every
+    distinct skill string is matched once, so the regex work follows the
+    number of distinct skills rather than the number of profiles.
+    """
+    lists = pc.split_pattern(pa.array(skills.fillna(''), type=pa.string()), SKILL_SEPARATOR)
+    tokens = pc.dictionary_encode(pc.list_flatten(lists))
+    distinct = pd.Series(tokens.dictionary.to_pandas(), dtype='str')
+    parsed = parse_distinct_skills(distinct)
+    matched = parsed['skill'].notna().to_numpy()
+
+    if report_unmatched:
+        for skill in distinct[~matched & (distinct != '').to_numpy()]:
+            print(f"No match found for skill: {skill}")
+
+    codes = tokens.indices.to_numpy()
+    profiles = pc.list_parent_indices(lists).to_numpy()
+    keep = matched[codes]
+    codes = codes[keep]
+    rows = {'profile': skills.index[profiles[keep]]}
+    rows.update((column, parsed[column].take(codes).reset_index(drop=True)) for column in parsed.columns)
+    return pd.DataFrame(rows)
+
+
+def experience_ordinals(long, languages, index):
+    """<language>_exp_ordinal columns for the profiles in `index`: the bucket of their last skill in that language, or NO_XP"""
+    long = long[long['language'].isin(languages)]
+    last = long.drop_duplicates(['profile', 'language'], keep='last')
+    wide = last.pivot(index='profile', columns='language', values='experience')
+    wide = wide.reindex(index=index, columns=languages).fillna(NO_XP).astype('str')
+    wide.columns = [f'{language}_exp_ordinal' for language in languages]
+    wide.index.name = None
+    return wide
+
+
+def skill_dicts(long, index):
+    """{language: experience} of every profile in `index`, later skills overriding earlier ones"""
+    dicts = {profile: {} for profile in index}
+    for profile, language, experience in zip(long['profile'], long['language'], long['experience']):
+        dicts[profile][language] = experience
+    return pd.Series(dicts, dtype=object).reindex(index)
+
+
+def skill_names(skills):
+    """Lower-cased names of every skill of each skills string, with or without years of experience"""
+    lists = pc.split_pattern(pa.array(skills.fillna(''), type=pa.string()), ',')
+    tokens = pc.dictionary_encode(pc.list_flatten(lists))
+    names = pd.Series(tokens.dictionary.to_pandas(), dtype='str').str.split('(').str[0].str.strip().str.lower()
+    by_profile = pd.Series(names.to_numpy()[tokens.indices.to_numpy()]).groupby(pc.list_parent_indices(lists).to_numpy()).agg(list)
+    return [by_profile.get(profile, []) for profile in range(len(skills))]
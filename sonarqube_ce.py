@@ -0,0 +1,112 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+
+from sonarqube_client import SonarQubeError
+
+# Compute Engine polling
+CE_POLL_MIN = 0.5  # Seconds between polls right after a task was added or finished
+CE_POLL_MAX = 15
+CE_POLL_FACTOR = 1.5  # Backoff while nothing changes
+CE_ACTIVITY_THRESHOLD = 5  # With more tasks pending, one api/ce/activity call replaces per-task lookups
+CE_ACTIVITY_PAGE_SIZE = 1000
+FINAL_STATUSES = {'SUCCESS', 'FAILED', 'CANCELED'}
+
+REPORT_TASK_FILE = 'report-task.txt'  # Written by sonar-scanner into its working directory
+
+
+class CETaskError(Exception):
+    def __init__(self, task):
+        self.task = task
+        super().__init__(f"{task['status']}: {task.get('errorMessage', 'no error message')}")
+
+
+def read_report_task(work_dir):
+    """Properties of the scanner's report-task.txt (ceTaskId, projectKey, ...), or None if the scan submitted nothing"""
+    path = os.path.join(work_dir, REPORT_TASK_FILE)
+    if not os.path.exists(path):
+        return None
+    properties = {}
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            key, separator, value = line.strip().partition('=')
+            if separator:
+                properties[key] = value
+    return properties
+
+
+class CETaskTracker:
+    """Watches background analysis tasks through a SonarQubeClient.
+
+    `await tracker.wait(task_id)` returns the api/ce/task payload on SUCCESS
+    and raises CETaskError on FAILED or CANCELED. A single polling task serves
+    all waiters, backing off from CE_POLL_MIN to CE_POLL_MAX while nothing changes.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.pending = {}  # task id -> asyncio.Future
+        self.started_at = datetime.now(timezone.utc)
+        self.wakeup = asyncio.Event()
+        self.poller = None
+
+    async def wait(self, task_id):
+        future = asyncio.get_running_loop().create_future()
+        self.pending[task_id] = future
+        self.wakeup.set()
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.create_task(self._run())
+        return await future
+
+    async def finished_tasks(self, task_ids):
+        """Final state of the given tasks that have ended; tasks still queued are left out"""
+        if len(task_ids) <= CE_ACTIVITY_THRESHOLD:
+            tasks = await asyncio.gather(*(self.client.ce_task(task_id) for task_id in task_ids))
+            return {task['id']: task for task in tasks if task['status'] in FINAL_STATUSES}
+
+        # Server clocks may differ from ours, so look back a little before we started
+        since = (self.started_at - timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S+0000')
+        data = await self.client.ce_activity(status=','.join(sorted(FINAL_STATUSES)), minSubmittedAt=since,
+                                             ps=CE_ACTIVITY_PAGE_SIZE)
+        if data['paging']['total'] > CE_ACTIVITY_PAGE_SIZE:
+            # Too much activity to see every task on one page
+            tasks = await asyncio.gather(*(self.client.ce_task(task_id) for task_id in task_ids))
+        else:
+            tasks = data['tasks']
+        wanted = set(task_ids)
+        return {task['id']: task for task in tasks if task['id'] in wanted and task['status'] in FINAL_STATUSES}
+
+    async def _run(self):
+        delay = CE_POLL_MIN
+        while self.pending:
+            self.wakeup.clear()
+            try:
+                finished = await self.finished_tasks(list(self.pending))
+            except (aiohttp.ClientError, asyncio.TimeoutError, SonarQubeError) as e:
+                print(f"Compute Engine poll failed, retrying: {e}")
+                finished = {}
+
+            for task_id, task in finished.items():
+                future = self.pending.pop(task_id)
+                if future.done():
+                    continue
+                if task['status'] == 'SUCCESS':
+                    future.set_result(task)
+                else:
+                    future.set_exception(CETaskError(task))
+
+            delay = CE_POLL_MIN if finished else min(delay * CE_POLL_FACTOR, CE_POLL_MAX)
+            if not self.pending:
+                break
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+                delay = CE_POLL_MIN
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        """Return once the tasks already tracked have ended"""
+        if self.poller is not None:
+            await self.poller
@@ -0,0 +1,155 @@
+import asyncio
+import base64
+import json
+import random
+from collections import deque
+
+import aiohttp
+
+# Connection settings
+SONAR_MAX_CONNECTIONS = 16  # Pooled keep-alive connections to the server
+SONAR_MAX_CONCURRENCY = 8  # Requests in flight at once, whatever the number of callers
+SONAR_TIMEOUT = 60
+SONAR_RETRIES = 4
+SONAR_RETRY_BASE = 0.5  # Seconds; retries sleep a random time up to base * 2^attempt
+RETRY_STATUSES = {429}  # Besides every 5xx
+ERROR_TEXT_LENGTH = 200  # Characters of a non-JSON body kept in the SonarQubeError
+
+PROJECTS_PER_SEARCH = 100  # Keys per api/projects/search call in existing_projects
+COMPONENTS_PAGE_SIZE = 500  # Largest page api/measures/component_tree accepts
+COMPONENT_PAGE_WORKERS = 4
+
+
+class SonarQubeError(Exception):
+    def __init__(self, status, payload):
+        self.status = status
+        self.payload = payload
+        messages = [error.get('msg', '') for error in payload.get('errors', [])] if isinstance(payload, dict) else []
+        super().__init__(f"HTTP {status}: {'; '.join(messages) or payload}")
+
+
+class SonarQubeClient:
+    """Asynchronous SonarQube web API client over one pooled aiohttp session.
+
+    Use as `async with SonarQubeClient(url, token) as client:`. Requests that
+    fail with a connection error, a 5xx or a 429 are retried with jittered
+    exponential backoff; other error responses, and responses that are not
+    JSON, raise SonarQubeError.
+    """
+
+    def __init__(self, url, token, max_connections=SONAR_MAX_CONNECTIONS, max_concurrency=SONAR_MAX_CONCURRENCY,
+                 retries=SONAR_RETRIES, timeout=SONAR_TIMEOUT):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.max_connections = max_connections
+        self.retries = retries
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session = None
+        self.requests = 0
+        self.retried = 0
+
+    def session_options(self):
+        # Tokens go in the user field of basic auth, with an empty password
+        credentials = base64.b64encode(f'{self.token}:'.encode('utf-8')).decode('ascii')
+        return {
+            'connector': aiohttp.TCPConnector(limit=self.max_connections),
+            'headers': {'Authorization': f'Basic {credentials}'},
+            'timeout': aiohttp.ClientTimeout(total=self.timeout),
+        }
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(**self.session_options())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method, path, params=None, data=None):
+        url = f'{self.url}/{path.lstrip("/")}'
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.semaphore:
+                    self.requests += 1
+                    async with self.session.request(method, url, params=params, data=data) as response:
+                        text = await response.text(errors='replace')
+                        status = response.status
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            else:
+                # Proxies answer errors with HTML pages; those are kept as the start of their text
+                try:
+                    payload = json.loads(text) if text.strip() else None
+                except ValueError:
+                    payload = text[:ERROR_TEXT_LENGTH]
+                    if status < 400:
+                        raise SonarQubeError(status, f"Not a JSON response: {payload}")
+                if status < 400:
+                    return payload
+                retryable = status >= 500 or status in RETRY_STATUSES
+                if not retryable or attempt == self.retries:
+                    raise SonarQubeError(status, payload)
+            self.retried += 1
+            await asyncio.sleep(random.uniform(0, SONAR_RETRY_BASE * 2 ** attempt))
+
+    async def get(self, path, **params):
+        return await self.request('GET', path, params=params)
+
+    async def post(self, path, **data):
+        return await self.request('POST', path, data=data)
+
+    async def existing_projects(self, project_keys):
+        """Subset of `project_keys` that exist on the server, PROJECTS_PER_SEARCH keys per request"""
+        project_keys = list(project_keys)
+        chunks = [project_keys[i:i + PROJECTS_PER_SEARCH] for i in range(0, len(project_keys), PROJECTS_PER_SEARCH)]
+        results = await asyncio.gather(*(
+            self.get('api/projects/search', projects=','.join(chunk), ps=PROJECTS_PER_SEARCH) for chunk in chunks))
+        return {component['key'] for result in results for component in result['components']}
+
+    async def create_project(self, project_key, project_name):
+        return await self.post('api/projects/create', project=project_key, name=project_name)
+
+    async def delete_project(self, project_key):
+        return await self.post('api/projects/delete', project=project_key)
+
+    async def component_tree(self, component, metrics, page=1, page_size=COMPONENTS_PAGE_SIZE, qualifiers='FIL'):
+        return await self.get('api/measures/component_tree', component=component, metricKeys=metrics,
+                              qualifiers=qualifiers, p=page, ps=page_size)
+
+    async def iter_files(self, component, metrics, workers=COMPONENT_PAGE_WORKERS):
+        """Every file under `component` (a project or a directory) with its measures, yielded page by page.
+
+        Up to `workers` pages are requested at once and held in memory.
+        """
+        first = await self.component_tree(component, metrics)
+        pages = -(-first['paging']['total'] // COMPONENTS_PAGE_SIZE)
+        pending = deque()
+        next_page = 2
+        try:
+            batch = first['components']
+            while batch is not None:
+                for file in batch:
+                    yield file
+                while next_page <= pages and len(pending) < workers:
+                    pending.append(asyncio.ensure_future(self.component_tree(component, metrics, next_page)))
+                    next_page += 1
+                batch = (await pending.popleft())['components'] if pending else None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def ce_task(self, task_id):
+        return (await self.get('api/ce/task', id=task_id))['task']
+
+    async def ce_activity(self, **params):
+        return await self.get('api/ce/activity', **params)
+
+    async def ce_activity_status(self):
+        """Compute Engine queue counters: pending, inProgress, failing"""
+        return await self.get('api/ce/activity_status')
@@ -0,0 +1,82 @@
+import asyncio
+from collections import deque
+
+# Issue search settings
+ISSUES_PAGE_SIZE = 500  # Largest page api/issues/search accepts
+MAX_RESULT_WINDOW = 10000  # The server refuses pages past p * ps = 10000
+ISSUE_FETCH_WORKERS = 4
+# Facets used to cut a query that is over the result window, in order: (facet, filter parameter)
+SPLIT_FACETS = [('severities', 'severities'), ('types', 'types'), ('files', 'files')]
+
+
+def facet_counts(data, facet):
+    for entry in data.get('facets', []):
+        if entry['property'] == facet:
+            return {value['val']: value['count'] for value in entry['values'] if value['count'] > 0}
+    return {}
+
+
+class IssueFetcher:
+    """Streams every issue of a project from api/issues/search.
+
+    Up to `workers` pages of a query are requested concurrently through a
+    SonarQubeClient. A query matching more than MAX_RESULT_WINDOW issues is
+    split along SPLIT_FACETS until every slice fits in the window.
+    """
+
+    def __init__(self, client, workers=ISSUE_FETCH_WORKERS):
+        self.client = client
+        self.workers = workers
+
+    async def search(self, project_key, filters, page, facet=None):
+        params = {'componentKeys': project_key, 'ps': ISSUES_PAGE_SIZE, 'p': page, 's': 'FILE_LINE'}
+        params.update(filters)
+        if facet:
+            params['facets'] = facet
+        return await self.client.get('api/issues/search', **params)
+
+    async def iter_issues(self, project_key):
+        """Yield issues as their pages arrive; at most `workers` pages are held at once"""
+        seen = set()
+        slices = [({}, 0)]  # (filters, index of the next facet to split on)
+        pending = deque()
+
+        try:
+            while slices:
+                filters, level = slices.pop()
+                facet = SPLIT_FACETS[level][0] if level < len(SPLIT_FACETS) else None
+                first = await self.search(project_key, filters, 1, facet)
+                total = first['paging']['total']
+
+                if total > MAX_RESULT_WINDOW and facet:
+                    counts = facet_counts(first, facet)
+                    if sum(counts.values()) < total:
+                        print(f"Warning: {facet} facet of {project_key} {filters} covers {sum(counts.values())} of {total} issues")
+                    parameter = SPLIT_FACETS[level][1]
+                    for value in counts:
+                        slices.append((dict(filters, **{parameter: value}), level + 1))
+                    continue
+
+                if total > MAX_RESULT_WINDOW:
+                    print(f"Warning: {project_key} {filters} has {total} issues, only the first {MAX_RESULT_WINDOW} are fetched")
+
+                pages = -(-min(total, MAX_RESULT_WINDOW) // ISSUES_PAGE_SIZE)
+                next_page = 2
+                batches = [first['issues']]
+                while batches or pending:
+                    for issues in batches:
+                        for issue in issues:
+                            # Sorting is not strictly stable between pages, so drop repeats
+                            if issue['key'] not in seen:
+                                seen.add(issue['key'])
+                                yield issue
+                    batches = []
+                    while next_page <= pages and len(pending) < self.workers:
+                        pending.append(asyncio.ensure_future(self.search(project_key, filters, next_page)))
+                        next_page += 1
+                    if pending:
+                        batches.append((await pending.popleft())['issues'])
+        finally:
+            # The caller stopped early or a page failed
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import os
+import shutil
+import time
+from collections import namedtuple
+
+from clone_engine import CLONE_WORKERS, clone_repository
+from fetch_sonar_qube import (SONARQUBE_TOKEN, SONARQUBE_URL, create_project_in_sonarqube, generate_reports,
+                              record_scans, safe_project_key)
+from pipeline_store import STORE_FILE, PipelineStore
+from scan_manifest import MANIFEST_FILE, ScanManifest, repo_fingerprint
+from scan_scheduler import ScanJob, ScanScheduler
+from sonarqube_ce import CETaskError, CETaskTracker
+from sonarqube_client import SonarQubeClient
+
+# Working trees only live here between their clone and the end of their scan
+WORK_FOLDER = 'repos_stream'
+# Reports are written to <RESULTS_FOLDER>/<user>/<repo>/, the layout agregator.py reads from repos_v2
+RESULTS_FOLDER = 'results'
+DISK_BUDGET = 10 * 1024 ** 3  # Bytes of working trees on disk at once
+MIN_CLONE_RESERVATION = 1024 ** 2  # Reserved for repos GitHub reports as (nearly) empty
+
+# Bounded queues between the stages: cloned trees waiting for a scanner, and submitted analyses waiting for their reports
+SCAN_QUEUE_SIZE = 4
+REPORT_QUEUE_SIZE = 16
+REPORT_WORKERS = 4
+
+# size is GitHub's repository size in KB
+StreamRepo = namedtuple('StreamRepo', ['username', 'repository', 'clone_url', 'size'])
+
+
+class DiskBudget:
+    """Bytes of working trees on disk, reserved before a clone starts and released when the tree is deleted.
+
+    The reservation is GitHub's size of the repository, which counts the whole
+    history and so is usually more than the shallow, sparse checkout; it is
+    replaced by the size on disk once the clone is done. A repository larger
+    than the whole budget is still cloned, alone.
+    """
+
+    def __init__(self, limit=DISK_BUDGET):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.condition = asyncio.Condition()
+
+    async def reserve(self, size):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+            self.peak = max(self.peak, self.used)
+
+    async def adjust(self, reserved, size):
+        async with self.condition:
+            self.used += size - reserved
+            self.peak = max(self.peak, self.used)
+            self.condition.notify_all()
+
+    async def release(self, size):
+        await self.adjust(size, 0)
+
+
+class StreamingPipeline:
+    """Clone, scan, report and delete repositories as a stream, within a disk budget.
+
+    Clone workers, scanner runs and report workers each take repositories off
+    bounded queues, so the stages overlap on different repos. A clone starts
+    only when the budget has room for it, and a finished clone waits while the
+    scan queue is full, which pauses the clone workers until a scanner frees a
+    slot. A working tree is deleted as soon as its scanner has uploaded the
+    analysis; the reports are then read from the server into RESULTS_FOLDER.
+    """
+
+    def __init__(self, client, store, manifest, url=SONARQUBE_URL, token=SONARQUBE_TOKEN, work_dir=WORK_FOLDER,
+                 results_dir=RESULTS_FOLDER, disk_budget=DISK_BUDGET, clone_workers=CLONE_WORKERS,
+                 scan_queue_size=SCAN_QUEUE_SIZE, report_queue_size=REPORT_QUEUE_SIZE, report_workers=REPORT_WORKERS):
+        self.client = client
+        self.store = store
+        self.manifest = manifest
+        self.work_dir = work_dir
+        self.results_dir = results_dir
+        self.budget = DiskBudget(disk_budget)
+        self.clone_workers = clone_workers
+        self.report_workers = report_workers
+        self.scan_queue = asyncio.Queue(scan_queue_size)
+        self.report_queue = asyncio.Queue(report_queue_size)
+        self.scheduler = ScanScheduler(client, url, token)
+        self.tracker = CETaskTracker(client)
+        self.existing_projects = set()
+        self.counts = {'cloned': 0, 'scanned': 0, 'reported': 0, 'failed': 0}
+        self.paused = 0.0  # Seconds clone workers spent waiting on a full scan queue
+
+    def job(self, repo, repo_path):
+        project_name = f'{repo.username}/{repo.repository}'
+        project_key = safe_project_key(f'{repo.username}_{repo.repository}')
+        return ScanJob(project_key, project_name, [(repo_path, project_key, project_name)])
+
+    def fail(self, job, message):
+        print(message)
+        self.counts['failed'] += 1
+        record_scans(self.store, job, 'failed')
+
+    async def run(self, repos):
+        started_at = time.monotonic()
+        repos = list(repos)
+        # One bulk lookup instead of one request per project
+        self.existing_projects = await self.client.existing_projects(self.job(repo, None).project_key for repo in repos)
+        print(f"Streaming {len(repos)} repositories through a {self.budget.limit / 1024 ** 2:.0f} MB disk budget")
+
+        pending = iter(repos)
+        cloners = [asyncio.create_task(self.clone_stage(pending)) for _ in range(self.clone_workers)]
+        scanners = [asyncio.create_task(self.scan_stage()) for _ in range(self.scheduler.max_workers)]
+        reporters = [asyncio.create_task(self.report_stage()) for _ in range(self.report_workers)]
+
+        # Each stage is told to stop once the one before it has drained into its queue
+        await asyncio.gather(*cloners)
+        for _ in scanners:
+            await self.scan_queue.put(None)
+        await asyncio.gather(*scanners)
+        for _ in reporters:
+            await self.report_queue.put(None)
+        await asyncio.gather(*reporters)
+        await self.tracker.close()
+
+        minutes = (time.monotonic() - started_at) / 60
+        print(f"Streamed {self.counts['reported']} of {len(repos)} repositories in {minutes:.1f} min "
+              f"({self.counts['failed']} failed), peak disk {self.budget.peak / 1024 ** 2:.1f} MB, "
+              f"clones paused {self.paused:.0f}s on a full scan queue")
+        return self.counts
+
+    async def clone_stage(self, pending):
+        # The iterator is shared by all clone workers; the event loop hands each repo to one of them
+        for repo in pending:
+            reservation = max(repo.size * 1024 if repo.size else 0, MIN_CLONE_RESERVATION)
+            await self.budget.reserve(reservation)
+            path = os.path.join(self.work_dir, repo.username, repo.repository)
+            try:
+                result = await asyncio.to_thread(clone_repository, repo.clone_url, path)
+                self.store.record_clone(repo.username, repo.repository, result)
+            except Exception as e:
+                # A worker that died here would keep its reservation and leave the later stages waiting
+                await asyncio.to_thread(shutil.rmtree, path, True)
+                await self.budget.release(reservation)
+                self.fail(self.job(repo, path), f"An error occurred cloning {repo.clone_url}: {e}")
+                continue
+            if result.returncode != 0:
+                await self.budget.release(reservation)
+                self.fail(self.job(repo, path), f"Failed to clone {repo.clone_url} (exit status {result.returncode}): {result.error}")
+                continue
+            await self.budget.adjust(reservation, result.bytes)
+            self.counts['cloned'] += 1
+            print(f"Cloned {result.url} in {result.duration:.1f}s ({result.bytes / 1024 / 1024:.1f} MB, "
+                  f"{self.budget.used / 1024 ** 2:.0f} MB on disk)")
+
+            # Backpressure: with the scan queue full this worker, and so the next clone, waits
+            waiting_since = time.monotonic()
+            await self.scan_queue.put((repo, path, result.bytes))
+            self.paused += time.monotonic() - waiting_since
+
+    async def scan_stage(self):
+        while (item := await self.scan_queue.get()) is not None:
+            repo, path, size = item
+            submitted = None
+            try:
+                submitted = await self.scan(repo, path)
+            except Exception as e:
+                self.fail(self.job(repo, path), f"An error occurred scanning {repo.username}/{repo.repository}: {e}")
+            finally:
+                # The analysis is on the server once the scanner exits, so the tree is no longer needed
+                await asyncio.to_thread(shutil.rmtree, path, True)
+                await self.budget.release(size)
+            if submitted is not None:
+                await self.report_queue.put(submitted)
+
+    async def scan(self, repo, path):
+        """Run the scanner on a working tree; returns (job, fingerprint, CE task id), or None if nothing was submitted"""
+        job = self.job(repo, path)
+        fingerprint = await asyncio.to_thread(repo_fingerprint, path)
+        if job.project_key not in self.existing_projects:
+            if not await create_project_in_sonarqube(self.client, job.project_key, job.project_name):
+                self.fail(job, f"Skipping {job.project_name}: its project could not be created")
+                return None
+            self.existing_projects.add(job.project_key)
+
+        self.manifest.record(job.project_key, path, fingerprint, None, job.project_key, [])
+        record_scans(self.store, job, 'scanning')
+        report_task = await self.scheduler.scan(job)
+        if report_task is None:
+            self.fail(job, f"Scan of {job.project_key} did not submit an analysis")
+            return None
+        self.counts['scanned'] += 1
+        return job, fingerprint, report_task['ceTaskId']
+
+    async def report_stage(self):
+        while (item := await self.report_queue.get()) is not None:
+            job, fingerprint, task_id = item
+            try:
+                await self.report(job, fingerprint, task_id)
+            except Exception as e:
+                self.fail(job, f"An error occurred generating the reports of {job.project_name}: {e}")
+
+    async def report(self, job, fingerprint, task_id):
+        try:
+            task = await self.tracker.wait(task_id)
+        except CETaskError as e:
+            self.fail(job, f"Analysis of {job.project_name} failed: {e}")
+            return
+
+        results_path = os.path.join(self.results_dir, *job.project_name.split('/', 1))
+        os.makedirs(results_path, exist_ok=True)
+        report_files = await generate_reports(self.client, job.project_key, results_path)
+        # The reports, not the deleted working tree, are what the manifest and the store point to from now on
+        job = job._replace(repos=[(results_path, job.project_key, job.project_name)])
+        self.manifest.record(job.project_key, results_path, fingerprint, task.get('analysisId'), job.project_key, report_files)
+        record_scans(self.store, job, 'reported', task.get('analysisId'), {job.project_key: report_files})
+        self.counts['reported'] += 1
+
+
+async def stream(repos, store, url=SONARQUBE_URL, token=SONARQUBE_TOKEN, manifest_file=MANIFEST_FILE, **options):
+    async with SonarQubeClient(url, token) as client:
+        pipeline = StreamingPipeline(client, store, ScanManifest(manifest_file), url, token, **options)
+        await pipeline.run(repos)
+        return pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clone, scan and delete the selected repositories as a stream, within a disk budget')
+    parser.add_argument('--store', default=STORE_FILE, help='Pipeline store the selected repositories are read from')
+    parser.add_argument('--work', default=WORK_FOLDER, help='Folder for the working trees while they are scanned')
+    parser.add_argument('--results', default=RESULTS_FOLDER, help='Folder the reports are written to, one sub-folder per user')
+    parser.add_argument('--disk-budget', type=float, default=DISK_BUDGET / 1024 ** 3, help='GB of working trees on disk at once')
+    parser.add_argument('--clone-workers', type=int, default=CLONE_WORKERS)
+    parser.add_argument('--scan-queue', type=int, default=SCAN_QUEUE_SIZE, help='Cloned repositories waiting for a scanner')
+    parser.add_argument('--limit', type=int, default=None, help='Stream at most this many repositories')
+    args = parser.parse_args()
+
+    store = PipelineStore(args.store)
+    try:
+        repos = [StreamRepo(*row) for row in store.unscanned_repos()][:args.limit]
+        asyncio.run(stream(repos, store, work_dir=args.work, results_dir=args.results,
+                           disk_budget=int(args.disk_budget * 1024 ** 3), clone_workers=args.clone_workers,
+                           scan_queue_size=args.scan_queue))
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agregator import condense, structure_impacts
+
+
+def issues(impacts):
+    return pd.DataFrame({
+        'Repository': 'repo',
+        'Key': [f'issue{index}' for index in range(len(impacts))],
+        'Component': 'repo:main.py',
+        'File Extension': 'py',
+        'Type': 'CODE_SMELL',
+        'Severity': 'MAJOR',
+        'Impact': impacts,
+    }, dtype=str)
+
+
+def test_issue_counts_only_under_its_impacts():
+    df = structure_impacts(issues(["[{'softwareQuality': 'MAINTAINABILITY', 'severity': 'MEDIUM'}]", '[]']))
+    assert df['Reliability Impact'].isna().all()
+    assert df['Maintainability Impact'].tolist()[0] == 'MEDIUM'
+
+    by_impact = condense(df, None)['Condensed Issues by Impact']
+    assert by_impact[['RELIABILITY', 'MAINTAINABILITY', 'SECURITY', 'Total Issues']].values.tolist() == [[0, 1, 0, 1]]
+
+
+def test_empty_report_columns_are_parsed_from_the_raw_impact():
+    df = issues(["[{'softwareQuality': 'SECURITY', 'severity': 'HIGH'}]", '[]'])
+    for column in ['Reliability Impact', 'Maintainability Impact', 'Security Impact']:
+        df[column] = ''
+    df = structure_impacts(df)
+    assert df['Security Impact'].tolist()[0] == 'HIGH'
+    assert df[['Reliability Impact', 'Maintainability Impact']].isna().all().all()
+    assert df.iloc[1][['Reliability Impact', 'Maintainability Impact', 'Security Impact']].isna().all()
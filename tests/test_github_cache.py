@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from github_cache import CachingAdapter, ResponseCache
+from github_graphql import GitHubGraphQL, RateLimitScheduler
+
+RATE_LIMITED = {'errors': [{'type': 'RATE_LIMITED', 'message': 'API rate limit exceeded'}]}
+SUCCESS = {'data': {'viewer': {'login': 'octocat'},
+                    'rateLimit': {'cost': 1, 'remaining': 4999, 'resetAt': '2030-01-01T00:00:00Z'}}}
+
+
+def serve(replies):
+    """A GraphQL endpoint answering 200 with each of `replies` in turn; returns the server and the bodies it sent"""
+    sent = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            body = json.dumps(replies[min(len(sent), len(replies) - 1)]).encode()
+            sent.append(body)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, sent
+
+
+def client(cache, url, scheduler=None):
+    session = requests.Session()
+    session.mount('http://', CachingAdapter(cache, post_urls=[url]))
+    return GitHubGraphQL('token', url, scheduler or RateLimitScheduler(sleep=lambda seconds: None), session)
+
+
+def test_rate_limited_reply_is_not_cached(tmp_path):
+    server, sent = serve([RATE_LIMITED, SUCCESS])
+    url = f'http://127.0.0.1:{server.server_address[1]}/graphql'
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    try:
+        # The retry after RATE_LIMITED reaches GitHub instead of replaying the error from the cache
+        assert client(cache, url).execute('{ viewer { login } }') == SUCCESS['data']
+        assert len(sent) == 2
+
+        # The successful answer is what is cached, without the rate limit budget it was sent with
+        scheduler = RateLimitScheduler(sleep=lambda seconds: None)
+        assert client(cache, url, scheduler).execute('{ viewer { login } }') == {'viewer': {'login': 'octocat'}}
+        assert len(sent) == 2
+        assert cache.hits == 1
+        assert scheduler.remaining is None
+    finally:
+        server.shutdown()
+        cache.close()
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from skills_parser import MORE_THAN_FIVE_YEARS, UNDER_THREE_YEARS, parse_skills, skill_names
+
+SKILLS = pd.Series(['Python (2 anos), JavaScript (1 a 3 anos), PHP', 'MySQL (5 to 10 years)'], dtype='str')
+
+
+def test_unexpected_range_skips_only_that_skill():
+    long = parse_skills(SKILLS, report_unmatched=False)
+    assert long[['profile', 'language', 'experience']].values.tolist() == [
+        [0, 'JavaScript', UNDER_THREE_YEARS],
+        [1, 'SQL', MORE_THAN_FIVE_YEARS],
+    ]
+
+
+def test_skill_names_keep_skills_without_years():
+    assert skill_names(SKILLS) == [['python', 'javascript', 'php'], ['mysql']]
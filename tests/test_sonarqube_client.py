@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import sonarqube_client
+from sonarqube_client import SonarQubeClient, SonarQubeError
+
+BAD_GATEWAY = (502, 'text/html', '<html><body><h1>502 Bad Gateway</h1></body></html>')
+PROJECTS = (200, 'application/json', '{"components": [{"key": "dev_repo"}]}')
+NOT_FOUND = (404, 'application/json', '{"errors": [{"msg": "Unknown url"}]}')
+
+
+def serve(replies):
+    """A server answering each GET with the next (status, content type, body) of `replies`; returns it and its hit count"""
+    sent = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, content_type, body = replies[min(len(sent), len(replies) - 1)]
+            sent.append(status)
+            body = body.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, sent
+
+
+def get(replies, path='api/projects/search'):
+    server, sent = serve(replies)
+
+    async def request():
+        async with SonarQubeClient(f'http://127.0.0.1:{server.server_address[1]}', 'token') as client:
+            return await client.get(path)
+    try:
+        return asyncio.run(request()), sent
+    finally:
+        server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(sonarqube_client, 'SONAR_RETRY_BASE', 0)
+
+
+def test_html_bad_gateway_is_retried():
+    payload, sent = get([BAD_GATEWAY, PROJECTS])
+    assert payload == {'components': [{'key': 'dev_repo'}]}
+    assert sent == [502, 200]
+
+
+def test_html_error_raises_sonarqube_error_with_its_text():
+    with pytest.raises(SonarQubeError) as error:
+        get([BAD_GATEWAY])
+    assert error.value.status == 502
+    assert '502 Bad Gateway' in str(error.value)
+
+
+def test_client_error_is_not_retried():
+    with pytest.raises(SonarQubeError) as error:
+        get([NOT_FOUND, PROJECTS])
+    assert error.value.status == 404
+    assert 'Unknown url' in str(error.value)